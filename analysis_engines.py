@@ -1,9 +1,308 @@
 import networkx as nx
 import numpy as np
 import pandas as pd
+import hashlib
+import json
+import os
+import sys
 import random
-from multiprocessing import Pool, cpu_count
+import multiprocessing
+import queue
+import threading
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from heapq import heappop, heappush
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from multiprocessing import Pool, cpu_count, shared_memory
 from tqdm import tqdm
+import scipy.sparse as sp
+from scipy.spatial import cKDTree
+from scipy.sparse.csgraph import breadth_first_order, connected_components, shortest_path
+
+
+# ============================================================================
+#       Engine 0: Compact Integer-Indexed Graph Core (CSR)
+# ============================================================================
+
+class CSRGraph:
+    """
+    Frozen, integer-indexed snapshot of a transport network in CSR layout, shared by all engines.
+    - Node ids are int32 positions; `names[i]` maps back to the networkx key and `index` maps the other way.
+    - Edges are rows of (src, dst) with columnar `length` (float64) and `etype` (int16 codes into type_labels).
+    - `indptr`/`indices` hold the traversal adjacency (successors if directed, neighbours otherwise) and
+      `edge_ids` maps every adjacency slot back to its edge row, so edge masks apply to traversals too.
+    - Node attributes are columnar: lon/lat (float64, NaN when missing) and mode (int16 codes into mode_labels).
+    - Missing codes are stored as -1. Removal is expressed with boolean node/edge masks, never by copying.
+    """
+
+    def __init__(self, n, src, dst, directed=True, names=None, lon=None, lat=None, mode=None, mode_labels=(),
+                 length=None, etype=None, type_labels=()):
+        n = int(n)
+        src = np.asarray(src, dtype=np.int32)
+        dst = np.asarray(dst, dtype=np.int32)
+        m = len(src)
+
+        # Traversal adjacency: undirected edges are walked in both directions
+        if directed:
+            tail, head, slot_edges = src, dst, np.arange(m, dtype=np.int32)
+        else:
+            tail = np.concatenate([src, dst])
+            head = np.concatenate([dst, src])
+            slot_edges = np.concatenate([np.arange(m, dtype=np.int32)] * 2)
+        order = np.argsort(tail, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tail, minlength=n), out=indptr[1:])
+
+        self._derived = {}
+        self.n = n
+        self.m = m
+        self.directed = bool(directed)
+        self.names = list(range(n)) if names is None else list(names)
+        self.mode_labels = tuple(mode_labels)
+        self.type_labels = tuple(type_labels)
+        self.src = src
+        self.dst = dst
+        self.length = np.full(m, np.nan) if length is None else np.asarray(length, dtype=np.float64)
+        self.etype = np.full(m, -1, dtype=np.int16) if etype is None else np.asarray(etype, dtype=np.int16)
+        self.lon = np.full(n, np.nan) if lon is None else np.asarray(lon, dtype=np.float64)
+        self.lat = np.full(n, np.nan) if lat is None else np.asarray(lat, dtype=np.float64)
+        self.mode = np.full(n, -1, dtype=np.int16) if mode is None else np.asarray(mode, dtype=np.int16)
+        self.indptr = indptr
+        self.indices = head[order].astype(np.int32)
+        self.edge_ids = slot_edges[order]
+        for array in (self.src, self.dst, self.length, self.etype, self.lon, self.lat, self.mode,
+                      self.indptr, self.indices, self.edge_ids):
+            array.setflags(write=False)
+        self._frozen = True
+
+    def __setattr__(self, key, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("CSRGraph is frozen; derive a new graph with subgraph() instead.")
+        object.__setattr__(self, key, value)
+
+    def __getstate__(self):
+        # The name index and derived adjacencies are rebuilt lazily on the receiving side
+        state = dict(self.__dict__)
+        state['_derived'] = {}
+        return state
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+
+    def __len__(self):
+        return self.n
+
+    def is_directed(self):
+        return self.directed
+
+    # --- Conversion ---
+    @classmethod
+    def from_networkx(cls, G):
+        """Builds a CSRGraph from a networkx graph, e.g. the one returned by get_central_districts_graph_by_segment_logic."""
+        names = list(G.nodes())
+        index = {node: i for i, node in enumerate(names)}
+
+        def _float(value):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return np.nan
+
+        def _codes(values, labels):
+            lookup = {label: i for i, label in enumerate(labels)}
+            codes = []
+            for value in values:
+                if value is None:
+                    codes.append(-1)
+                    continue
+                if value not in lookup:
+                    lookup[value] = len(labels)
+                    labels.append(value)
+                codes.append(lookup[value])
+            return np.array(codes, dtype=np.int16)
+
+        node_data = [d for _, d in G.nodes(data=True)]
+        mode_labels, type_labels = [], []
+        edges = list(G.edges(data=True))
+        return cls(
+            len(names),
+            np.fromiter((index[u] for u, _, _ in edges), dtype=np.int32, count=len(edges)),
+            np.fromiter((index[v] for _, v, _ in edges), dtype=np.int32, count=len(edges)),
+            directed=G.is_directed(),
+            names=names,
+            lon=np.array([_float(d.get('lon')) for d in node_data], dtype=np.float64),
+            lat=np.array([_float(d.get('lat')) for d in node_data], dtype=np.float64),
+            mode=_codes([d.get('mode') for d in node_data], mode_labels),
+            mode_labels=mode_labels,
+            length=np.array([_float(d.get('length')) for _, _, d in edges], dtype=np.float64),
+            etype=_codes([d.get('type') for _, _, d in edges], type_labels),
+            type_labels=type_labels,
+        )
+
+    def to_networkx(self, node_mask=None, edge_mask=None):
+        """Converts back to a networkx graph, keeping only alive nodes/edges and the columnar attributes."""
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        alive = np.ones(self.n, dtype=bool) if node_mask is None else np.asarray(node_mask, dtype=bool)
+        for i in np.flatnonzero(alive):
+            attrs = {}
+            if not np.isnan(self.lon[i]): attrs['lon'] = float(self.lon[i])
+            if not np.isnan(self.lat[i]): attrs['lat'] = float(self.lat[i])
+            if self.mode[i] >= 0: attrs['mode'] = self.mode_labels[self.mode[i]]
+            G.add_node(self.names[i], **attrs)
+        for e in np.flatnonzero(self.alive_edges(node_mask, edge_mask)):
+            attrs = {}
+            if not np.isnan(self.length[e]): attrs['length'] = float(self.length[e])
+            if self.etype[e] >= 0: attrs['type'] = self.type_labels[self.etype[e]]
+            G.add_edge(self.names[self.src[e]], self.names[self.dst[e]], **attrs)
+        return G
+
+    def subgraph(self, node_mask, edge_mask=None):
+        """Returns a compact, re-indexed CSRGraph of the alive nodes and edges."""
+        node_mask = np.asarray(node_mask, dtype=bool)
+        keep = self.alive_edges(node_mask, edge_mask)
+        new_ids = np.cumsum(node_mask, dtype=np.int64) - 1
+        return CSRGraph(
+            int(np.count_nonzero(node_mask)), new_ids[self.src[keep]], new_ids[self.dst[keep]],
+            directed=self.directed, names=[self.names[i] for i in np.flatnonzero(node_mask)],
+            lon=self.lon[node_mask], lat=self.lat[node_mask], mode=self.mode[node_mask], mode_labels=self.mode_labels,
+            length=self.length[keep], etype=self.etype[keep], type_labels=self.type_labels,
+        )
+
+    # --- Transport between processes ---
+    ARRAY_FIELDS = ('src', 'dst', 'length', 'etype', 'lon', 'lat', 'mode', 'indptr', 'indices', 'edge_ids')
+
+    def export_arrays(self):
+        """(meta, arrays): a small picklable header plus every numeric array, e.g. for shared memory."""
+        arrays = {field: getattr(self, field) for field in self.ARRAY_FIELDS}
+        if self.directed:
+            arrays['und_indptr'], arrays['und_indices'], arrays['und_edge_ids'] = self.undirected_adjacency()
+        meta = {'n': self.n, 'm': self.m, 'directed': self.directed,
+                'mode_labels': self.mode_labels, 'type_labels': self.type_labels}
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta, arrays, names=None):
+        """Rebuilds a CSRGraph around existing arrays (e.g. shared-memory views) without copying them."""
+        graph = object.__new__(cls)
+        state = dict(meta, _derived={}, names=list(range(meta['n'])) if names is None else list(names))
+        for field in cls.ARRAY_FIELDS:
+            state[field] = arrays[field]
+        if 'und_indptr' in arrays:
+            state['_derived']['undirected'] = (arrays['und_indptr'], arrays['und_indices'], arrays['und_edge_ids'])
+        state['_frozen'] = True
+        graph.__setstate__(state)
+        return graph
+
+    # --- Lookups and derived structures ---
+    @property
+    def index(self):
+        if 'index' not in self._derived:
+            self._derived['index'] = {node: i for i, node in enumerate(self.names)}
+        return self._derived['index']
+
+    def node_ids(self, nodes):
+        """Maps node keys to int32 ids, dropping unknown nodes and repeats (first occurrence wins)."""
+        index = self.index
+        ids = dict.fromkeys(index[node] for node in nodes if node in index)
+        return np.fromiter(ids, dtype=np.int32, count=len(ids))
+
+    @property
+    def edge_index(self):
+        """(u, v) key -> edge row; undirected edges are found under both orientations (first row wins)."""
+        if 'edge_index' not in self._derived:
+            names, index = self.names, {}
+            for e, (u, v) in enumerate(zip(self.src.tolist(), self.dst.tolist())):
+                index.setdefault((names[u], names[v]), e)
+                if not self.directed:
+                    index.setdefault((names[v], names[u]), e)
+            self._derived['edge_index'] = index
+        return self._derived['edge_index']
+
+    def edge_rows(self, edges):
+        """Maps (u, v) edge keys to int32 edge rows, dropping unknown edges and repeats (first occurrence wins)."""
+        index = self.edge_index
+        rows = dict.fromkeys(index[tuple(edge)] for edge in edges if tuple(edge) in index)
+        return np.fromiter(rows, dtype=np.int32, count=len(rows))
+
+    def alive_edges(self, node_mask=None, edge_mask=None):
+        """Boolean edge mask of edges whose endpoints are both alive."""
+        alive = np.ones(self.m, dtype=bool) if edge_mask is None else np.array(edge_mask, dtype=bool)
+        if node_mask is not None:
+            node_mask = np.asarray(node_mask, dtype=bool)
+            alive &= node_mask[self.src] & node_mask[self.dst]
+        return alive
+
+    def degree(self):
+        """Total degree per node (in + out for directed graphs, self-loops counted twice)."""
+        return (np.bincount(self.src, minlength=self.n) + np.bincount(self.dst, minlength=self.n)).astype(np.int64)
+
+    def undirected_adjacency(self):
+        """(indptr, indices, edge_ids) with every edge walkable in both directions (weak connectivity)."""
+        if not self.directed:
+            return self.indptr, self.indices, self.edge_ids
+        if 'undirected' not in self._derived:
+            tail = np.concatenate([self.src, self.dst])
+            head = np.concatenate([self.dst, self.src])
+            slot_edges = np.concatenate([np.arange(self.m, dtype=np.int32)] * 2)
+            order = np.argsort(tail, kind='stable')
+            indptr = np.zeros(self.n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(tail, minlength=self.n), out=indptr[1:])
+            self._derived['undirected'] = (indptr, head[order].astype(np.int32), slot_edges[order])
+        return self._derived['undirected']
+
+    def to_scipy(self, node_mask=None, edge_mask=None, weight=None):
+        """
+        Sparse (n x n) adjacency matrix of the alive edges for scipy.sparse.csgraph kernels.
+        - weight=None stores ones; otherwise an edge-aligned weight array, parallel edges keep the minimum.
+        - Removed nodes keep their row/column but have no edges.
+        """
+        keep = self.alive_edges(node_mask, edge_mask)
+        rows, cols = self.src[keep], self.dst[keep]
+        if weight is None:
+            data = np.ones(len(rows), dtype=np.float64)
+        else:
+            data = np.asarray(weight, dtype=np.float64)[keep]
+            if len(rows):
+                # Collapse parallel edges to their minimum weight (scipy would otherwise sum them)
+                order = np.lexsort((data, cols, rows))
+                rows, cols, data = rows[order], cols[order], data[order]
+                first = np.ones(len(rows), dtype=bool)
+                first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+                rows, cols, data = rows[first], cols[first], data[first]
+        return sp.csr_matrix((data, (rows, cols)), shape=(self.n, self.n))
+
+    def largest_component_size(self, node_mask=None, edge_mask=None, connection='weak'):
+        """
+        Size of the largest connected component among the alive nodes.
+        - connection='weak' or 'strong' (the two coincide on undirected graphs).
+        - 'in' / 'out': the giant strongly connected component plus every node that can reach it / that it
+          reaches (the first largest SCC wins ties).
+        """
+        alive_count = self.n if node_mask is None else int(np.count_nonzero(node_mask))
+        if alive_count == 0:
+            return 0
+        matrix = self.to_scipy(node_mask, edge_mask)
+        _, labels = connected_components(matrix, directed=self.directed,
+                                         connection='weak' if connection == 'weak' else 'strong')
+        alive_ids = np.arange(self.n) if node_mask is None else np.flatnonzero(node_mask)
+        sizes = np.bincount(labels[alive_ids])
+        if connection in ('weak', 'strong') or not self.directed:
+            return int(sizes.max())
+
+        # Every node of the giant SCC reaches (and is reached by) all of it, so one BFS from any member suffices
+        hub = alive_ids[np.flatnonzero(labels[alive_ids] == np.argmax(sizes))[0]]
+        if connection == 'in':
+            matrix = matrix.T.tocsr()
+        return len(breadth_first_order(matrix, hub, directed=True, return_predecessors=False))
+
+
+def as_csr(G):
+    """Returns G as a CSRGraph, converting networkx graphs once."""
+    return G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
 
 
 # ============================================================================
@@ -14,8 +313,16 @@ def get_node_removal_order(G, strategy='random', seed=42):
     """
     Returns a list of nodes for removal based on the specified strategy.
     - 'random' strategy is now determined by a controllable random seed.
-    - Approximate calculation for 'betweenness' strategy also uses a fixed seed.
+    - 'betweenness' is exact (parallel Brandes, see betweenness_arrays) instead of sampled with a fixed seed.
+    - 'adaptive_degree' recomputes degrees after every removal (bucket queue on the CSR core, O(N + M)).
+    - G may be a networkx graph or a CSRGraph; node keys are returned in both cases.
     """
+    if isinstance(G, CSRGraph):
+        return [G.names[i] for i in _removal_order_ids(G, strategy, seed)]
+
+    if strategy in ('adaptive_degree', 'betweenness'):
+        return get_node_removal_order(CSRGraph.from_networkx(G), strategy, seed)
+
     if strategy == 'random':
         nodes = list(G.nodes())
         random.Random(seed).shuffle(nodes)
@@ -25,108 +332,845 @@ def get_node_removal_order(G, strategy='random', seed=42):
         degree_func = lambda n: G.in_degree(n) + G.out_degree(n) if G.is_directed() else G.degree(n)
         return sorted(G.nodes(), key=degree_func, reverse=True)
 
+    raise ValueError(f"Unknown attack strategy: {strategy}")
+
+
+def _removal_order_ids(csr, strategy='random', seed=42):
+    """Same orders as get_node_removal_order, as int32 node ids of a CSRGraph."""
+    if strategy == 'random':
+        ids = list(range(csr.n))
+        random.Random(seed).shuffle(ids)  # Same permutation as shuffling the node list
+        return np.array(ids, dtype=np.int32)
+
+    if strategy == 'degree':
+        # Stable sort on descending degree, matching sorted(..., reverse=True)
+        return np.argsort(-csr.degree(), kind='stable').astype(np.int32)
+
+    if strategy == 'adaptive_degree':
+        return _adaptive_degree_order(csr)
+
     if strategy == 'betweenness':
-        print("    > Calculating betweenness centrality (may be very time-consuming)...")
-        k = int(0.1 * len(G)) if len(G) > 2000 else None
-        centrality = nx.betweenness_centrality(G, k=k, normalized=True, seed=42)
+        print("    > Calculating exact betweenness centrality...")
+        node_bc, _ = betweenness_arrays(csr)
         print("    > ...Betweenness centrality calculation complete.")
-        return sorted(centrality, key=centrality.get, reverse=True)
+        # Stable sort on descending centrality, matching sorted(..., reverse=True)
+        return np.argsort(-node_bc, kind='stable').astype(np.int32)
 
     raise ValueError(f"Unknown attack strategy: {strategy}")
 
 
-def _run_single_attack_simulation(args):
+def _adaptive_degree_order(csr):
     """
-    Internal function for multiprocessing single attack simulations. This is the core worker function for resilience calculation.
+    Adaptive (recalculated) degree attack: always removes a node of highest degree in the remaining graph.
+    - Degrees (in + out, as for 'degree') sit in a bucket queue of doubly linked lists; removing a node moves
+      each surviving neighbour down one bucket per shared edge in O(1), so the whole order costs O(N + M).
+    - Ties go to the lowest node id at first, then to the most recently updated node.
     """
-    G_original, nodes_to_attack, removal_steps = args
-    G = G_original.copy()
-    n_nodes_initial = G.number_of_nodes()
+    n = csr.n
+    indptr, indices, _ = csr.undirected_adjacency()
+    indptr, indices = indptr.tolist(), indices.tolist()
+    degree = csr.degree().tolist()
+    head = [-1] * (max(degree, default=0) + 1)
+    next_node, prev_node = [-1] * n, [-1] * n
 
-    get_components = nx.weakly_connected_components if G.is_directed() else nx.connected_components
+    def _push(v, d):
+        next_node[v], prev_node[v] = head[d], -1
+        if head[d] != -1:
+            prev_node[head[d]] = v
+        head[d] = v
 
-    try:
-        s0 = len(max(get_components(G), key=len))
-    except ValueError:
-        return []  # Graph is empty or has no edges
+    def _unlink(v, d):
+        if prev_node[v] != -1:
+            next_node[prev_node[v]] = next_node[v]
+        else:
+            head[d] = next_node[v]
+        if next_node[v] != -1:
+            prev_node[next_node[v]] = prev_node[v]
+
+    for v in range(n - 1, -1, -1):  # Pushed in reverse so the lowest id leads each bucket
+        _push(v, degree[v])
+
+    removed = [False] * n
+    order = []
+    top = len(head) - 1
+    for _ in range(n):
+        # Degrees only ever decrease, so the highest non-empty bucket only moves down
+        while head[top] == -1:
+            top -= 1
+        v = head[top]
+        _unlink(v, top)
+        removed[v] = True
+        order.append(v)
+        for j in range(indptr[v], indptr[v + 1]):
+            w = indices[j]
+            if removed[w]:
+                continue
+            _unlink(w, degree[w])
+            degree[w] -= 1
+            _push(w, degree[w])
+
+    return np.array(order, dtype=np.int32)
+
+
+def get_edge_removal_order(G, strategy='random', seed=42, type_priority=()):
+    """
+    Returns a list of edges (u, v) for removal based on the specified strategy.
+    - 'random' is determined by a controllable random seed; 'betweenness' removes the edges of highest exact
+      edge betweenness first.
+    - Any other strategy names an edge attribute (e.g. 'length'): highest values first, edges without it last.
+      On a CSRGraph only 'length' and 'type' are available.
+    - type_priority lists edge types to remove first, in that order; e.g. strategy='length' with
+      type_priority=('walk',) gives longest-walk-transfer-first. Every group keeps the strategy's order.
+    - G may be a networkx graph or a CSRGraph.
+    """
+    csr = as_csr(G)
+    if strategy in ('random', 'betweenness', 'length'):
+        rows = _edge_removal_order_ids(csr, strategy, seed)
+    else:
+        if strategy == 'type':
+            values = [csr.type_labels[code] if code >= 0 else None for code in csr.etype.tolist()]
+        elif isinstance(G, CSRGraph):
+            raise ValueError(f"Edge attribute '{strategy}' is not kept by CSRGraph; pass the networkx graph.")
+        else:
+            values = [d.get(strategy) for _, _, d in G.edges(data=True)]
+        ranked = sorted((e for e, value in enumerate(values) if value is not None), key=values.__getitem__,
+                        reverse=True)
+        rows = np.array(ranked + [e for e, value in enumerate(values) if value is None], dtype=np.int32)
+
+    if type_priority:
+        labels = [csr.type_labels[code] if code >= 0 else None for code in csr.etype.tolist()]
+        priority = {edge_type: i for i, edge_type in enumerate(type_priority)}
+        group = np.array([priority.get(label, len(priority)) for label in labels], dtype=np.int64)
+        rows = rows[np.argsort(group[rows], kind='stable')]
+
+    return [(csr.names[csr.src[e]], csr.names[csr.dst[e]]) for e in rows]
+
+
+def _edge_removal_order_ids(csr, strategy='random', seed=42):
+    """Edge counterpart of _removal_order_ids: edge rows for 'random', 'betweenness' and 'length'."""
+    if strategy == 'random':
+        rows = list(range(csr.m))
+        random.Random(seed).shuffle(rows)
+        return np.array(rows, dtype=np.int32)
+
+    if strategy == 'betweenness':
+        _, edge_bc = betweenness_arrays(csr)
+        return np.argsort(-edge_bc, kind='stable').astype(np.int32)
+
+    if strategy == 'length':
+        # NaN (missing) lengths sort last
+        return np.argsort(-csr.length, kind='stable').astype(np.int32)
+
+    return csr.edge_rows(get_edge_removal_order(csr, strategy, seed))
+
+
+def _percolation_lcc_trajectory(indptr, indices, n_nodes, removal_order):
+    """
+    Reverse union-find (Newman-Ziff) replay of a node removal order.
+    - indptr/indices are Python lists of an adjacency walkable in both directions (weak connectivity).
+    - removal_order holds distinct node ids; nodes not in it are never removed.
+    - Returns the LCC size after k removals for k = 0..len(removal_order).
+    """
+    parent = list(range(n_nodes))
+    size = [1] * n_nodes
+    present = [False] * n_nodes
+    is_removed = [False] * n_nodes
+    for i in removal_order:
+        is_removed[i] = True
+    largest = 0
+
+    # Nodes that are never attacked are present from the start; attacked nodes are then re-added last-removed first
+    replay = [i for i in range(n_nodes) if not is_removed[i]]
+    n_initial_batch = len(replay)
+    replay.extend(reversed(removal_order))
+
+    lcc_after_removals = [0] * (len(removal_order) + 1)
+    for step, v in enumerate(replay):
+        present[v] = True
+        if largest == 0:
+            largest = 1
+        for j in range(indptr[v], indptr[v + 1]):
+            w = indices[j]
+            if not present[w]:
+                continue
+            # Find both roots with path halving
+            root_v = v
+            while parent[root_v] != root_v:
+                parent[root_v] = parent[parent[root_v]]
+                root_v = parent[root_v]
+            root_w = w
+            while parent[root_w] != root_w:
+                parent[root_w] = parent[parent[root_w]]
+                root_w = parent[root_w]
+            if root_v == root_w:
+                continue
+            # Union by size
+            if size[root_v] < size[root_w]:
+                root_v, root_w = root_w, root_v
+            parent[root_w] = root_v
+            size[root_v] += size[root_w]
+            if size[root_v] > largest:
+                largest = size[root_v]
+        if step + 1 >= n_initial_batch:
+            # After re-adding this node, exactly (len(replay) - step - 1) attacked nodes are still removed
+            lcc_after_removals[len(replay) - step - 1] = largest
+
+    return lcc_after_removals
+
+
+def _run_single_attack_simulation(csr, nodes_to_attack, removal_steps, connection='weak'):
+    """
+    Internal function for single attack simulations. This is the core step-wise worker for resilience calculation.
+    Runs on a CSRGraph: removed nodes are tracked in a boolean mask instead of a graph copy.
+    connection selects the giant component measured (see CSRGraph.largest_component_size).
+    Returns the (q_fraction, S_fraction) points of the curve as arrays, or None for an empty graph.
+    """
+    n_nodes_initial = csr.n
+    if n_nodes_initial == 0:
+        return None  # Graph is empty
+
+    alive = np.ones(n_nodes_initial, dtype=bool)
+    s0 = csr.largest_component_size(alive, connection=connection)
     if s0 == 0: s0 = 1  # Avoid division by zero
 
     results = [(1.0, 0.0)]  # (S_fraction, q_fraction)
     step_size = max(1, n_nodes_initial // removal_steps)
 
     for i in range(0, n_nodes_initial, step_size):
-        nodes_to_remove_this_step = nodes_to_attack[i: i + step_size]
-        G.remove_nodes_from([n for n in nodes_to_remove_this_step if n in G])
+        alive[nodes_to_attack[i: i + step_size]] = False
+        n_alive = int(np.count_nonzero(alive))
 
-        if G.number_of_nodes() == 0:
+        if n_alive == 0:
             if results[-1][1] < 1.0:
                 results.append((0.0, 1.0))
             break
 
-        try:
-            s_current = len(max(get_components(G), key=len))
-        except ValueError:
-            s_current = 0
-
-        S_fraction = s_current / s0
-        q_fraction = (n_nodes_initial - G.number_of_nodes()) / n_nodes_initial
+        S_fraction = csr.largest_component_size(alive, connection=connection) / s0
+        q_fraction = (n_nodes_initial - n_alive) / n_nodes_initial
         results.append((S_fraction, q_fraction))
 
-    return results
+    s_res, q_res = zip(*results)
+    return np.array(q_res), np.array(s_res)
 
 
-def run_resilience_analysis(G, attack_scenario, num_tests=1, removal_steps=50):
+def _run_single_percolation_simulation(csr, nodes_to_attack, removal_steps):
     """
-    Unified resilience analysis function (Version 2.2 - Interface Alignment).
-    Focuses on receiving pre-ordered attack lists and executing simulations.
+    Internal worker for the reverse union-find (Newman-Ziff) percolation engine.
+    - Replays the removal order backwards, adding nodes back into a union-find structure.
+    - Yields the exact LCC size after every single removal in near-linear time, instead of
+      recomputing the components of the whole remaining graph after each removal batch.
+    - Returns the same (q_fraction, S_fraction) arrays as the step-wise worker.
+    """
+    n_nodes_initial = csr.n
+    if n_nodes_initial == 0:
+        return None  # Graph is empty
+
+    indptr, indices, _ = csr.undirected_adjacency()
+    lcc_after_removals = np.array(_percolation_lcc_trajectory(indptr.tolist(), indices.tolist(), n_nodes_initial,
+                                                              nodes_to_attack.tolist()), dtype=np.float64)
+
+    s0 = lcc_after_removals[0] or 1  # Avoid division by zero
+    return np.arange(len(lcc_after_removals)) / n_nodes_initial, lcc_after_removals / s0
+
+
+def _strong_component_labels(num_nodes, tails, heads):
+    """
+    Strong component label of every node of a small edge list (iterative Tarjan).
+    Large edge lists go to scipy instead; below a few hundred edges its setup cost outweighs the search.
+    """
+    if len(tails) > 512:
+        _, labels = connected_components(sp.csr_matrix((np.ones(len(tails)), (tails, heads)),
+                                                       shape=(num_nodes, num_nodes)),
+                                         directed=True, connection='strong')
+        return labels.tolist()
+
+    adjacency = [[] for _ in range(num_nodes)]
+    for u, v in zip(tails, heads):
+        adjacency[u].append(v)
+    index, low, labels = [-1] * num_nodes, [0] * num_nodes, [-1] * num_nodes
+    on_stack = [False] * num_nodes
+    stack, counter, num_labels = [], 0, 0
+    for root in range(num_nodes):
+        if index[root] >= 0:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work[-1]
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            if i < len(adjacency[v]):
+                work[-1] = (v, i + 1)
+                w = adjacency[v][i]
+                if index[w] < 0:
+                    work.append((w, 0))
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                continue
+            work.pop()
+            if work:
+                parent_v = work[-1][0]
+                low[parent_v] = min(low[parent_v], low[v])
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    labels[w] = num_labels
+                    if w == v:
+                        break
+                num_labels += 1
+    return labels
+
+
+def _strong_percolation_lcc_trajectory(csr, removal_order):
+    """
+    Largest strongly connected component after k removals for k = 0..len(removal_order), without rerunning
+    Tarjan on the whole graph at every step (offline incremental SCC).
+    - Replaying the removals backwards, an edge appears when its later endpoint is re-added. A divide-and-conquer
+      over time finds, for every edge, the first time both endpoints share an SCC: strong components of the
+      edges present at the midpoint, on nodes contracted through a union-find. Each edge takes part in
+      O(log N) of these (small) component searches.
+    - The SCCs at any time are the components of the edges merged by then, replayed with a size-tracking union-find.
+    """
+    n_nodes, num_removed = csr.n, len(removal_order)
+    # Time t = number of attacked nodes re-added; never-attacked nodes are present from t = 0
+    add_time = np.zeros(n_nodes, dtype=np.int64)
+    add_time[np.asarray(removal_order, dtype=np.int64)[::-1]] = np.arange(1, num_removed + 1)
+    loops = csr.src == csr.dst
+    src, dst = csr.src[~loops].tolist(), csr.dst[~loops].tolist()
+    edge_time = np.maximum(add_time[csr.src[~loops]], add_time[csr.dst[~loops]]).tolist()
+    never = num_removed + 1
+    merge_time = [never] * len(src)
+    parent = list(range(n_nodes))
+
+    def _find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def _solve(lo, hi, edges):
+        # Invariant: every edge in `edges` merges at some time in [lo, hi] (hi == never: possibly not at all)
+        if not edges:
+            return
+        if lo == hi:
+            if lo == never:
+                return
+            for e in edges:
+                merge_time[e] = lo
+                root_u, root_v = _find(src[e]), _find(dst[e])
+                if root_u != root_v:
+                    parent[root_v] = root_u
+            return
+        mid = (lo + hi) // 2
+        present = [e for e in edges if edge_time[e] <= mid]
+        later = [e for e in edges if edge_time[e] > mid]
+        if not present:
+            _solve(mid + 1, hi, later)
+            return
+
+        # Strong components of the present edges on contracted nodes, relabelled 0..k-1
+        local = {}
+        tails = [local.setdefault(_find(src[e]), len(local)) for e in present]
+        heads = [local.setdefault(_find(dst[e]), len(local)) for e in present]
+        labels = _strong_component_labels(len(local), tails, heads)
+        merged, unmerged = [], later
+        for e, u, v in zip(present, tails, heads):
+            (merged if labels[u] == labels[v] else unmerged).append(e)
+        _solve(lo, mid, merged)
+        _solve(mid + 1, hi, unmerged)
+
+    _solve(0, never, list(range(len(src))))
+
+    # Replay merges in time order; isolated alive nodes still form SCCs of size one
+    parent = list(range(n_nodes))
+    size = [1] * n_nodes
+    largest = 1
+    by_time = sorted(range(len(src)), key=merge_time.__getitem__)
+    position = 0
+    lcc_after_removals = [0] * (num_removed + 1)
+    for t in range(num_removed + 1):
+        while position < len(by_time) and merge_time[by_time[position]] <= t:
+            root_u, root_v = _find(src[by_time[position]]), _find(dst[by_time[position]])
+            position += 1
+            if root_u != root_v:
+                if size[root_u] < size[root_v]:
+                    root_u, root_v = root_v, root_u
+                parent[root_v] = root_u
+                size[root_u] += size[root_v]
+                largest = max(largest, size[root_u])
+        alive = n_nodes - num_removed + t
+        lcc_after_removals[num_removed - t] = largest if alive > 0 else 0
+
+    return lcc_after_removals
+
+
+def _run_single_scc_simulation(csr, nodes_to_attack, removal_steps):
+    """
+    Internal worker for the strongly connected giant component: exact SCC size after every single removal
+    (see _strong_percolation_lcc_trajectory). On undirected graphs this is the percolation engine.
+    Returns the same (q_fraction, S_fraction) arrays as the other workers.
+    """
+    if not csr.directed:
+        return _run_single_percolation_simulation(csr, nodes_to_attack, removal_steps)
+    n_nodes_initial = csr.n
+    if n_nodes_initial == 0:
+        return None  # Graph is empty
+
+    lcc_after_removals = np.array(_strong_percolation_lcc_trajectory(csr, nodes_to_attack), dtype=np.float64)
+    s0 = lcc_after_removals[0] or 1  # Avoid division by zero
+    return np.arange(len(lcc_after_removals)) / n_nodes_initial, lcc_after_removals / s0
+
+
+def _bond_percolation_lcc_trajectory(src, dst, n_nodes, removal_order):
+    """
+    Reverse union-find replay of an edge removal order (bond percolation), with weak connectivity.
+    - src/dst are Python lists of edge endpoints; removal_order holds distinct edge rows.
+    - Returns the LCC size after k edge removals for k = 0..len(removal_order).
+    """
+    parent = list(range(n_nodes))
+    size = [1] * n_nodes
+    largest = 1 if n_nodes else 0
+
+    def _add_edge(u, v):
+        # Find both roots with path halving, then union by size
+        while parent[u] != u:
+            parent[u] = parent[parent[u]]
+            u = parent[u]
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        if u == v:
+            return 0
+        if size[u] < size[v]:
+            u, v = v, u
+        parent[v] = u
+        size[u] += size[v]
+        return size[u]
+
+    # Edges that are never attacked are present from the start; attacked edges are then re-added last-removed first
+    is_removed = [False] * len(src)
+    for e in removal_order:
+        is_removed[e] = True
+    for e in range(len(src)):
+        if not is_removed[e]:
+            largest = max(largest, _add_edge(src[e], dst[e]))
+
+    num_removed = len(removal_order)
+    lcc_after_removals = [0] * (num_removed + 1)
+    lcc_after_removals[num_removed] = largest
+    for step, e in enumerate(reversed(removal_order)):
+        largest = max(largest, _add_edge(src[e], dst[e]))
+        lcc_after_removals[num_removed - step - 1] = largest
+
+    return lcc_after_removals
+
+
+def _run_single_bond_percolation_simulation(csr, edges_to_attack, removal_steps):
     """
+    Internal worker for link removal: the percolation engine's reverse union-find, replaying edges instead of nodes.
+    Returns (q_fraction, S_fraction) arrays with q the fraction of edges removed, or None for a graph without edges.
+    """
+    if csr.m == 0:
+        return None  # No links to remove
+
+    lcc_after_removals = np.array(_bond_percolation_lcc_trajectory(csr.src.tolist(), csr.dst.tolist(), csr.n,
+                                                                   edges_to_attack.tolist()), dtype=np.float64)
+
+    s0 = lcc_after_removals[0] or 1  # Avoid division by zero
+    return np.arange(len(lcc_after_removals)) / csr.m, lcc_after_removals / s0
+
+
+# Distance rows computed per shortest-path batch, bounded so one (batch x n) block stays around 32 MB
+EFFICIENCY_BLOCK_CELLS = 1 << 22
+EARTH_RADIUS_M = 6371000.0
+
+
+def _haversine(lon1, lat1, lon2, lat2):
+    """Great-circle distance in metres between (broadcastable) arrays of coordinates in degrees."""
+    lon1, lat1, lon2, lat2 = (np.radians(a) for a in (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _radian_coordinates(csr):
+    """(lon, lat, cos(lat)) of every node in radians, precomputed once for the blockwise haversine kernel."""
+    lon, lat = np.radians(csr.lon), np.radians(csr.lat)
+    return lon, lat, np.cos(lat)
+
+
+def _haversine_rows(coords, rows, cols):
+    """
+    (len(rows), len(cols)) block of great-circle distances in metres from precomputed radian coordinates.
+    Computed in place, so a block costs about two float64 buffers of its size.
+    """
+    lon, lat, cos_lat = coords
+    a = lat[cols] - lat[rows, None]
+    a *= 0.5
+    np.sin(a, out=a)
+    a *= a
+    b = lon[cols] - lon[rows, None]
+    b *= 0.5
+    np.sin(b, out=b)
+    b *= b
+    b *= cos_lat[rows, None]
+    b *= cos_lat[cols]
+    a += b
+    np.minimum(a, 1.0, out=a)
+    np.sqrt(a, out=a)
+    np.arcsin(a, out=a)
+    a *= 2 * EARTH_RADIUS_M
+    return a
+
+
+def _detour_rows(csr, lengths, sources, alive_ids, coords=None):
+    """Per source, the sum over the alive nodes it reaches of straight-line / network distance (E_geospatial)."""
+    coords = coords or _radian_coordinates(csr)
+    d = shortest_path(lengths, method='D', directed=csr.directed, indices=sources)[:, alive_ids]
+    crow = _haversine_rows(coords, sources, alive_ids)
+    reached = np.isfinite(d) & (d > 0)
+    np.divide(crow, d, out=crow, where=reached)
+    crow[~reached] = 0.0
+    return crow.sum(axis=1)
+
+
+def _detour_sum(csr, lengths, sources, alive_ids, coords=None):
+    """Sum of _detour_rows over all `sources`."""
+    return float(_detour_rows(csr, lengths, sources, alive_ids, coords).sum())
+
+
+def _map_blocks(func, sources, block, num_threads=None):
+    """
+    [func(rows) for consecutive blocks of `sources`], on up to num_threads threads (default: one per core,
+    one inside pool workers). The NumPy and scipy kernels release the GIL; results come back in block order.
+    """
+    blocks = [sources[start:start + block] for start in range(0, len(sources), block)]
+    if num_threads is None:
+        num_threads = 1 if multiprocessing.current_process().daemon else cpu_count()
+    num_threads = max(1, min(num_threads, len(blocks)))
+    if num_threads == 1:
+        return [func(rows) for rows in blocks]
+    with ThreadPoolExecutor(num_threads) as pool:
+        return list(pool.map(func, blocks))
+
+
+def _sum_over_blocks(func, sources, block, num_threads=None):
+    """
+    Sum of func(rows) (a number or array) over consecutive blocks of `sources` (see _map_blocks). Partial sums
+    are added in block order, so results do not depend on scheduling.
+    """
+    partials = _map_blocks(func, sources, block, num_threads)
+    return sum(partials[1:], partials[0]) if partials else 0.0
+
+
+def geospatial_efficiency(G, node_mask=None, edge_mask=None, num_sources=None, seed=0, chunk_rows=None,
+                          num_threads=None):
+    """
+    E_geospatial alone, streamed in blocks of source rows: Dijkstra on haversine edge lengths for a block,
+    paired with the block's haversine distances (NumPy broadcasting), reduced, then discarded.
+    - Peak memory is O(chunk_rows * N) per thread (default chunk_rows: EFFICIENCY_BLOCK_CELLS // N),
+      never a dense N x N matrix.
+    - Blocks run on num_threads threads; see efficiency_metrics for the definition and num_sources/seed.
+    """
+    return efficiency_metrics(G, node_mask, edge_mask, num_sources, seed, chunk_rows=chunk_rows,
+                              num_threads=num_threads, hops=False)[1]
+
+
+def efficiency_metrics(G, node_mask=None, edge_mask=None, num_sources=None, seed=0, geo_weight=None, chunk_rows=None,
+                       num_threads=None, hops=True):
+    """
+    (E, E_geospatial) of the alive part of G, from batched multi-source shortest paths (scipy).
+    - E: global efficiency, the mean of 1/d_ij over ordered pairs of distinct alive nodes (hop distances,
+      directed if G is; equals nx.global_efficiency on undirected graphs). Unreachable pairs contribute 0.
+    - E_geospatial: the mean of straight-line / network distance over the same pairs, the network distance
+      summing the straight-line lengths of the edges walked (so units cancel). NaN without coordinates.
+    - num_sources: estimate both from that many alive sources drawn with `seed` instead of all of them.
+    - geo_weight: precomputed edge-aligned straight-line lengths (see _run_efficiency_trajectory).
+    - Sources are processed in blocks of chunk_rows (memory O(chunk_rows * N)) on num_threads threads
+      (see _sum_over_blocks); hops=False skips E (returned as NaN).
+    """
+    csr = as_csr(G)
+    alive_ids = np.arange(csr.n) if node_mask is None else np.flatnonzero(node_mask)
+    n_alive = len(alive_ids)
+    if n_alive < 2:
+        return 0.0, 0.0
+    sources = alive_ids
+    if num_sources is not None and num_sources < n_alive:
+        sources = np.sort(np.random.default_rng(seed).choice(alive_ids, num_sources, replace=False))
+
+    if geo_weight is None:
+        geo_weight = _haversine(csr.lon[csr.src], csr.lat[csr.src], csr.lon[csr.dst], csr.lat[csr.dst])
+    has_geo = not np.isnan(csr.lon[alive_ids]).any() and not np.isnan(csr.lat[alive_ids]).any()
+    hop_matrix = csr.to_scipy(node_mask, edge_mask) if hops else None
+    lengths = csr.to_scipy(node_mask, edge_mask, weight=np.nan_to_num(geo_weight)) if has_geo else None
+    coords = _radian_coordinates(csr)
+
+    def _block_sums(rows):
+        inverse_sum, detour_sum = 0.0, 0.0
+        if hops:
+            d = shortest_path(hop_matrix, directed=csr.directed, unweighted=True, indices=rows)[:, alive_ids]
+            reached = np.isfinite(d) & (d > 0)
+            inverse_sum = np.sum(1.0 / d[reached])
+        if has_geo:
+            detour_sum = _detour_sum(csr, lengths, rows, alive_ids, coords)
+        return np.array([inverse_sum, detour_sum])
+
+    block = chunk_rows or max(1, EFFICIENCY_BLOCK_CELLS // csr.n)
+    inverse_sum, detour_sum = _sum_over_blocks(_block_sums, sources, block, num_threads)
+
+    pairs = len(sources) * (n_alive - 1)
+    return (inverse_sum / pairs if hops else np.nan), (detour_sum / pairs if has_geo else np.nan)
+
+
+def _run_efficiency_trajectory(csr, order, removal_steps, num_sources=None, seed=0, edges=False):
+    """
+    (q_fraction, E, E_geospatial) after each of the removal_steps batches of an attack order, like the stepwise
+    worker; order holds node ids, or edge rows if edges=True. Sampled sources are redrawn among the alive nodes.
+    """
+    total = csr.m if edges else csr.n
+    if total == 0:
+        return None
+    geo_weight = _haversine(csr.lon[csr.src], csr.lat[csr.src], csr.lon[csr.dst], csr.lat[csr.dst])
+    alive = np.ones(total, dtype=bool)
+
+    def _measure():
+        mask = {'edge_mask': alive} if edges else {'node_mask': alive}
+        return efficiency_metrics(csr, num_sources=num_sources, seed=seed, geo_weight=geo_weight, **mask)
+
+    results = [(0.0,) + _measure()]
+    step_size = max(1, total // removal_steps)
+    # Unlike S, efficiency is costly to measure: stop once the order is exhausted (the curve stays flat after)
+    for i in range(0, len(order), step_size):
+        alive[order[i: i + step_size]] = False
+        n_alive = int(np.count_nonzero(alive))
+        results.append(((total - n_alive) / total,) + _measure())
+        if n_alive == 0:
+            break
+
+    q_res, e_res, geo_res = (np.array(column) for column in zip(*results))
+    return q_res, e_res, geo_res
+
+
+SIMULATION_ENGINES = {
+    'percolation': _run_single_percolation_simulation,
+    'stepwise': _run_single_attack_simulation,
+    'bond': _run_single_bond_percolation_simulation,
+    'scc': _run_single_scc_simulation,
+    'in_component': partial(_run_single_attack_simulation, connection='in'),
+    'out_component': partial(_run_single_attack_simulation, connection='out'),
+}
+
+# Engines whose attack orders are edge rows rather than node ids
+EDGE_ENGINES = ('bond',)
+
+
+def _expand_attack_scenario(csr, attack_scenario, num_tests=1, edges=False):
+    """
+    Expands an attack scenario into the distinct order sources to simulate and the run -> source mapping.
+    - Strategy names stay symbolic as (strategy, seed) pairs, so the orders are built inside the workers;
+      'random' uses seeds 0..num_tests-1, any other strategy is simulated once and shared by all runs.
+    - Attack lists become node-id arrays (edge rows if edges=True, from lists of (u, v) keys); the same list
+      object repeated num_tests times is simulated once.
+    """
+    to_ids = csr.edge_rows if edges else csr.node_ids
+    if isinstance(attack_scenario, str):
+        if attack_scenario == 'random':
+            return [('random', s) for s in range(num_tests)], list(range(num_tests))
+        return [(attack_scenario, 42)], [0] * num_tests
+
     # Unify input format: ensure attack_scenario is a list of lists
     if not isinstance(attack_scenario, list):
-        raise TypeError("attack_scenario must be a list or list of lists.")
+        raise TypeError("attack_scenario must be a strategy name, a list or list of lists.")
     if not attack_scenario or not isinstance(attack_scenario[0], list):
-        attack_scenario = [attack_scenario] * num_tests
+        return [to_ids(attack_scenario)], [0] * num_tests
 
-    actual_num_tests = len(attack_scenario)
+    unique_rows, run_to_row = {}, []
+    for single_list in attack_scenario:
+        run_to_row.append(unique_rows.setdefault(id(single_list), len(unique_rows)))
+    unique_lists = {id(single_list): single_list for single_list in attack_scenario}.values()
+    return [to_ids(single_list) for single_list in unique_lists], run_to_row
 
-    # Prepare parameters for multiprocessing tasks
-    args_list = [(G, single_list, removal_steps) for single_list in attack_scenario]
 
-    print(f"  > Launching {actual_num_tests} simulations using {min(cpu_count(), actual_num_tests)} CPU cores...")
-    with Pool(min(cpu_count(), actual_num_tests)) as p:
-        # Use tqdm to display progress bar
-        all_results = list(
-            tqdm(p.imap(_run_single_attack_simulation, args_list), total=actual_num_tests, desc="  - Simulation Progress"))
+def _share_simulation_inputs(csr, sources, q_base, efficiency=False, efficiency_sources=None):
+    """
+    Places the graph, the explicit attack orders and an empty result matrix (one row per source) in shared memory.
+    Returns the SharedArrays, the graph meta and, per source, what the task passes on: an `orders` row
+    index for explicit orders, or the (strategy, seed) pair itself.
+    efficiency=True adds a (sources x 2 x q) matrix for the E / E_geospatial curves and their source sample size.
+    """
+    explicit = [source for source in sources if not isinstance(source, tuple)]
+    orders = np.full((max(1, len(explicit)), max([1] + [len(source) for source in explicit])), -1, dtype=np.int32)
+    order_lengths = np.zeros(len(orders), dtype=np.int64)
+    for row, source in enumerate(explicit):
+        orders[row, :len(source)] = source
+        order_lengths[row] = len(source)
+    explicit_rows = iter(range(len(explicit)))
+    task_sources = [source if isinstance(source, tuple) else next(explicit_rows) for source in sources]
 
-    # Standardize and average results
-    q_base = np.linspace(0, 1, removal_steps + 2)
-    s_matrix = np.zeros((actual_num_tests, len(q_base)))
+    meta, graph_arrays = csr.export_arrays()
+    arrays = dict(graph_arrays, orders=orders, order_lengths=order_lengths, q_base=q_base,
+                  curves=np.zeros((len(sources), len(q_base))))
+    if efficiency:
+        arrays['efficiency'] = np.zeros((len(sources), 2, len(q_base)))
+        arrays['efficiency_sources'] = np.array([-1 if efficiency_sources is None else efficiency_sources])
+    shared = SharedArrays(arrays)
+    return shared, meta, task_sources
 
-    for i, res in enumerate(all_results):
-        if not res: continue
-        s_res, q_res = zip(*res)
+
+def _run_simulation_task(task):
+    """
+    Multiprocessing entry point: attaches to the shared graph, reads (or builds) one attack order and writes
+    the resulting curve, aligned to the common q-axis, straight into the shared result matrix.
+    Returns the task's tag unchanged so callers can route the finished row.
+    """
+    tag, spec, meta, row, source, removal_steps, engine = task
+    arrays = attach_shared_arrays(spec)
+    csr = CSRGraph.from_arrays(meta, arrays)
+    if isinstance(source, tuple):
+        order = (_edge_removal_order_ids if engine in EDGE_ENGINES else _removal_order_ids)(csr, *source)
+    else:
+        order = arrays['orders'][source, :arrays['order_lengths'][source]]
+
+    curve = SIMULATION_ENGINES[engine](csr, order, removal_steps)
+    if curve is not None:
+        q_res, s_res = curve
         # Use interpolation to align all results to the same q-axis
-        s_matrix[i, :] = np.interp(q_base, q_res, s_res)
+        arrays['curves'][row, :] = np.interp(arrays['q_base'], q_res, s_res)
+    if 'efficiency' in arrays:
+        num_sources = int(arrays['efficiency_sources'][0])
+        curve = _run_efficiency_trajectory(csr, order, removal_steps, None if num_sources < 0 else num_sources,
+                                           seed=row, edges=engine in EDGE_ENGINES)
+        if curve is not None:
+            q_res, e_res, geo_res = curve
+            # Relative to the intact graph, like S
+            for i, values in enumerate((e_res, geo_res)):
+                arrays['efficiency'][row, i, :] = np.interp(arrays['q_base'], q_res, values / (values[0] or 1))
+    return tag
 
-    mean_S = np.mean(s_matrix, axis=0)
-    std_S = np.std(s_matrix, axis=0)
 
+def _resilience_frame(q_base, s_matrix, engine='percolation', efficiency=None):
     # --- Interface Alignment: Return column names consistent with downstream scripts ---
-    return pd.DataFrame({
-        'nodes_removed_fraction': q_base,
-        'mean': mean_S,
-        'std': std_S
+    df = pd.DataFrame({
+        'edges_removed_fraction' if engine in EDGE_ENGINES else 'nodes_removed_fraction': q_base,
+        'mean': np.mean(s_matrix, axis=0),
+        'std': np.std(s_matrix, axis=0)
     })
+    if efficiency is not None:
+        for i, metric in enumerate(('E', 'E_geospatial')):
+            df[f'{metric}_mean'] = np.mean(efficiency[:, i], axis=0)
+            df[f'{metric}_std'] = np.std(efficiency[:, i], axis=0)
+    return df
+
+
+# 95% confidence half-widths of random-failure ensembles, for convergence-driven run counts
+CI_Z = 1.96
+CI_METRICS = ('rb', 'pointwise')
+
+
+def ci_half_width(s_matrix, q_base, ci_metric='rb'):
+    """
+    95% confidence half-width of an ensemble mean from its (runs x q) curve matrix.
+    - 'rb': of Rb, the area under S(q) (trapezoidal, as in the plotting scripts).
+    - 'pointwise': the widest over the q-axis of the half-widths of mean S(q).
+    Fewer than two runs give an infinite half-width.
+    """
+    runs = len(s_matrix)
+    if runs < 2:
+        return np.inf
+    if ci_metric == 'rb':
+        rb = np.sum((s_matrix[:, 1:] + s_matrix[:, :-1]) / 2 * np.diff(q_base), axis=1)
+        return float(CI_Z * np.std(rb, ddof=1) / np.sqrt(runs))
+    if ci_metric == 'pointwise':
+        return float(CI_Z * np.max(np.std(s_matrix, axis=0, ddof=1)) / np.sqrt(runs))
+    raise ValueError(f"Unknown CI metric: {ci_metric}")
+
+
+def run_resilience_analysis(G, attack_scenario, num_tests=1, removal_steps=50, engine='stepwise', executor=None,
+                            target_ci=None, ci_metric='rb', ci_batch=10, max_tests=500, efficiency=False,
+                            efficiency_sources=None):
+    """
+    Unified resilience analysis function (Version 2.3 - Percolation Engine).
+    Focuses on receiving pre-ordered attack lists and executing simulations.
+    - attack_scenario may also be a strategy name; 'random' then uses seeds 0..num_tests-1.
+    - engine='stepwise' (default) recomputes the components after each of the removal_steps batches;
+      engine='percolation' gives the exact LCC after every removal via reverse union-find. The two differ
+      between batch boundaries, so switching engines changes Rb (opt in explicitly).
+    - G may be a networkx graph or a CSRGraph; simulations always run on the CSR core with node masks.
+    - executor: a ResilienceExecutor to reuse; defaults to the one installed by shared_executor(), if any.
+    - engine='scc' measures the giant strongly connected component instead (exact after every removal, via
+      offline incremental SCC); 'in_component' / 'out_component' measure the giant SCC plus the nodes that
+      reach it / that it reaches, recomputed after each removal batch like 'stepwise'.
+    - engine='bond' removes links instead of nodes (bond percolation, reverse union-find): scenarios are then
+      edge strategies or lists of (u, v) edges (see get_edge_removal_order), and the first column becomes
+      edges_removed_fraction.
+    - engine='vectorized' runs a 'random' scenario as one array-backed ensemble (run_random_failure_ensemble,
+      NumPy Generator orders seeded with 0), which makes 1000-run ensembles practical.
+    - target_ci turns a 'random' scenario into a convergence-driven ensemble: num_tests is ignored and runs are
+      added ci_batch at a time until the 95% CI half-width of Rb (ci_metric='rb') or of the widest point of
+      S(q) (ci_metric='pointwise') is at most target_ci, or max_tests runs are done. The runs used, the
+      half-width reached and whether it converged are reported in df.attrs.
+    - efficiency=True also tracks E and E_geospatial (see efficiency_metrics) after each of the removal_steps
+      batches, relative to the intact graph, as E_mean/E_std and E_geospatial_mean/E_geospatial_std columns.
+      efficiency_sources estimates them from that many sampled alive sources per step (advisable for the
+      bus-inclusive master graph). Not available with engine='vectorized' or target_ci.
+    - For many graphs at once, run_resilience_batch() schedules all of their simulations together.
+    """
+    is_random = isinstance(attack_scenario, str) and attack_scenario == 'random'
+    if efficiency and (engine == 'vectorized' or (target_ci is not None and is_random)):
+        raise ValueError("efficiency curves need a fixed num_tests and a per-run simulation engine.")
+    if engine == 'vectorized':
+        if not is_random:
+            raise ValueError("engine='vectorized' only runs random-failure ensembles (attack_scenario='random').")
+        if target_ci is None:
+            return run_random_failure_ensemble(G, num_runs=num_tests, removal_steps=removal_steps)[0]
+        return _converge_random_failure_ensemble(G, removal_steps, target_ci, ci_metric, ci_batch, max_tests)
+    if target_ci is not None and is_random:
+        ((_, _, df),) = run_resilience_batch([(None, G, {'random': 'random'})], removal_steps, engine, executor,
+                                             target_ci=target_ci, ci_metric=ci_metric, ci_batch=ci_batch,
+                                             max_tests=max_tests)
+        return df
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Unknown simulation engine: {engine}")
+
+    # Both engines run on the compact CSR core; G may already be a CSRGraph
+    csr = as_csr(G)
+    sources, run_to_row = _expand_attack_scenario(csr, attack_scenario, num_tests, edges=engine in EDGE_ENGINES)
+    num_tasks = len(sources)
+
+    # Graph, attack orders and result matrix are placed once in shared memory; tasks only carry their names
+    q_base = np.linspace(0, 1, removal_steps + 2)
+    shared, meta, task_sources = _share_simulation_inputs(csr, sources, q_base, efficiency, efficiency_sources)
+    with shared:
+        tasks = [(row, shared.spec, meta, row, source, removal_steps, engine)
+                 for row, source in enumerate(task_sources)]
+        print(f"  > Launching {len(run_to_row)} simulations using {_num_workers(num_tasks, executor)} CPU cores...")
+        for _ in tqdm(_map_tasks(_run_simulation_task, tasks, executor), total=num_tasks,
+                      desc="  - Simulation Progress"):
+            pass
+        # Standardize results: every run maps to its (shared) curve row
+        s_matrix = shared['curves'][run_to_row]
+        efficiency_matrix = shared['efficiency'][run_to_row] if efficiency else None
+
+    return _resilience_frame(q_base, s_matrix, engine, efficiency_matrix)
 
 
 # ============================================================================
 #       Engine 2: Unified Benchmark Graph Generator
 # ============================================================================
 
-def generate_benchmark_graph(G_real, seed):
+def generate_benchmark_graph(G_real, seed, model='er'):
     """
     Generates an ER random graph as a benchmark for a given real network.
     This benchmark graph preserves the number of nodes, edges, and geospatial attributes of the real network.
+    - model='er_numpy' returns the vectorized ER draw instead, model='degree' / 'degree_layers' a
+      degree-preserving randomization (see generate_degree_preserving_csr), model='spatial' a distance-decay
+      rewiring (see generate_spatial_benchmark_csr), all converted to networkx.
     """
+    if model != 'er':
+        return generate_benchmark_csr(G_real, seed, model=model).to_networkx()
+
     n = G_real.number_of_nodes()
     m = G_real.number_of_edges()
     is_directed = G_real.is_directed()
@@ -148,3 +1192,1995 @@ def generate_benchmark_graph(G_real, seed):
             G_bench.nodes[bench_node][key] = value
 
     return G_bench
+
+
+# Models of generate_benchmark_csr that draw an ER graph (benchmark nodes are anonymous 0..n-1)
+ER_MODELS = ('er', 'er_numpy')
+
+
+def _sample_gnm_edges(n, m, directed, rng):
+    """
+    (src, dst) int32 arrays of m distinct edges drawn uniformly among the n * (n - 1) (directed) or
+    n * (n - 1) / 2 (undirected) possible ones, i.e. the edge set of a G(n, m) graph.
+    - Sparse case: oversampled batches of random pairs; self-loops are dropped and duplicates are rejected
+      through their int64 pair keys (u * n + v, endpoints sorted if undirected), keeping draw order.
+    - Dense case (m above half of the pairs): m distinct pairs are drawn from the enumerated pair list.
+    """
+    max_pairs = n * (n - 1) if directed else n * (n - 1) // 2
+    m = min(m, max_pairs)
+    if 2 * m > max_pairs:
+        # Enumerating every pair then costs at most 2m
+        src, dst = np.nonzero(~np.eye(n, dtype=bool)) if directed else np.triu_indices(n, 1)
+        picked = np.sort(rng.choice(max_pairs, m, replace=False))
+        return src[picked].astype(np.int32), dst[picked].astype(np.int32)
+
+    keys = np.empty(0, dtype=np.int64)
+    while len(keys) < m:
+        need = m - len(keys)
+        u = rng.integers(0, n, size=need + need // 8 + 16, dtype=np.int64)
+        v = rng.integers(0, n, size=len(u), dtype=np.int64)
+        u, v = u[u != v], v[u != v]
+        if not directed:
+            u, v = np.minimum(u, v), np.maximum(u, v)
+        keys = np.concatenate([keys, u * n + v])
+        _, first = np.unique(keys, return_index=True)
+        keys = keys[np.sort(first)]
+    keys = keys[:m]
+    return (keys // n).astype(np.int32), (keys % n).astype(np.int32)
+
+
+def generate_benchmark_csr(G_real, seed, model='er', **generator_kwargs):
+    """
+    Array-backed counterpart of generate_benchmark_graph: the ER benchmark as a CSRGraph.
+    - Keeps n, m and directedness of G_real (networkx or CSRGraph; pass a CSRGraph when generating many).
+    - model='er': the same graphs as generate_benchmark_graph for the same seed (networkx G(n, m) edges, real
+      nodes with coordinates placed by random.sample), i.e. the published benchmarks, without per-node dicts.
+    - model='er_numpy': edges sampled as NumPy arrays (_sample_gnm_edges) and located nodes permuted by the
+      same Generator; much faster on large networks, but different graphs than 'er' for the same seed.
+    - Either way, real nodes with coordinates land on benchmark nodes 0..k-1, which take their lon/lat/mode.
+    - model='degree' (or 'degree_layers', which also keeps every node's degree per edge type) returns
+      generate_degree_preserving_csr(G_real, seed) instead; model='spatial' returns
+      generate_spatial_benchmark_csr(G_real, seed). generator_kwargs are passed on to those generators.
+    """
+    if model in ('degree', 'degree_layers'):
+        return generate_degree_preserving_csr(G_real, seed, preserve_layers=model == 'degree_layers',
+                                              **generator_kwargs)
+    if model == 'spatial':
+        return generate_spatial_benchmark_csr(G_real, seed, **generator_kwargs)
+    if model not in ER_MODELS:
+        raise ValueError(f"Unknown benchmark model: {model}")
+    if generator_kwargs:
+        raise TypeError(f"The ER benchmark takes no generator parameters: {sorted(generator_kwargs)}")
+    csr_real = as_csr(G_real)
+    n, m = csr_real.n, csr_real.m
+    if n < 2 or m == 0:
+        return csr_real
+
+    with_pos = np.flatnonzero(~np.isnan(csr_real.lon) & ~np.isnan(csr_real.lat))
+    if model == 'er':
+        # Same draws as generate_benchmark_graph (random.Random(seed) is in the state random.seed(seed) sets)
+        edges = nx.gnm_random_graph(n, m, directed=csr_real.directed, seed=seed).edges()
+        src, dst = (np.array(list(edges), dtype=np.int32).reshape(-1, 2)).T
+        picked = np.array(random.Random(seed).sample(with_pos.tolist(), min(len(with_pos), n)), dtype=np.int64)
+    else:
+        rng = np.random.default_rng(seed)
+        src, dst = _sample_gnm_edges(n, m, csr_real.directed, rng)
+        picked = rng.permutation(with_pos)
+    lon, lat, mode = np.full(n, np.nan), np.full(n, np.nan), np.full(n, -1, dtype=np.int16)
+    lon[:len(picked)], lat[:len(picked)], mode[:len(picked)] = (
+        csr_real.lon[picked], csr_real.lat[picked], csr_real.mode[picked])
+    return CSRGraph(n, src, dst, directed=csr_real.directed, lon=lon, lat=lat, mode=mode,
+                    mode_labels=csr_real.mode_labels)
+
+
+def _edge_keys(src, dst, n, directed):
+    """int64 key per edge; undirected edges are keyed with sorted endpoints."""
+    src, dst = src.astype(np.int64), dst.astype(np.int64)
+    if not directed:
+        src, dst = np.minimum(src, dst), np.maximum(src, dst)
+    return src * n + dst
+
+
+def generate_degree_preserving_csr(G_real, seed, swaps_per_edge=10, preserve_layers=False):
+    """
+    Degree-preserving null model: G_real with its edges rewired by double-edge swaps, as a CSRGraph.
+    - (a, b), (c, d) -> (a, d), (c, b): keeps every degree (in- and out-degrees if directed; undirected swaps
+      also try (a, c), (b, d) through a random flip of the second edge).
+    - Swaps are proposed in vectorized batches over disjoint edge pairs. Swaps creating self-loops or an edge
+      already present, or colliding with another swap of the batch, are rejected.
+    - Runs until swaps_per_edge * m swaps are accepted (or 20x that many were proposed).
+    - preserve_layers: only edges of the same type swap, so every node keeps its degree per layer.
+    - Nodes keep their names and attributes; edges keep their type, lengths are dropped.
+    """
+    csr_real = as_csr(G_real)
+    n, m, directed = csr_real.n, csr_real.m, csr_real.directed
+    src, dst = csr_real.src.copy(), csr_real.dst.copy()
+    rng = np.random.default_rng(seed)
+    target, accepted, proposed = swaps_per_edge * m, 0, 0
+
+    while m >= 2 and accepted < target and proposed < 20 * target:
+        # Disjoint pairs of consecutive edges in a random order (grouped by type when layers are preserved)
+        order = rng.permutation(m)
+        if preserve_layers:
+            order = order[np.argsort(csr_real.etype[order], kind='stable')]
+        e1, e2 = order[0:m - 1:2], order[1:m:2]
+        if preserve_layers:
+            same = csr_real.etype[e1] == csr_real.etype[e2]
+            e1, e2 = e1[same], e2[same]
+        proposed += len(e1)
+
+        a, b, c, d = src[e1], dst[e1], src[e2], dst[e2]
+        if not directed:
+            flip = rng.random(len(e1)) < 0.5
+            c, d = np.where(flip, d, c), np.where(flip, c, d)
+        new1, new2 = _edge_keys(a, d, n, directed), _edge_keys(c, b, n, directed)
+        existing = np.sort(_edge_keys(src, dst, n, directed))
+
+        def _exists(keys):
+            pos = np.minimum(np.searchsorted(existing, keys), m - 1)
+            return existing[pos] == keys
+
+        ok = (a != d) & (c != b) & ~_exists(new1) & ~_exists(new2) & (new1 != new2)
+        # Two swaps of the batch must not create the same edge
+        new_keys = np.concatenate([new1[ok], new2[ok]])
+        unique_keys, counts = np.unique(new_keys, return_counts=True)
+        clash = np.isin(new_keys, unique_keys[counts > 1])
+        ok[np.flatnonzero(ok)[clash[:len(clash) // 2] | clash[len(clash) // 2:]]] = False
+
+        e1, e2 = e1[ok], e2[ok]
+        src[e1], dst[e1], src[e2], dst[e2] = a[ok], d[ok], c[ok], b[ok]
+        accepted += len(e1)
+
+    return CSRGraph(n, src, dst, directed=directed, names=csr_real.names, lon=csr_real.lon, lat=csr_real.lat,
+                    mode=csr_real.mode, mode_labels=csr_real.mode_labels, etype=csr_real.etype,
+                    type_labels=csr_real.type_labels)
+
+
+def _planar_coordinates(lon, lat):
+    """Equirectangular projection in metres around the mean latitude; accurate at city scale."""
+    lat0 = np.radians(np.nanmean(lat))
+    return EARTH_RADIUS_M * np.column_stack([np.radians(lon) * np.cos(lat0), np.radians(lat)])
+
+
+def generate_spatial_benchmark_csr(G_real, seed, max_candidates=8, max_rounds=20, calibration_rounds=8,
+                                   calibration_tol=0.01):
+    """
+    Spatially-embedded null model: every edge keeps one endpoint and is rewired to a node at a random
+    distance from it, so benchmarks keep the real network's edge length scale, as a CSRGraph.
+    - Lengths are drawn from a lognormal matched to the mean and std of the real (haversine) edge lengths,
+      i.e. <l_e> and σ(le), in a uniformly random direction.
+    - The new endpoint is taken among the max_candidates nodes nearest to that point (KD-tree over projected
+      coordinates), the one whose distance to the anchor best matches the drawn length first, falling back
+      to the next when it is the anchor itself or the edge already exists;
+      edges left unplaced after max_rounds redraws get a uniformly drawn endpoint.
+    - Snapping to nodes shortens edges where nodes are sparse, so the lognormal's scale is calibrated: the
+      rewiring is redone with the same seed, rescaling the drawn lengths by <l_e> / realised mean, until the
+      mean rewired length is within calibration_tol (relative) of <l_e> or calibration_rounds runs are done.
+      The closest run is kept.
+    - Edges keep their source (so directed graphs keep every out-degree); undirected edges keep a random end.
+    - Edges touching nodes without coordinates are not rewired. Nodes keep their names and attributes.
+    """
+    csr_real = as_csr(G_real)
+    n, m, directed = csr_real.n, csr_real.m, csr_real.directed
+    has_pos = ~np.isnan(csr_real.lon) & ~np.isnan(csr_real.lat)
+    movable = np.flatnonzero(has_pos[csr_real.src] & has_pos[csr_real.dst] & (csr_real.src != csr_real.dst))
+    if len(movable) == 0 or np.count_nonzero(has_pos) < 2:
+        return csr_real
+
+    def _lengths(src, dst):
+        return _haversine(csr_real.lon[src[movable]], csr_real.lat[src[movable]],
+                          csr_real.lon[dst[movable]], csr_real.lat[dst[movable]])
+
+    real_lengths = _lengths(csr_real.src, csr_real.dst)
+    mean, std = np.mean(real_lengths), np.std(real_lengths)
+    sigma = np.sqrt(np.log1p((std / mean) ** 2)) if mean > 0 else 0.0
+    mu = np.log(mean) - sigma ** 2 / 2 if mean > 0 else 0.0
+
+    positioned = np.flatnonzero(has_pos)
+    xy = _planar_coordinates(csr_real.lon, csr_real.lat)
+    tree = cKDTree(xy[positioned])
+    k = min(max_candidates, len(positioned))
+
+    def _rewire(scale):
+        rng = np.random.default_rng(seed)
+        src, dst = csr_real.src.copy(), csr_real.dst.copy()
+        if not directed:
+            flip = rng.random(len(movable)) < 0.5
+            tails, heads = src[movable], dst[movable]
+            src[movable], dst[movable] = np.where(flip, heads, tails), np.where(flip, tails, heads)
+
+        # Keys of the edges that stay put; rewired edges join them as they are placed
+        pending = np.zeros(m, dtype=bool)
+        pending[movable] = True
+        taken = np.sort(_edge_keys(src[~pending], dst[~pending], n, directed))
+
+        def _claim(edges, heads):
+            nonlocal taken
+            keys = _edge_keys(src[edges], heads, n, directed)
+            pos = np.minimum(np.searchsorted(taken, keys), max(len(taken) - 1, 0))
+            ok = heads != src[edges]
+            if len(taken):
+                ok &= taken[pos] != keys
+            # Within one pass, the first edge claiming a key wins
+            _, first = np.unique(keys, return_index=True)
+            is_first = np.zeros(len(keys), dtype=bool)
+            is_first[first] = True
+            ok &= is_first
+            dst[edges[ok]] = heads[ok]
+            pending[edges[ok]] = False
+            taken = np.sort(np.concatenate([taken, keys[ok]]))
+
+        for _ in range(max_rounds):
+            todo = np.flatnonzero(pending)
+            if len(todo) == 0:
+                break
+            angle = rng.uniform(0, 2 * np.pi, len(todo))
+            length = scale * rng.lognormal(mu, sigma, len(todo))
+            targets = xy[src[todo]] + length[:, None] * np.column_stack([np.cos(angle), np.sin(angle)])
+            _, candidates = tree.query(targets, k=k)
+            candidates = positioned[np.asarray(candidates).reshape(len(todo), k)]
+            # Try the candidates whose distance to the anchor is closest to the drawn length first
+            miss = np.abs(np.linalg.norm(xy[candidates] - xy[src[todo]][:, None], axis=2) - length[:, None])
+            candidates = np.take_along_axis(candidates, np.argsort(miss, axis=1, kind='stable'), axis=1)
+            for column in range(k):
+                open_rows = np.flatnonzero(pending[todo])
+                if len(open_rows) == 0:
+                    break
+                _claim(todo[open_rows], candidates[open_rows, column])
+
+        # Crowded anchors: fall back to uniformly drawn endpoints (ER-like) for the few edges still unplaced
+        for _ in range(100 * max_rounds):
+            todo = np.flatnonzero(pending)
+            if len(todo) == 0:
+                break
+            _claim(todo, positioned[rng.integers(0, len(positioned), len(todo))])
+        if pending.any():
+            todo = np.flatnonzero(pending)
+            _claim(todo, dst[todo])  # keep the original endpoint where it is still free
+        if pending.any():
+            raise ValueError("Graph too dense to rewire without duplicate edges.")
+        return src, dst
+
+    # Secant steps on log(realised mean) against log(scale); snapping flattens that curve, so plain
+    # proportional rescaling would only creep towards the target
+    scale, best, best_error, previous = 1.0, None, np.inf, None
+    for _ in range(max(calibration_rounds, 1)):
+        src, dst = _rewire(scale)
+        realised = np.mean(_lengths(src, dst))
+        error = abs(realised / mean - 1) if mean > 0 else 0.0
+        if error < best_error:
+            best, best_error = (src, dst), error
+        if error <= calibration_tol or realised <= 0:
+            break
+        slope = 1.0
+        if previous is not None and previous[0] != np.log(scale):
+            slope = np.clip((np.log(realised) - previous[1]) / (np.log(scale) - previous[0]), 0.1, 1.0)
+        previous = (np.log(scale), np.log(realised))
+        scale *= np.exp(np.log(mean / realised) / slope)
+    src, dst = best
+
+    return CSRGraph(n, src, dst, directed=directed, names=csr_real.names, lon=csr_real.lon, lat=csr_real.lat,
+                    mode=csr_real.mode, mode_labels=csr_real.mode_labels, etype=csr_real.etype,
+                    type_labels=csr_real.type_labels)
+
+
+# ============================================================================
+#       Engine 3: Zero-Copy Shared-Memory Transport for Worker Processes
+# ============================================================================
+
+# Blocks this process created (usable directly) or attached to (cached by block name)
+_OWNED_BLOCKS = {}
+_ATTACHED_BLOCKS = OrderedDict()
+_MAX_ATTACHED_BLOCKS = 256
+
+
+class SharedArrays:
+    """
+    A set of numpy arrays placed once in multiprocessing.shared_memory.
+    - `spec` is a small picklable {key: (block_name, shape, dtype)} dict that tasks carry instead of the data.
+    - Workers call attach_shared_arrays(spec) to get zero-copy views; writes are visible to every process.
+    - The creating process owns the blocks: close() (or leaving the with-block) releases and unlinks them.
+    """
+
+    def __init__(self, arrays):
+        self.spec = {}
+        self._blocks = []
+        self._views = {}
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            view[...] = array
+            self._blocks.append(block)
+            self._views[key] = view
+            self.spec[key] = (block.name, array.shape, array.dtype.str)
+            _OWNED_BLOCKS[block.name] = view
+
+    def __getitem__(self, key):
+        return self._views[key]
+
+    def close(self):
+        self._views.clear()
+        for block in self._blocks:
+            _OWNED_BLOCKS.pop(block.name, None)
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _attach_block(name):
+    """Attaches to an existing block; only the creating process unlinks it (pool workers share its tracker)."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def attach_shared_arrays(spec):
+    """Returns {key: array view} for a SharedArrays spec; blocks are attached once per process and cached."""
+    arrays = {}
+    for key, (name, shape, dtype) in spec.items():
+        if name in _OWNED_BLOCKS:
+            arrays[key] = _OWNED_BLOCKS[name]
+            continue
+        if name in _ATTACHED_BLOCKS:
+            _ATTACHED_BLOCKS.move_to_end(name)
+        else:
+            _ATTACHED_BLOCKS[name] = _attach_block(name)
+        arrays[key] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_ATTACHED_BLOCKS[name].buf)
+
+    # Detach the least recently used blocks of earlier graphs
+    while len(_ATTACHED_BLOCKS) > max(_MAX_ATTACHED_BLOCKS, len(spec)):
+        name, block = _ATTACHED_BLOCKS.popitem(last=False)
+        try:
+            block.close()
+        except BufferError:
+            pass  # A view is still alive; the mapping is released when it is garbage-collected
+    return arrays
+
+
+# ============================================================================
+#       Engine 4: Persistent Worker Pool Shared Across Calls
+# ============================================================================
+
+# Modules imported once by the forkserver, so every worker starts with them already loaded
+PRELOAD_MODULES = ('analysis_engines', 'numpy', 'pandas', 'scipy.sparse.csgraph', 'networkx')
+
+_ACTIVE_EXECUTOR = None
+
+
+class ResilienceExecutor:
+    """
+    Long-lived process pool reused across resilience calls, instead of one Pool per call.
+    - Workers are forked from a forkserver that has preloaded PRELOAD_MODULES (spawn where forkserver is
+      unavailable, e.g. Windows); shared-memory attachments stay cached in the workers between calls.
+    - Pass it as `executor=` to the engines, or install it for a whole script with shared_executor().
+    """
+
+    def __init__(self, processes=None, start_method=None, preload=PRELOAD_MODULES):
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        context = multiprocessing.get_context(start_method)
+        if start_method == 'forkserver':
+            context.set_forkserver_preload(list(preload))
+        self.processes = processes or cpu_count()
+        self._pool = context.Pool(self.processes)
+
+    def imap_unordered(self, func, tasks, chunksize=1):
+        return self._pool.imap_unordered(func, tasks, chunksize)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None and self._pool is not None:
+            self._pool.terminate()
+        self.close()
+
+
+@contextmanager
+def shared_executor(processes=None, start_method=None):
+    """
+    Installs one ResilienceExecutor for every engine call made inside the with-block.
+    Usage: `with shared_executor(): run_resilience_analysis(...)` (an already active executor is reused).
+    """
+    global _ACTIVE_EXECUTOR
+    if _ACTIVE_EXECUTOR is not None:
+        yield _ACTIVE_EXECUTOR
+        return
+    with ResilienceExecutor(processes, start_method) as executor:
+        _ACTIVE_EXECUTOR = executor
+        try:
+            yield executor
+        finally:
+            _ACTIVE_EXECUTOR = None
+
+
+def _num_workers(num_tasks, executor=None):
+    executor = executor or _ACTIVE_EXECUTOR
+    # Pool workers are daemonic and cannot start pools of their own, so nested calls run in-process
+    if num_tasks <= 1 or multiprocessing.current_process().daemon:
+        return 1
+    return min(executor.processes if executor is not None else cpu_count(), num_tasks)
+
+
+def _map_tasks(func, tasks, executor=None):
+    """
+    Runs independent tasks and yields their results as they finish.
+    - Uses the given executor, else the one installed by shared_executor(), else a temporary Pool.
+    - A single task, or a single available core, runs in-process without any pool.
+    - tasks may be a lazy iterator; it is then pulled by the pool's task feeder (or one by one in-process).
+    """
+    executor = executor or _ACTIVE_EXECUTOR
+    num_tasks = len(tasks) if hasattr(tasks, '__len__') else sys.maxsize
+    if _num_workers(num_tasks, executor) == 1:
+        for task in tasks:
+            yield func(task)
+    elif executor is not None:
+        yield from executor.imap_unordered(func, tasks)
+    else:
+        with Pool(_num_workers(num_tasks)) as p:
+            yield from p.imap_unordered(func, tasks)
+
+
+def _run_call_task(task):
+    """Multiprocessing entry point of map_calls: one whole call."""
+    position, func, args = task
+    return position, func(*args)
+
+
+def map_calls(func, calls, executor=None, desc="  - Calls"):
+    """
+    [func(*args) for args in calls], each call one task on the worker pool (see _map_tasks), with progress.
+    - For independent calls of an unchanged function, e.g. one per subsystem and network: every task pickles
+      its own arguments, so this suits a few heavy calls rather than many small ones.
+    - func must be a module-level function; results come back in call order.
+    """
+    calls = [tuple(args) for args in calls]
+    results = [None] * len(calls)
+    tasks = [(position, func, args) for position, args in enumerate(calls)]
+    for position, result in tqdm(_map_tasks(_run_call_task, tasks, executor), total=len(tasks), desc=desc,
+                                 leave=False):
+        results[position] = result
+    return results
+
+
+# ============================================================================
+#       Engine 5: Batched Multi-Graph Resilience
+# ============================================================================
+
+def run_resilience_batch(jobs, removal_steps=50, engine='stepwise', executor=None, max_pending_jobs=None,
+                         target_ci=None, ci_metric='rb', ci_batch=10, max_tests=500):
+    """
+    Runs the attack simulations of many graphs as one flat task queue across all cores.
+    - jobs: iterable of (key, G, attacks); attacks maps an attack label to a scenario as accepted by
+      run_resilience_analysis, or to a (scenario, num_tests) pair (num_tests defaults to 1).
+    - Yields (key, label, df) in completion order, as soon as every run of that attack on that graph is done;
+      df has the columns returned by run_resilience_analysis.
+    - jobs may be a lazy generator (e.g. one building benchmark graphs): it is consumed while earlier jobs are
+      simulated, keeping at most max_pending_jobs graphs (default: 4 per worker) in shared memory.
+    - Attack orders, including 'degree' and 'betweenness', are built inside the workers.
+    - target_ci: 'random' attacks then ignore num_tests and add ci_batch runs at a time until the 95% CI
+      half-width (see ci_half_width) is at most target_ci, or max_tests runs are done; df.attrs reports
+      num_tests, ci_half_width and converged.
+    """
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Unknown simulation engine: {engine}")
+    if ci_metric not in CI_METRICS:
+        raise ValueError(f"Unknown CI metric: {ci_metric}")
+
+    executor = executor or _ACTIVE_EXECUTOR
+    num_workers = _num_workers(sys.maxsize, executor)
+    q_base = np.linspace(0, 1, removal_steps + 2)
+    pending = {}  # job id -> key, shared arrays, task inputs, per-attack state, unfinished attacks
+    # The feeder waits on one queue for either a free job slot (None) or follow-up tasks of converging attacks
+    work = queue.Queue()
+    for _ in range(max_pending_jobs or 4 * num_workers):
+        work.put(None)
+    lock, stopped = threading.Lock(), threading.Event()
+
+    def _attack_tasks(job_id, label, rows):
+        job = pending[job_id]
+        return [((job_id, label), job['shared'].spec, job['meta'], row, job['task_sources'][row], removal_steps,
+                 engine) for row in rows]
+
+    def _load_job(job_id, key, G, attacks):
+        csr = as_csr(G)
+        sources, attack_state = [], {}
+        for label, scenario in attacks.items():
+            scenario, num_tests = scenario if isinstance(scenario, tuple) else (scenario, 1)
+            converging = target_ci is not None and isinstance(scenario, str) and scenario == 'random'
+            # Converging attacks reserve rows for max_tests seeds but start with a single batch
+            attack_sources, run_to_row = _expand_attack_scenario(csr, scenario, max_tests if converging else num_tests,
+                                                                 edges=engine in EDGE_ENGINES)
+            first = min(ci_batch, max_tests) if converging else len(attack_sources)
+            attack_state[label] = {'base': len(sources), 'run_to_row': np.asarray(run_to_row, dtype=np.int64),
+                                   'submitted': first, 'outstanding': first, 'converging': converging}
+            sources.extend(attack_sources)
+        if not sources:
+            return []
+        shared, meta, task_sources = _share_simulation_inputs(csr, sources, q_base)
+        pending[job_id] = {'key': key, 'shared': shared, 'meta': meta, 'task_sources': task_sources,
+                           'attacks': attack_state, 'remaining': len(attack_state)}
+        return [task for label, state in attack_state.items()
+                for task in _attack_tasks(job_id, label, range(state['base'], state['base'] + state['submitted']))]
+
+    def _tasks():
+        numbered_jobs = enumerate(jobs)
+        exhausted = False
+        while True:
+            item = work.get()
+            with lock:
+                if stopped.is_set():
+                    return
+                if item is not None:
+                    tasks = item
+                elif exhausted:
+                    if not pending:
+                        return
+                    continue
+                else:
+                    tasks = []
+                    while not tasks and not exhausted:
+                        job = next(numbered_jobs, None)
+                        if job is None:
+                            exhausted = True
+                        else:
+                            tasks = _load_job(job[0], *job[1])
+                    if exhausted and not pending:
+                        return
+            yield from tasks
+
+    def _finish_attack(job, state):
+        """Returns the attack's frame once it is done; converging attacks may instead queue another batch."""
+        done = state['submitted']
+        if not state['converging']:
+            return _resilience_frame(q_base, job['shared']['curves'][state['base'] + state['run_to_row']], engine)
+        s_matrix = job['shared']['curves'][state['base']:state['base'] + done]
+        half_width = ci_half_width(s_matrix, q_base, ci_metric)
+        if half_width > target_ci and done < max_tests:
+            state['submitted'] = min(done + ci_batch, max_tests)
+            state['outstanding'] = state['submitted'] - done
+            return None
+        df = _resilience_frame(q_base, s_matrix, engine)
+        df.attrs.update(num_tests=done, ci_half_width=half_width, converged=bool(half_width <= target_ci))
+        return df
+
+    print(f"  > Streaming batched simulations using {num_workers} CPU cores...")
+    try:
+        for job_id, label in tqdm(_map_tasks(_run_simulation_task, _tasks(), executor),
+                                  desc="  - Batch Simulation Progress"):
+            job = pending[job_id]
+            state = job['attacks'][label]
+            state['outstanding'] -= 1
+            if state['outstanding'] > 0:
+                continue
+            done = state['submitted']
+            df = _finish_attack(job, state)
+            if df is None:
+                work.put(_attack_tasks(job_id, label, range(state['base'] + done,
+                                                            state['base'] + state['submitted'])))
+                continue
+            yield job['key'], label, df
+            job['remaining'] -= 1
+            if job['remaining'] == 0:
+                with lock:
+                    job['shared'].close()
+                    del pending[job_id]
+                work.put(None)
+    finally:
+        # Also reached when the caller stops early: free what is left and wake the feeder so it can return
+        with lock:
+            stopped.set()
+            for job in pending.values():
+                job['shared'].close()
+            pending.clear()
+        work.put(None)
+
+
+# ============================================================================
+#       Engine 6: Vectorized Random-Failure Ensembles
+# ============================================================================
+
+def random_removal_orders(n, num_runs, seed=0):
+    """All orders of a random-failure ensemble at once: a (num_runs x n) int32 matrix of permutations from one NumPy Generator."""
+    base = np.broadcast_to(np.arange(n, dtype=np.int32), (num_runs, n))
+    return np.random.default_rng(seed).permuted(base, axis=1)
+
+
+def _find_roots(parent, x):
+    """Vectorised find with path halving; x holds one element per independent union-find stored in the flat parent array."""
+    while True:
+        p = parent[x]
+        grandparent = parent[p]
+        if np.array_equal(p, grandparent):
+            return p
+        parent[x] = grandparent
+        x = grandparent
+
+
+def _ensemble_lcc_sizes(csr, orders, ks):
+    """
+    LCC sizes of many complete node-removal orders at once, after k removals for every k in ks (runs x len(ks)).
+    - An edge survives k removals iff both ends sit at position >= k in the order, so every run adds its edges
+      back in descending min-position order (reverse percolation, as in the union-find engine).
+    - The union-finds of all runs live side by side in flat arrays and advance one edge per step together;
+      only the running LCC after each edge is kept and read back through per-run edge counts.
+    """
+    runs, n = orders.shape
+    ks = np.asarray(ks, dtype=np.int64)
+    # Weak connectivity on unique undirected pairs; self-loops never join anything
+    pairs = np.unique(np.sort(np.column_stack([csr.src, csr.dst]), axis=1), axis=0)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    m = len(pairs)
+
+    lcc = np.where(ks < n, 1, 0) * np.ones((runs, 1), dtype=np.int64)
+    if m == 0 or runs == 0:
+        return lcc
+
+    position = np.empty_like(orders)
+    position[np.arange(runs)[:, None], orders] = np.arange(n, dtype=orders.dtype)
+    keys = np.minimum(position[:, pairs[:, 0]], position[:, pairs[:, 1]])
+    by_key = np.argsort(-keys, axis=1, kind='stable')
+
+    # Edge endpoints per step (rows) and run (columns), offset into each run's slice of the flat arrays
+    offset = np.arange(runs, dtype=np.int64) * n
+    tails = np.ascontiguousarray(pairs[:, 0][by_key].T) + offset
+    heads = np.ascontiguousarray(pairs[:, 1][by_key].T) + offset
+
+    parent = np.arange(runs * n, dtype=np.int64)
+    size = np.ones(runs * n, dtype=np.int64)
+    largest = np.ones(runs, dtype=np.int64)
+    running = np.empty((runs, m), dtype=np.int64)
+    lanes = np.arange(runs)
+    for t in range(m):
+        root_a = _find_roots(parent, tails[t])
+        root_b = _find_roots(parent, heads[t])
+        merge = root_a != root_b
+        if merge.any():
+            root_a, root_b = root_a[merge], root_b[merge]
+            # Union by size
+            swap = size[root_a] < size[root_b]
+            big = np.where(swap, root_b, root_a)
+            small = np.where(swap, root_a, root_b)
+            parent[small] = big
+            size[big] += size[small]
+            merged = lanes[merge]
+            largest[merged] = np.maximum(largest[merged], size[big])
+        running[:, t] = largest
+
+    # Number of edges alive after k removals = edges whose key is >= k
+    histogram = np.bincount((keys + (np.arange(runs) * (n + 1))[:, None]).ravel(),
+                            minlength=runs * (n + 1)).reshape(runs, n + 1)
+    alive_edges = np.cumsum(histogram[:, ::-1], axis=1)[:, ::-1][:, np.minimum(ks, n)]
+    from_edges = np.take_along_axis(running, np.maximum(alive_edges - 1, 0), axis=1)
+    return np.where(alive_edges > 0, from_edges, lcc)
+
+
+def run_random_failure_ensemble(G, num_runs=1000, removal_steps=50, seed=0, batch_size=None):
+    """
+    Random-failure resilience of a whole ensemble in one array-backed pass, without a simulation per run.
+    - Orders come from random_removal_orders(seed=seed), so results differ from the per-seed random.Random
+      orders of run_resilience_analysis, but every run is an exact percolation curve.
+    - Curves are sampled straight onto the common q-axis (same linear interpolation as the other engines).
+    - batch_size runs are processed together (default: about 4M order/edge entries per batch).
+    - Returns (df, s_matrix): the usual nodes_removed_fraction/mean/std frame and the full runs x q matrix.
+    """
+    csr = as_csr(G)
+    n = csr.n
+    q_base = np.linspace(0, 1, removal_steps + 2)
+    s_matrix = np.zeros((num_runs, len(q_base)))
+    if n == 0:
+        return _resilience_frame(q_base, s_matrix), s_matrix
+
+    # Every q on the axis lies between two removal counts; only those are evaluated
+    x = q_base * n
+    k_low = np.floor(x).astype(np.int64)
+    k_high = np.minimum(k_low + 1, n)
+    fraction = x - k_low
+    ks, inverse = np.unique(np.concatenate([[0], k_low, k_high]), return_inverse=True)
+    i_low, i_high = inverse[1:len(q_base) + 1], inverse[len(q_base) + 1:]
+
+    s0 = csr.largest_component_size() or 1  # Avoid division by zero
+    batch_size = batch_size or max(1, 4_000_000 // max(n, csr.m, 1))
+    orders = random_removal_orders(n, num_runs, seed)
+    for start in tqdm(range(0, num_runs, batch_size), desc="  - Ensemble Batches"):
+        s = _ensemble_lcc_sizes(csr, orders[start:start + batch_size], ks) / s0
+        s_matrix[start:start + batch_size] = s[:, i_low] + (s[:, i_high] - s[:, i_low]) * fraction
+
+    return _resilience_frame(q_base, s_matrix), s_matrix
+
+
+def _converge_random_failure_ensemble(G, removal_steps, target_ci, ci_metric='rb', ci_batch=10, max_tests=500):
+    """Vectorized counterpart of the target_ci mode: adds ensembles of ci_batch runs (seeds 0, 1, ...) until converged."""
+    if ci_metric not in CI_METRICS:
+        raise ValueError(f"Unknown CI metric: {ci_metric}")
+    csr = as_csr(G)
+    q_base = np.linspace(0, 1, removal_steps + 2)
+    batches = []
+    while True:
+        runs = min(ci_batch, max_tests - sum(len(b) for b in batches))
+        batches.append(run_random_failure_ensemble(csr, runs, removal_steps, seed=len(batches))[1])
+        s_matrix = np.vstack(batches)
+        half_width = ci_half_width(s_matrix, q_base, ci_metric)
+        if half_width <= target_ci or len(s_matrix) >= max_tests:
+            break
+
+    df = _resilience_frame(q_base, s_matrix)
+    df.attrs.update(num_tests=len(s_matrix), ci_half_width=half_width, converged=bool(half_width <= target_ci))
+    return df
+
+
+# ============================================================================
+#       Engine 7: Exact Parallel Betweenness (Brandes)
+# ============================================================================
+
+def _brandes_chunk(csr, sources, node_alive, edge_alive, weighted, distance_sink=None):
+    """
+    Exact Brandes dependency accumulation from `sources` over the alive part of a CSRGraph.
+    - Mirrors nx.betweenness_centrality step by step (BFS, or Dijkstra on `length` with missing lengths
+      counted as 1), so raw sums match networkx up to floating-point summation order.
+    - distance_sink(s, D), if given, receives every BFS's hop distance list (-1 where unreached).
+    - Returns the unscaled (node_bc, edge_bc) sums over all node ids / edge rows.
+    """
+    n = csr.n
+    slots = np.flatnonzero(edge_alive[csr.edge_ids] & node_alive[csr.indices])
+    tails = np.repeat(np.arange(n), np.diff(csr.indptr))[slots]
+    weights = np.where(np.isnan(csr.length), 1.0, csr.length) if weighted else np.ones(csr.m)
+    adjacency = [[] for _ in range(n)]
+    for v, w, e, weight in zip(tails.tolist(), csr.indices[slots].tolist(), csr.edge_ids[slots].tolist(),
+                               weights[csr.edge_ids[slots]].tolist()):
+        adjacency[v].append((w, e, weight))
+
+    node_bc = [0.0] * n
+    edge_bc = [0.0] * csr.m
+    for s in sources.tolist():
+        S = []
+        P = {}
+        sigma = [0.0] * n
+        sigma[s] = 1.0
+        if weighted:
+            # Same bookkeeping as networkx's Dijkstra: a node's count is completed when it is settled
+            settled = [False] * n
+            seen = {s: 0}
+            tie_breaker = count()
+            Q = [(0, next(tie_breaker), s, s)]
+            while Q:
+                dist, _, pred, v = heappop(Q)
+                if settled[v]:
+                    continue
+                sigma[v] += sigma[pred]
+                S.append(v)
+                settled[v] = True
+                for w, e, weight in adjacency[v]:
+                    vw_dist = dist + weight
+                    if not settled[w] and (w not in seen or vw_dist < seen[w]):
+                        seen[w] = vw_dist
+                        heappush(Q, (vw_dist, next(tie_breaker), v, w))
+                        sigma[w] = 0.0
+                        P[w] = [(v, e)]
+                    elif vw_dist == seen[w]:  # Equal paths
+                        sigma[w] += sigma[v]
+                        P[w].append((v, e))
+        else:
+            D = [-1] * n
+            D[s] = 0
+            Q = deque([s])
+            while Q:
+                v = Q.popleft()
+                S.append(v)
+                Dv, sigmav = D[v], sigma[v]
+                for w, e, _ in adjacency[v]:
+                    if D[w] < 0:
+                        Q.append(w)
+                        D[w] = Dv + 1
+                    if D[w] == Dv + 1:
+                        sigma[w] += sigmav
+                        P.setdefault(w, []).append((v, e))
+            if distance_sink is not None:
+                distance_sink(s, D)
+
+        # Back-propagate dependencies onto nodes and the edges they were reached through
+        delta = dict.fromkeys(S, 0)
+        while S:
+            w = S.pop()
+            coeff = (1 + delta[w]) / sigma[w]
+            for v, e in P.get(w, ()):
+                c = sigma[v] * coeff
+                edge_bc[e] += c
+                delta[v] += c
+            if w != s:
+                node_bc[w] += delta[w]
+
+    return np.array(node_bc), np.array(edge_bc)
+
+
+def _run_brandes_task(task):
+    """Multiprocessing entry point: accumulates one chunk of sources into its own row of the shared partials."""
+    spec, meta, row, start, stop, weighted = task
+    arrays = attach_shared_arrays(spec)
+    csr = CSRGraph.from_arrays(meta, arrays)
+    node_bc, edge_bc = _brandes_chunk(csr, arrays['sources'][start:stop], arrays['node_alive'],
+                                      arrays['edge_alive'], weighted)
+    arrays['node_partials'][row] = node_bc
+    arrays['edge_partials'][row] = edge_bc
+    return row
+
+
+def betweenness_arrays(G, weight=None, normalized=True, node_mask=None, edge_mask=None, executor=None):
+    """
+    Exact node and edge betweenness, with the source nodes split across worker processes.
+    - weight=None counts hops; weight='length' runs Dijkstra on edge lengths (the only weight a CSRGraph keeps).
+    - Scaling follows nx.betweenness_centrality / nx.edge_betweenness_centrality with k=None.
+    - node_mask/edge_mask restrict everything to the alive part of the graph (e.g. during a cascade);
+      normalisation then uses the number of alive nodes.
+    - Each chunk of sources writes its partial sums to shared memory, and they are added up in chunk order,
+      so results do not depend on scheduling.
+    - Returns (node_bc, edge_bc) float64 arrays over CSR node ids / edge rows; dead entries are 0.
+    """
+    if weight not in (None, 'length'):
+        raise ValueError(f"Unsupported betweenness weight: {weight} (use None or 'length').")
+
+    csr = as_csr(G)
+    node_alive = np.ones(csr.n, dtype=bool) if node_mask is None else np.asarray(node_mask, dtype=bool)
+    edge_alive = csr.alive_edges(node_alive, edge_mask)
+    sources = np.flatnonzero(node_alive).astype(np.int32)
+    n_alive = len(sources)
+
+    num_chunks = max(1, min(n_alive, 4 * _num_workers(n_alive, executor)))
+    bounds = np.linspace(0, n_alive, num_chunks + 1).astype(np.int64)
+    meta, graph_arrays = csr.export_arrays()
+    with SharedArrays(dict(graph_arrays, sources=sources, node_alive=node_alive, edge_alive=edge_alive,
+                           node_partials=np.zeros((num_chunks, csr.n)),
+                           edge_partials=np.zeros((num_chunks, csr.m)))) as shared:
+        tasks = [(shared.spec, meta, row, bounds[row], bounds[row + 1], weight is not None)
+                 for row in range(num_chunks)]
+        for _ in tqdm(_map_tasks(_run_brandes_task, tasks, executor), total=num_chunks,
+                      desc="  - Betweenness Chunks", leave=False):
+            pass
+        node_bc = np.zeros(csr.n)
+        edge_bc = np.zeros(csr.m)
+        for row in range(num_chunks):
+            node_bc += shared['node_partials'][row]
+            edge_bc += shared['edge_partials'][row]
+
+    # Undirected graphs count every unordered pair twice
+    correction = 1 if csr.directed else 2
+    if normalized:
+        if n_alive > 2:
+            node_bc *= 1 / ((n_alive - 1) * (n_alive - 2))
+        if n_alive > 1:
+            edge_bc *= 1 / (n_alive * (n_alive - 1))
+    elif correction != 1:
+        if n_alive > 2:
+            node_bc /= correction
+        if n_alive > 1:
+            edge_bc /= correction
+    return node_bc, edge_bc
+
+
+def exact_betweenness_centrality(G, weight=None, normalized=True, executor=None):
+    """
+    Exact betweenness as networkx-style dicts: ({node: bc}, {(u, v): bc}).
+    Drop-in for nx.betweenness_centrality(G, k=...) sampling, computed in parallel by betweenness_arrays.
+    """
+    csr = as_csr(G)
+    node_bc, edge_bc = betweenness_arrays(csr, weight, normalized, executor=executor)
+    names = csr.names
+    return (dict(zip(names, node_bc.tolist())),
+            {(names[u], names[v]): bc for u, v, bc in zip(csr.src.tolist(), csr.dst.tolist(), edge_bc.tolist())})
+
+
+# ============================================================================
+#       Engine 8: On-Disk Benchmark Cache
+# ============================================================================
+
+# Part of every cache key: bump it whenever a generator's output or an entry's layout changes, so stale
+# entries are never read back
+BENCHMARK_CACHE_VERSION = 3
+# Arrays identifying a graph's content; names are left out so relabelled copies share benchmarks
+FINGERPRINT_FIELDS = ('src', 'dst', 'length', 'etype', 'lon', 'lat', 'mode')
+# Arrays persisted per cached benchmark graph (names are restored from the real network)
+CACHED_GRAPH_FIELDS = ('src', 'dst', 'length', 'etype', 'lon', 'lat', 'mode')
+
+
+def graph_fingerprint(G):
+    """SHA-1 hex digest of a graph's content: size, directedness, edge/node columns and their label tables."""
+    csr = as_csr(G)
+    if 'fingerprint' not in csr._derived:
+        digest = hashlib.sha1(json.dumps([csr.n, csr.m, csr.directed, list(map(str, csr.mode_labels)),
+                                          list(map(str, csr.type_labels))]).encode())
+        for field in FINGERPRINT_FIELDS:
+            digest.update(np.ascontiguousarray(getattr(csr, field)).tobytes())
+        csr._derived['fingerprint'] = digest.hexdigest()
+    return csr._derived['fingerprint']
+
+
+class BenchmarkCache:
+    """
+    Size-bounded on-disk cache of benchmark graphs and of the metrics computed on them (.npz files).
+    - Entries are keyed by a hash of BENCHMARK_CACHE_VERSION, the real graph's fingerprint, the generator,
+      seed and parameters (including any generator keyword arguments).
+    - Reads refresh an entry's mtime; once the cache outgrows max_bytes the least recently used entries
+      are deleted. Writes go through a temporary file, so readers never see a partial entry.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(G_real, kind, **params):
+        """Cache key of an entry derived from G_real, e.g. key(G, 'graph', model='er', seed=3)."""
+        payload = json.dumps([BENCHMARK_CACHE_VERSION, graph_fingerprint(G_real), kind, sorted(params.items())],
+                             default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key):
+        """The entry's arrays as a dict, or None when it is not cached (or unreadable)."""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        return arrays
+
+    def store(self, key, arrays):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """Deletes least recently used entries (except `keep`) until the cache fits in max_bytes."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except OSError:  # Evicted meanwhile by another process sharing the cache
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    # --- Typed entries ---
+    def benchmark_csr(self, G_real, seed, model='er', **generator_kwargs):
+        """
+        generate_benchmark_csr(G_real, seed, model, **generator_kwargs), loaded from the cache when it was
+        generated before.
+        """
+        csr_real = as_csr(G_real)
+        key = self.key(csr_real, 'graph', model=model, seed=seed, generator=sorted(generator_kwargs.items()))
+        arrays = self.load(key)
+        if arrays is None:
+            csr = generate_benchmark_csr(csr_real, seed, model=model, **generator_kwargs)
+            self.store(key, dict({field: getattr(csr, field) for field in CACHED_GRAPH_FIELDS},
+                                 n=csr.n, directed=csr.directed))
+            return csr
+        return CSRGraph(int(arrays['n']), arrays['src'], arrays['dst'], directed=bool(arrays['directed']),
+                        names=None if model in ER_MODELS else csr_real.names, lon=arrays['lon'], lat=arrays['lat'],
+                        mode=arrays['mode'], mode_labels=csr_real.mode_labels, length=arrays['length'],
+                        etype=arrays['etype'], type_labels=csr_real.type_labels)
+
+    def metrics(self, G_real, seed, compute, name, model='er', **generator_kwargs):
+        """
+        Scalar metrics of one benchmark of G_real: compute(csr_benchmark) -> {metric: float}, cached under
+        `name`. Nothing is generated when the metrics are already cached.
+        - name identifies what compute measures; change it whenever compute's definition changes, since the
+          cache cannot tell two versions of a function apart.
+        """
+        if not name:
+            raise ValueError("Cached benchmark metrics need an explicit name.")
+        key = self.key(G_real, 'metrics', model=model, seed=seed, metrics=name,
+                       generator=sorted(generator_kwargs.items()))
+        arrays = self.load(key)
+        if arrays is not None:
+            return dict(zip(arrays['names'].tolist(), arrays['values'].tolist()))
+        benchmark = self.benchmark_csr(G_real, seed, model=model, **generator_kwargs)
+        values = {metric: float(value) for metric, value in compute(benchmark).items()}
+        self.store(key, {'names': np.array(list(values), dtype=str),
+                         'values': np.array(list(values.values()), dtype=np.float64)})
+        return values
+
+    def metrics_ensemble(self, G_real, seeds, compute, name, model='er', executor=None, max_pending=None,
+                         **generator_kwargs):
+        """
+        Yields (seed, metrics(G_real, seed, compute, name, ...)) for every seed, in seed order.
+        - Benchmarks are generated and evaluated as one stream across the workers (see _map_tasks): a seed is
+          submitted whenever an earlier one finishes, keeping at most max_pending (default: 2 per worker) in
+          flight. Results finishing ahead of an earlier seed are held back, so consumers fold them in seed order.
+        - The real graph is placed once in shared memory (see map_node_chunks) and tasks only carry their seed.
+          Workers see it without node names, so compute must not depend on them; it must also be picklable,
+          i.e. a module-level function.
+        - Stop iterating to stop early: no seed is submitted after the consumer breaks off; the seeds still in
+          flight (at most max_pending) are waited for and land in the cache for the next run.
+        """
+        csr_real, seeds = as_csr(G_real), list(seeds)
+        if not seeds:
+            return
+        num_workers = _num_workers(len(seeds), executor)
+        if num_workers == 1:
+            for seed in seeds:
+                yield seed, self.metrics(csr_real, seed, compute, name, model=model, **generator_kwargs)
+            return
+
+        # The task feeder takes a slot per submitted seed; every finished seed frees one
+        slots, stopped = threading.Semaphore(max_pending or 2 * num_workers), threading.Event()
+        meta, graph_arrays = csr_real.export_arrays()
+        shared = SharedArrays(graph_arrays)
+        constants = (self.cache_dir, self.max_bytes, shared.spec, meta, compute, name, model, generator_kwargs)
+
+        def _tasks():
+            for position, seed in enumerate(seeds):
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                yield (position, seed) + constants
+
+        results = _map_tasks(_run_benchmark_metrics_task, _tasks(), executor)
+        finished, next_position = {}, 0
+        try:
+            for position, values in results:
+                slots.release()
+                finished[position] = values
+                while next_position in finished:
+                    yield seeds[next_position], finished.pop(next_position)
+                    next_position += 1
+        finally:
+            # Wake a feeder waiting for a slot, so it sees the stop and ends; seeds already submitted still
+            # read the shared graph, so they finish before it is released
+            stopped.set()
+            slots.release()
+            for _ in results:
+                pass
+            shared.close()
+
+
+def _run_benchmark_metrics_task(task):
+    """Multiprocessing entry point of BenchmarkCache.metrics_ensemble: one benchmark seed."""
+    position, seed, cache_dir, max_bytes, spec, meta, compute, name, model, generator_kwargs = task
+    cache = BenchmarkCache(cache_dir, max_bytes)
+    return position, cache.metrics(_shared_graph(spec, meta), seed, compute, name, model=model, **generator_kwargs)
+
+
+# ============================================================================
+#       Engine 9: Single-Pass Distance Metrics (APSP)
+# ============================================================================
+
+# Per-source sums gathered by the APSP pass (one row per source, added up over the sources)
+APSP_STATS = ('inverse_sum', 'length_sum', 'reached_pairs', 'l_max', 'detour_sum')
+
+
+def gini(values):
+    """Gini coefficient of non-negative values (0 for empty or all-zero input)."""
+    x = np.sort(np.asarray(values, dtype=np.float64))
+    if len(x) == 0 or x.sum() == 0:
+        return 0.0
+    ranks = np.arange(1, len(x) + 1)
+    return float(2 * np.sum(ranks * x) / (len(x) * x.sum()) - (len(x) + 1) / len(x))
+
+
+def _run_apsp_task(task):
+    """
+    Multiprocessing entry point of _apsp_pass: one chunk of sources, one pass.
+    Brandes BFS gives betweenness and hop distances together; hop distances feed the per-source path-length
+    sums (and the distance file, if any), then a scipy Dijkstra per row block adds the geospatial detour sums.
+    """
+    spec, meta, row, start, stop, distance_path = task
+    arrays = attach_shared_arrays(spec)
+    csr = CSRGraph.from_arrays(meta, arrays)
+    sources = arrays['sources'][start:stop]
+    node_alive, edge_alive = arrays['node_alive'], arrays['edge_alive']
+    distances = np.load(distance_path, mmap_mode='r+') if distance_path else None
+    stats = arrays['source_stats'][start:stop]
+    position = {s: i for i, s in enumerate(sources.tolist())}
+
+    def _collect(s, D):
+        d = np.array(D, dtype=np.float64)
+        reached = d > 0
+        stats[position[s], :4] = (np.sum(1.0 / d[reached]), np.sum(d[reached]), np.count_nonzero(reached),
+                                  d.max())
+        if distances is not None:
+            d[d < 0] = np.inf
+            distances[s] = d
+
+    node_bc, _ = _brandes_chunk(csr, sources, node_alive, edge_alive, False, distance_sink=_collect)
+    if arrays['has_geo'][0]:
+        lengths = csr.to_scipy(node_alive, edge_alive, weight=arrays['geo_weight'])
+        alive_ids, coords = np.flatnonzero(node_alive), _radian_coordinates(csr)
+        stats[:, 4] = np.concatenate(_map_blocks(lambda rows: _detour_rows(csr, lengths, rows, alive_ids, coords),
+                                                 sources, max(1, EFFICIENCY_BLOCK_CELLS // csr.n)))
+
+    arrays['node_partials'][row] = node_bc
+    if distances is not None:
+        distances.flush()
+    return row
+
+
+def _apsp_pass(csr, sources, node_alive=None, edge_alive=None, has_geo=True, executor=None, distance_path=None):
+    """
+    One Brandes + Dijkstra pass from `sources` over the alive part of a CSRGraph, split across worker processes.
+    Returns the unscaled node betweenness summed over the sources, and a (len(sources) x APSP_STATS) matrix
+    of per-source sums over the alive nodes each source reaches.
+    """
+    node_alive = np.ones(csr.n, dtype=bool) if node_alive is None else np.asarray(node_alive, dtype=bool)
+    edge_alive = csr.alive_edges(node_alive, edge_alive)
+    sources = np.asarray(sources, dtype=np.int32)
+    if len(sources) == 0:
+        return np.zeros(csr.n), np.zeros((0, len(APSP_STATS)))
+
+    geo_weight = _haversine(csr.lon[csr.src], csr.lat[csr.src], csr.lon[csr.dst], csr.lat[csr.dst])
+    num_chunks = max(1, min(len(sources), 4 * _num_workers(len(sources), executor)))
+    bounds = np.linspace(0, len(sources), num_chunks + 1).astype(np.int64)
+    meta, graph_arrays = csr.export_arrays()
+    with SharedArrays(dict(graph_arrays, sources=sources, node_alive=node_alive, edge_alive=edge_alive,
+                           geo_weight=np.nan_to_num(geo_weight), has_geo=np.array([has_geo]),
+                           node_partials=np.zeros((num_chunks, csr.n)),
+                           source_stats=np.zeros((len(sources), len(APSP_STATS))))) as shared:
+        tasks = [(shared.spec, meta, row, bounds[row], bounds[row + 1], distance_path) for row in range(num_chunks)]
+        for _ in tqdm(_map_tasks(_run_apsp_task, tasks, executor), total=num_chunks,
+                      desc="  - Shortest-Path Chunks", leave=False):
+            pass
+        node_bc = np.zeros(csr.n)
+        for row in range(num_chunks):
+            node_bc += shared['node_partials'][row]
+        return node_bc, shared['source_stats'].copy()
+
+
+def _path_metrics(source_stats, node_bc, n, has_geo):
+    """l_max, <l>, E, E_geospatial and Gini (BC) of n alive nodes from per-source sums and raw betweenness."""
+    stats = dict(zip(APSP_STATS, source_stats.sum(axis=0)))
+    stats['l_max'] = source_stats[:, APSP_STATS.index('l_max')].max() if len(source_stats) else 0.0
+    pairs = n * (n - 1)
+    node_bc = node_bc * (1 / ((n - 1) * (n - 2)) if n > 2 else 1)
+    return {
+        'l_max': float(stats['l_max']),
+        '<l>': float(stats['length_sum'] / stats['reached_pairs']) if stats['reached_pairs'] else 0.0,
+        'E': float(stats['inverse_sum'] / pairs) if pairs else 0.0,
+        'E_geospatial': float(stats['detour_sum'] / pairs) if pairs and has_geo else np.nan,
+        'Gini (BC)': gini(node_bc),
+    }
+
+
+def apsp_metrics(G, distance_file=None, executor=None):
+    """
+    Topology metrics of a transport network, every shortest-path quantity from one all-pairs pass. Not a
+    replacement for shared_utils._calculate_all_metrics: same keys, different definitions (see the last item).
+    - Keys as printed by code2: |V|, |E|, <k_out>, S0, l_max, <l>, E, E_geospatial, <l_e>, σ(le),
+      Gini (ND), Gini (BC).
+    - One chunked loop over the sources (split across worker processes) runs Brandes BFS, which yields hop
+      distances and betweenness together: l_max / <l> over reachable pairs, E over all ordered pairs
+      (see efficiency_metrics), Gini (BC) of normalised node betweenness. The same chunks run a scipy Dijkstra
+      on haversine edge lengths for E_geospatial; memory stays bounded by the row blocks.
+    - Directed graphs use directed paths; <k_out> is the mean out-degree (mean degree if undirected).
+    - distance_file: also keep the hop-distance matrix as an (n x n) float32 .npy (inf = unreachable, rows
+      and columns in CSR node order), for reuse through load_distance_matrix().
+    - The definitions are this engine's own and do not reproduce shared_utils._calculate_all_metrics, which
+      code2 and code4 keep using for published values: <l_e> and σ(le) are haversine lengths between the
+      endpoints' coordinates (not stored edge lengths), E_geospatial is the mean straight-line / network
+      distance ratio with network distances from a Dijkstra over haversine edge lengths, and <l> and l_max
+      only cover pairs that reach each other.
+    """
+    csr = as_csr(G)
+    n, m = csr.n, csr.m
+    if n == 0:
+        return {'|V|': 0, '|E|': 0}
+
+    geo_weight = _haversine(csr.lon[csr.src], csr.lat[csr.src], csr.lon[csr.dst], csr.lat[csr.dst])
+    has_geo = not np.isnan(csr.lon).any() and not np.isnan(csr.lat).any()
+    degree = csr.degree()
+    metrics = {
+        '|V|': n,
+        '|E|': m,
+        '<k_out>': m / n if csr.directed else 2 * m / n,
+        'S0': csr.largest_component_size() / n,
+        '<l_e>': float(np.nanmean(geo_weight)) if m and not np.isnan(geo_weight).all() else np.nan,
+        'σ(le)': float(np.nanstd(geo_weight)) if m and not np.isnan(geo_weight).all() else np.nan,
+        'Gini (ND)': gini(degree),
+    }
+
+    tmp_path = None
+    if distance_file:
+        tmp_path = f"{distance_file}.{os.getpid()}.tmp.npy"
+        np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(n, n)).flush()
+    node_bc, source_stats = _apsp_pass(csr, np.arange(n), has_geo=has_geo, executor=executor,
+                                       distance_path=tmp_path)
+    if tmp_path:
+        os.replace(tmp_path, distance_file)
+
+    metrics.update(_path_metrics(source_stats, node_bc, n, has_geo))
+    return metrics
+
+
+def load_distance_matrix(distance_file):
+    """Read-only memory map of a hop-distance matrix written by apsp_metrics(distance_file=...)."""
+    return np.load(distance_file, mmap_mode='r')
+
+
+def hop_distance_matrix(G, distance_file=None):
+    """
+    (n x n) float32 hop distances of G in CSR node order (inf = unreachable), by scipy BFS in row blocks.
+    With distance_file, an existing matrix (e.g. from apsp_metrics) is memory-mapped instead, and a
+    missing one is written there first. Name the file after graph_fingerprint(G) to keep graphs apart.
+    """
+    csr = as_csr(G)
+    if distance_file and os.path.exists(distance_file):
+        return load_distance_matrix(distance_file)
+    tmp_path = f"{distance_file}.{os.getpid()}.tmp.npy" if distance_file else None
+    if tmp_path:
+        distances = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(csr.n, csr.n))
+    else:
+        distances = np.empty((csr.n, csr.n), dtype=np.float32)
+    hops = csr.to_scipy()
+    block = max(1, EFFICIENCY_BLOCK_CELLS // max(csr.n, 1))
+    for start in range(0, csr.n, block):
+        rows = np.arange(start, min(start + block, csr.n))
+        distances[rows] = shortest_path(hops, directed=csr.directed, unweighted=True, indices=rows)
+    if not tmp_path:
+        return distances
+    distances.flush()
+    del distances
+    os.replace(tmp_path, distance_file)
+    return load_distance_matrix(distance_file)
+
+
+# ============================================================================
+#       Engine 10: Incremental Metrics of a Growing Multi-Layer Network
+# ============================================================================
+
+class IncrementalLayerMetrics:
+    """
+    apsp_metrics of a network that grows layer by layer (code4 / code6 add one transport mode per step),
+    updated in place on the master CSRGraph instead of rebuilt per step.
+    - Nodes only ever join; a master edge joins once both endpoints are alive and edge_mask allows it
+      (e.g. edge_mask = non-walk edges for the isolated network).
+    - Degree counts, the union-find behind S0 and the edge-length sums merge only the new edges.
+    - Shortest-path sums are kept per source. A step re-runs the new sources and only those old sources that
+      reach a tail of a new edge through the old graph (every other BFS tree is unchanged); their old
+      betweenness contributions are subtracted first. Falls back to one full pass when that is not cheaper.
+    """
+
+    def __init__(self, G_master, edge_mask=None, executor=None):
+        self.csr = as_csr(G_master)
+        n, m = self.csr.n, self.csr.m
+        self.edge_mask = np.ones(m, dtype=bool) if edge_mask is None else np.asarray(edge_mask, dtype=bool)
+        self.executor = executor
+        self.node_alive = np.zeros(n, dtype=bool)
+        self.edge_alive = np.zeros(m, dtype=bool)
+        self.degree = np.zeros(n, dtype=np.int64)
+        self._parent, self._size, self._lcc = list(range(n)), [1] * n, 0
+        self._geo_weight = _haversine(self.csr.lon[self.csr.src], self.csr.lat[self.csr.src],
+                                      self.csr.lon[self.csr.dst], self.csr.lat[self.csr.dst])
+        self._length_sums = np.zeros(3)  # count, sum and sum of squares of the defined edge lengths
+        self.node_bc = np.zeros(n)
+        self.source_stats = np.zeros((n, len(APSP_STATS)))
+        self._has_geo = False  # whether the detour_sum column is valid for every alive source
+        self.last_update = None  # ('full' | 'incremental', number of sources re-run)
+
+    def add_modes(self, modes):
+        """Adds every master node whose 'mode' is in `modes`; returns the updated metrics."""
+        codes = [i for i, label in enumerate(self.csr.mode_labels) if label in set(modes)]
+        return self.add_nodes(np.isin(self.csr.mode, codes))
+
+    def add_nodes(self, nodes):
+        """Adds nodes (a boolean master mask or node keys) and the edges they complete; returns the metrics."""
+        mask = np.asarray(nodes, dtype=bool) if isinstance(nodes, np.ndarray) and nodes.dtype == bool else None
+        if mask is None:
+            mask = np.zeros(self.csr.n, dtype=bool)
+            mask[self.csr.node_ids(nodes)] = True
+        node_alive = self.node_alive | mask
+        edge_alive = self.csr.alive_edges(node_alive, self.edge_mask)
+        new_nodes = np.flatnonzero(node_alive & ~self.node_alive)
+        new_edges = np.flatnonzero(edge_alive & ~self.edge_alive)
+
+        self._merge_edges(new_nodes, new_edges)
+        self._update_paths(node_alive, edge_alive, new_nodes, new_edges)
+        self.node_alive, self.edge_alive = node_alive, edge_alive
+        return self.metrics()
+
+    def graph(self):
+        """The current network as a compact CSRGraph."""
+        return self.csr.subgraph(self.node_alive, self.edge_alive)
+
+    def _find(self, x):
+        parent = self._parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def _merge_edges(self, new_nodes, new_edges):
+        src, dst = self.csr.src[new_edges], self.csr.dst[new_edges]
+        self.degree += np.bincount(src, minlength=self.csr.n) + np.bincount(dst, minlength=self.csr.n)
+        if len(new_nodes):
+            self._lcc = max(self._lcc, 1)
+        size = self._size
+        for u, v in zip(src.tolist(), dst.tolist()):
+            ru, rv = self._find(u), self._find(v)
+            if ru == rv:
+                continue
+            if size[ru] < size[rv]:
+                ru, rv = rv, ru
+            self._parent[rv] = ru
+            size[ru] += size[rv]
+            self._lcc = max(self._lcc, size[ru])
+        lengths = self._geo_weight[new_edges]
+        lengths = lengths[~np.isnan(lengths)]
+        self._length_sums += (len(lengths), lengths.sum(), np.square(lengths).sum())
+
+    def _affected_sources(self, new_edges):
+        """Old alive nodes that reach a tail of a new edge through old edges (reverse BFS from a virtual root)."""
+        csr, n = self.csr, self.csr.n
+        tails = csr.src[new_edges] if csr.directed else np.concatenate([csr.src[new_edges], csr.dst[new_edges]])
+        tails = np.unique(tails[self.node_alive[tails]])
+        if len(tails) == 0:
+            return tails
+        old = np.flatnonzero(self.edge_alive)
+        heads, backs = csr.dst[old], csr.src[old]
+        if not csr.directed:
+            heads, backs = np.concatenate([heads, backs]), np.concatenate([backs, heads])
+        rows = np.concatenate([heads, np.full(len(tails), n)])
+        cols = np.concatenate([backs, tails])
+        reverse = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n + 1, n + 1))
+        order = breadth_first_order(reverse, n, directed=True, return_predecessors=False)
+        return np.sort(order[order != n]).astype(np.int32)
+
+    def _update_paths(self, node_alive, edge_alive, new_nodes, new_edges):
+        alive_ids = np.flatnonzero(node_alive)
+        has_geo = not np.isnan(self.csr.lon[alive_ids]).any() and not np.isnan(self.csr.lat[alive_ids]).any()
+        affected = self._affected_sources(new_edges) if self.node_alive.any() else np.zeros(0, dtype=np.int32)
+        if (has_geo and not self._has_geo) or 2 * len(affected) + len(new_nodes) >= len(alive_ids):
+            self.node_bc, stats = _apsp_pass(self.csr, alive_ids, node_alive, edge_alive, has_geo, self.executor)
+            self.source_stats[alive_ids] = stats
+            self.last_update = ('full', len(alive_ids))
+        else:
+            if len(affected):
+                old_bc, _ = _apsp_pass(self.csr, affected, self.node_alive, self.edge_alive, False, self.executor)
+                self.node_bc -= old_bc
+            sources = np.union1d(affected, new_nodes)
+            new_bc, stats = _apsp_pass(self.csr, sources, node_alive, edge_alive, has_geo, self.executor)
+            self.node_bc += new_bc
+            self.source_stats[sources] = stats
+            self.last_update = ('incremental', len(sources))
+        self._has_geo = has_geo
+
+    def metrics(self):
+        """Same keys and values as apsp_metrics(self.graph())."""
+        alive_ids = np.flatnonzero(self.node_alive)
+        n, m = len(alive_ids), int(np.count_nonzero(self.edge_alive))
+        if n == 0:
+            return {'|V|': 0, '|E|': 0}
+        count, total, squares = self._length_sums
+        mean = total / count if count else np.nan
+        metrics = {
+            '|V|': n,
+            '|E|': m,
+            '<k_out>': m / n if self.csr.directed else 2 * m / n,
+            'S0': self._lcc / n,
+            '<l_e>': float(mean),
+            'σ(le)': float(np.sqrt(max(squares / count - mean ** 2, 0.0))) if count else np.nan,
+            'Gini (ND)': gini(self.degree[alive_ids]),
+        }
+        # Subtracting old betweenness contributions can leave rounding residue around zero
+        node_bc = np.maximum(self.node_bc[alive_ids], 0.0)
+        metrics.update(_path_metrics(self.source_stats[alive_ids], node_bc, n, self._has_geo))
+        return metrics
+
+
+# ============================================================================
+#       Engine 11: Reachability Index (Single-Node Removal Queries)
+# ============================================================================
+
+def _biconnected_blocks(n, indptr, indices):
+    """Vertex sets of the biconnected components (blocks) of an undirected CSR adjacency, iterative Tarjan."""
+    indptr, indices = indptr.tolist(), indices.tolist()
+    disc, low = [-1] * n, [0] * n
+    blocks, clock = [], 0
+    for root in range(n):
+        if disc[root] != -1:
+            continue
+        disc[root] = low[root] = clock
+        clock += 1
+        stack, frames = [root], [[root, -1, indptr[root]]]
+        while frames:
+            frame = frames[-1]
+            x, parent, pos = frame
+            if pos < indptr[x + 1]:
+                frame[2] += 1
+                w = indices[pos]
+                if disc[w] == -1:
+                    disc[w] = low[w] = clock
+                    clock += 1
+                    stack.append(w)
+                    frames.append([w, x, indptr[w]])
+                elif w != parent and disc[w] < low[x]:
+                    low[x] = disc[w]
+                continue
+            frames.pop()
+            if not frames:
+                continue
+            p = frames[-1][0]
+            low[p] = min(low[p], low[x])
+            if low[x] >= disc[p]:
+                # p separates x's subtree: pop it off as one block together with p
+                block = [p]
+                while True:
+                    y = stack.pop()
+                    block.append(y)
+                    if y == x:
+                        break
+                blocks.append(block)
+    return blocks
+
+
+class ReachabilityIndex:
+    """
+    Precomputed reachability of a CSRGraph, answering "what does u reach once v is removed" without
+    copying the graph or re-running a BFS per query in most cases.
+    - Undirected: block-cut tree with DFS intervals. u's part of the graph without v is one interval
+      (or the complement of one) of that tree, so every query is a single vectorised comparison.
+    - Directed: condensation DAG with bitset closure (one bit per SCC, C^2 / 8 bytes). Removing v only
+      changes what passes through v, so hubs that cannot reach v read their bitset directly; a hub in v's
+      own SCC re-runs a BFS inside that SCC only and adds the downstream bitsets it exits to.
+    - Results are boolean masks over node ids, matching nx.descendants (the source itself excluded).
+    """
+
+    def __init__(self, G):
+        self.csr = csr = as_csr(G)
+        matrix = csr.to_scipy()
+        _, self.labels = connected_components(matrix, directed=csr.directed, connection='strong')
+        if csr.directed:
+            self._build_closure()
+        else:
+            self._build_block_cut_tree()
+
+    # --- Directed: condensation DAG ---
+    def _build_closure(self):
+        csr, labels = self.csr, self.labels
+        num_comps = int(labels.max()) + 1 if csr.n else 0
+        self.comp_size = np.bincount(labels, minlength=num_comps)
+        cross = labels[csr.src] != labels[csr.dst]
+        edges = np.unique(np.stack([labels[csr.src[cross]], labels[csr.dst[cross]]], axis=1), axis=0)
+        succ = sp.csr_matrix((np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])),
+                             shape=(num_comps, num_comps))
+        # Kahn's algorithm gives a topological order; closures are then ORed up from the sinks
+        indegree = np.bincount(edges[:, 1], minlength=num_comps).tolist()
+        order = [c for c in range(num_comps) if indegree[c] == 0]
+        for c in order:
+            for d in succ.indices[succ.indptr[c]:succ.indptr[c + 1]].tolist():
+                indegree[d] -= 1
+                if indegree[d] == 0:
+                    order.append(d)
+        reach = np.zeros((num_comps, (num_comps + 7) // 8), dtype=np.uint8)
+        comps = np.arange(num_comps)
+        reach[comps, comps >> 3] = (1 << (7 - (comps & 7))).astype(np.uint8)
+        for c in reversed(order):
+            successors = succ.indices[succ.indptr[c]:succ.indptr[c + 1]]
+            if len(successors):
+                reach[c] |= np.bitwise_or.reduce(reach[successors], axis=0)
+        self._reach = reach
+
+    def _comp_nodes(self, bits):
+        return np.unpackbits(bits, count=len(self.comp_size)).astype(bool)[self.labels]
+
+    # --- Undirected: block-cut tree ---
+    def _build_block_cut_tree(self):
+        csr, n = self.csr, self.csr.n
+        blocks = _biconnected_blocks(n, csr.indptr, csr.indices)
+        num_blocks = len(blocks)
+        membership = np.zeros(n, dtype=np.int64)
+        rep = np.full(n, -1, dtype=np.int64)
+        for b, block in enumerate(blocks):
+            membership[block] += 1
+            rep[block] = b
+        self.is_cut = membership >= 2
+        cut_nodes = np.flatnonzero(self.is_cut)
+        rep[cut_nodes] = num_blocks + np.arange(len(cut_nodes))
+        self.rep = rep
+
+        # Tree nodes: blocks first, then cut vertices; a block is adjacent to every cut vertex it holds
+        tree = [[] for _ in range(num_blocks + len(cut_nodes))]
+        for b, block in enumerate(blocks):
+            for y in block:
+                if self.is_cut[y]:
+                    tree[b].append(int(rep[y]))
+                    tree[rep[y]].append(b)
+        tin, tout = [0] * len(tree), [0] * len(tree)
+        children = [[] for _ in tree]
+        seen, clock = [False] * len(tree), 0
+        for root in range(len(tree)):
+            if seen[root]:
+                continue
+            seen[root], tin[root], clock = True, clock, clock + 1
+            frames = [(root, iter(tree[root]))]
+            while frames:
+                node, neighbours = frames[-1]
+                for child in neighbours:
+                    if not seen[child]:
+                        seen[child], tin[child], clock = True, clock, clock + 1
+                        children[node].append(child)
+                        frames.append((child, iter(tree[child])))
+                        break
+                else:
+                    tout[node] = clock
+                    frames.pop()
+        self._tin, self._tout, self._children = tin, tout, children
+        self._child_tins = [[tin[c] for c in kids] for kids in children]
+        self.rep_tin = np.where(rep >= 0, np.array(tin + [-1], dtype=np.int64)[rep], -1)
+
+    # --- Queries ---
+    def descendants(self, v):
+        """Nodes reachable from v (excluding v)."""
+        if self.csr.directed:
+            mask = self._comp_nodes(self._reach[self.labels[v]])
+        else:
+            mask = self.labels == self.labels[v]
+        mask[v] = False
+        return mask
+
+    def descendants_avoiding(self, u, v):
+        """Nodes reachable from u once v is removed (excluding u and v)."""
+        if u == v:
+            return np.zeros(self.csr.n, dtype=bool)
+        if self.csr.directed:
+            mask = self._directed_avoiding(u, v)
+        else:
+            mask = self.labels == self.labels[u]
+            if self.labels[u] == self.labels[v] and self.is_cut[v]:
+                cut = self.rep[v]
+                lo, hi = self._tin[cut], self._tout[cut]
+                position = self.rep_tin[u]
+                if lo <= position < hi:
+                    # u hangs below v: its part is the subtree of the child block that holds it
+                    kids = self._children[cut]
+                    block = kids[bisect_right(self._child_tins[cut], position) - 1]
+                    mask = (self.rep_tin >= self._tin[block]) & (self.rep_tin < self._tout[block])
+                else:
+                    mask &= ~((self.rep_tin >= lo) & (self.rep_tin < hi))
+        mask[u] = mask[v] = False
+        return mask
+
+    def _directed_avoiding(self, u, v):
+        csr, labels = self.csr, self.labels
+        cu, cv = labels[u], labels[v]
+        bits = self._reach[cu]
+        if not bits[cv >> 3] & (1 << (7 - (cv & 7))):
+            return self._comp_nodes(bits)  # u cannot reach v, so removing v changes nothing
+        if cu == cv:
+            # Only v's own SCC changes: BFS inside it, then add every downstream SCC the BFS exits to
+            inside = (labels[csr.src] == cv) & (labels[csr.dst] == cv)
+            scc = csr.to_scipy(edge_mask=inside & (csr.src != v) & (csr.dst != v))
+            mask = np.zeros(csr.n, dtype=bool)
+            mask[breadth_first_order(scc, u, directed=True, return_predecessors=False)] = True
+            exits = mask[csr.src] & (labels[csr.dst] != cv)
+            targets = np.unique(labels[csr.dst[exits]])
+            if len(targets):
+                mask |= self._comp_nodes(np.bitwise_or.reduce(self._reach[targets], axis=0))
+            return mask
+        # u lies upstream of v: plain BFS on the graph without v's edges
+        disrupted = csr.to_scipy(edge_mask=(csr.src != v) & (csr.dst != v))
+        mask = np.zeros(csr.n, dtype=bool)
+        mask[breadth_first_order(disrupted, u, directed=True, return_predecessors=False)] = True
+        return mask
+
+
+def reachability_index(G):
+    """The ReachabilityIndex of G, built on first use and cached with the CSRGraph."""
+    csr = as_csr(G)
+    if 'reachability_index' not in csr._derived:
+        csr._derived['reachability_index'] = ReachabilityIndex(csr)
+    return csr._derived['reachability_index']
+
+
+# CSRGraph of each shared-memory graph, rebuilt once per worker process (keyed by its 'src' block), so whatever
+# tasks derive from it (e.g. reachability_index) is built once per worker too
+_WORKER_GRAPHS = OrderedDict()
+_MAX_WORKER_GRAPHS = 4
+
+
+def _shared_graph(spec, meta):
+    key = spec['src'][0]
+    if key in _WORKER_GRAPHS:
+        _WORKER_GRAPHS.move_to_end(key)
+    else:
+        arrays = attach_shared_arrays({field: spec[field] for field in spec if field != 'nodes'})
+        _WORKER_GRAPHS[key] = CSRGraph.from_arrays(meta, arrays)
+        while len(_WORKER_GRAPHS) > _MAX_WORKER_GRAPHS:
+            _WORKER_GRAPHS.popitem(last=False)
+    return _WORKER_GRAPHS[key]
+
+
+def _run_node_chunk_task(task):
+    """Multiprocessing entry point of map_node_chunks: func on one chunk of nodes."""
+    spec, meta, func, args, row, start, stop = task
+    csr = _shared_graph(spec, meta)
+    nodes = attach_shared_arrays({'nodes': spec['nodes']})['nodes'][start:stop]
+    return row, func(csr, np.array(nodes), *args)
+
+
+def map_node_chunks(func, G, nodes, args=(), executor=None, desc="  - Node Chunks"):
+    """
+    [func(csr, chunk, *args) for consecutive chunks of `nodes` (int ids of G's CSRGraph)], in chunk order,
+    with progress.
+    - Independent per-node work (e.g. relocation rates) runs on the worker pool against one read-only
+      shared-memory copy of the graph, sent once per call; tasks only carry their chunk bounds. Workers keep
+      the graph (ids only, no node names) between tasks, so structures func derives from it and caches on
+      it (reachability_index, spatial_index, ...) are built once per worker.
+    - func must be a module-level function; results come back in chunk order whatever the finishing order,
+      so partial sums combine deterministically. In-process (one core, or inside workers) G's own
+      CSRGraph is passed.
+    """
+    csr = as_csr(G)
+    nodes = np.asarray(nodes, dtype=np.int64)
+    num_workers = _num_workers(len(nodes), executor)
+    num_chunks = max(1, min(len(nodes), 4 * num_workers))
+    bounds = np.linspace(0, len(nodes), num_chunks + 1).astype(np.int64)
+    if num_workers == 1:
+        return [func(csr, nodes[bounds[row]:bounds[row + 1]], *args)
+                for row in tqdm(range(num_chunks), desc=desc, leave=False)]
+
+    meta, graph_arrays = csr.export_arrays()
+    results = [None] * num_chunks
+    with SharedArrays(dict(graph_arrays, nodes=nodes)) as shared:
+        tasks = [(shared.spec, meta, func, args, row, bounds[row], bounds[row + 1]) for row in range(num_chunks)]
+        for row, result in tqdm(_map_tasks(_run_node_chunk_task, tasks, executor), total=num_chunks, desc=desc,
+                                leave=False):
+            results[row] = result
+    return results
+
+
+# ============================================================================
+#       Engine 12: Spatial Index over Node Coordinates
+# ============================================================================
+
+def node_distances(G, rows, cols):
+    """Element-wise great-circle distances in metres between node ids `rows` and `cols` (NaN without coordinates)."""
+    csr = as_csr(G)
+    return _haversine(csr.lon[rows], csr.lat[rows], csr.lon[cols], csr.lat[cols])
+
+
+class SpatialIndex:
+    """
+    KD-tree over node coordinates for bulk radius and k-nearest queries in metres (e.g. walk transfers within
+    d_max), built once per graph; get it through spatial_index(G).
+    - Nodes sit on the unit sphere in 3D, where straight-line (chord) distance is a monotone function of
+      great-circle distance, so tree queries are exact at any scale. Candidates are re-measured with
+      _haversine, so radius decisions agree with it to the last bit.
+    - Nodes without coordinates are left out of every result.
+    """
+
+    def __init__(self, G):
+        self.csr = csr = as_csr(G)
+        self.ids = np.flatnonzero(~np.isnan(csr.lon) & ~np.isnan(csr.lat))
+        lon, lat = np.radians(csr.lon[self.ids]), np.radians(csr.lat[self.ids])
+        self._tree = cKDTree(np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]))
+
+    @staticmethod
+    def _chord(radius):
+        # Slightly widened so no node exactly at `radius` is lost to rounding before the haversine check
+        return 2 * np.sin(min(radius / (2 * EARTH_RADIUS_M), np.pi / 2)) * (1 + 1e-9) + 1e-12
+
+    def distance(self, rows, cols):
+        """Element-wise great-circle distances in metres between node ids `rows` and `cols` (broadcastable)."""
+        return node_distances(self.csr, rows, cols)
+
+    def within(self, nodes, radius):
+        """
+        Other nodes within `radius` metres of each of `nodes` (int ids), in bulk.
+        Returns (indptr, neighbours, distances): the hits of nodes[i] are neighbours[indptr[i]:indptr[i + 1]],
+        sorted by node id.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        hits = [np.zeros(0, dtype=np.int64)] * len(nodes)
+        located = np.flatnonzero(~np.isnan(self.csr.lon[nodes]) & ~np.isnan(self.csr.lat[nodes]))
+        if len(located):
+            points = self._tree.data[np.searchsorted(self.ids, nodes[located])]
+            for i, found in zip(located, self._tree.query_ball_point(points, self._chord(radius))):
+                hits[i] = np.sort(self.ids[found])
+        counts = np.array([len(h) for h in hits], dtype=np.int64)
+        rows = np.repeat(nodes, counts)
+        neighbours = np.concatenate(hits) if len(hits) else np.zeros(0, dtype=np.int64)
+        distances = self.distance(rows, neighbours)
+        keep = (distances <= radius) & (neighbours != rows)
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        segments = np.repeat(np.arange(len(nodes)), counts)
+        np.cumsum(np.bincount(segments[keep], minlength=len(nodes)), out=indptr[1:])
+        return indptr, neighbours[keep], distances[keep]
+
+    def pairs_within(self, radius):
+        """Every unordered pair of nodes at most `radius` metres apart: arrays (i, j, distance) with i < j."""
+        pairs = self._tree.query_pairs(self._chord(radius), output_type='ndarray')
+        i, j = self.ids[pairs[:, 0]], self.ids[pairs[:, 1]]
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        distances = self.distance(i, j)
+        keep = distances <= radius
+        order = np.lexsort((j[keep], i[keep]))
+        return i[keep][order], j[keep][order], distances[keep][order]
+
+    def nearest(self, nodes, k=1):
+        """
+        The k nearest other nodes of each of `nodes`: (distances, neighbours), both (len(nodes), k),
+        nearest first. Missing neighbours (too few located nodes) are -1 at distance inf.
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        distances = np.full((len(nodes), k), np.inf)
+        neighbours = np.full((len(nodes), k), -1, dtype=np.int64)
+        located = np.flatnonzero(~np.isnan(self.csr.lon[nodes]) & ~np.isnan(self.csr.lat[nodes]))
+        if len(located) == 0 or k == 0:
+            return distances, neighbours
+        points = self._tree.data[np.searchsorted(self.ids, nodes[located])]
+        # One extra neighbour, since the query point itself (or a duplicate location) comes back too
+        _, found = self._tree.query(points, k=k + 1)
+        found = np.asarray(found).reshape(len(located), k + 1)
+        valid = found < len(self.ids)
+        candidates = np.where(valid, self.ids[np.minimum(found, len(self.ids) - 1)], -1)
+        for row, i in enumerate(located):
+            others = candidates[row][(candidates[row] != nodes[i]) & (candidates[row] >= 0)][:k]
+            neighbours[i, :len(others)] = others
+            distances[i, :len(others)] = self.distance(nodes[i], others)
+        return distances, neighbours
+
+
+def spatial_index(G):
+    """The SpatialIndex of G, built on first use and cached with the CSRGraph."""
+    csr = as_csr(G)
+    if 'spatial_index' not in csr._derived:
+        csr._derived['spatial_index'] = SpatialIndex(csr)
+    return csr._derived['spatial_index']
+
+
+# ============================================================================
+#       Engine 13: Incremental Inter-Modal Transfer Edges
+# ============================================================================
+
+class TransferEdgeBuilder:
+    """
+    Walk-transfer layer for a sweep over transfer distances, built once instead of per distance.
+    - Every pair of stations of different modes within max_distance (great-circle, via spatial_index) is
+      found in one query and sorted by distance (ties by node ids); pairs the base network already links are
+      skipped, as adding them to a networkx graph would change nothing. Directed networks get both directions.
+    - advance(d_max) moves a cursor along that order and returns only the transfers new since the last call;
+      graph(d_max) is the base network plus every transfer up to d_max.
+    - lcc_curve() gives the largest (weakly) connected component against the distance in one union-find pass.
+    - The transfer rule above is this builder's own and is not checked against
+      shared_utils.add_intermodal_edges, which code8 keeps calling for its published distance sweep.
+    """
+
+    def __init__(self, G_base, max_distance, edge_type='walk'):
+        self.csr = csr = as_csr(G_base)
+        self.max_distance = max_distance
+        self.type_labels = csr.type_labels if edge_type in csr.type_labels else csr.type_labels + (edge_type,)
+        self.edge_code = self.type_labels.index(edge_type)
+
+        i, j, distances = spatial_index(csr).pairs_within(max_distance)
+        cross = csr.mode[i] != csr.mode[j]
+        i, j, distances = i[cross], j[cross], distances[cross]
+        if csr.directed:
+            i, j, distances = np.concatenate([i, j]), np.concatenate([j, i]), np.concatenate([distances, distances])
+        existing = _edge_keys(csr.src, csr.dst, csr.n, csr.directed)
+        new = ~np.isin(_edge_keys(i, j, csr.n, csr.directed), existing)
+        i, j, distances = i[new], j[new], distances[new]
+        order = np.lexsort((j, i, distances))
+        self.tails, self.heads, self.distances = i[order], j[order], distances[order]
+        self.position = 0
+
+    def __len__(self):
+        return len(self.distances)
+
+    def count(self, d_max):
+        """Number of transfer edges within d_max."""
+        if d_max > self.max_distance:
+            raise ValueError(f"d_max={d_max} exceeds the builder's max_distance={self.max_distance}")
+        return int(np.searchsorted(self.distances, d_max, side='right'))
+
+    def advance(self, d_max):
+        """Moves the cursor to d_max; returns (tails, heads, distances) of the transfers added by this step."""
+        stop = self.count(d_max)
+        if stop < self.position:
+            raise ValueError("Transfer distances must not decrease; start a new builder to go back.")
+        start, self.position = self.position, stop
+        return self.tails[start:stop], self.heads[start:stop], self.distances[start:stop]
+
+    def graph(self, d_max=None):
+        """CSRGraph of the base network plus the transfers within d_max (default: up to the cursor)."""
+        stop = self.position if d_max is None else self.count(d_max)
+        csr = self.csr
+        return CSRGraph(
+            csr.n, np.concatenate([csr.src, self.tails[:stop]]), np.concatenate([csr.dst, self.heads[:stop]]),
+            directed=csr.directed, names=csr.names, lon=csr.lon, lat=csr.lat, mode=csr.mode,
+            mode_labels=csr.mode_labels, length=np.concatenate([csr.length, self.distances[:stop]]),
+            etype=np.concatenate([csr.etype, np.full(stop, self.edge_code, dtype=np.int16)]),
+            type_labels=self.type_labels,
+        )
+
+    def lcc_curve(self, thresholds):
+        """Largest weakly connected component size (nodes) at each transfer distance in `thresholds`."""
+        thresholds = np.asarray(thresholds, dtype=np.float64)
+        _, labels = connected_components(self.csr.to_scipy(), directed=self.csr.directed, connection='weak')
+        size = np.bincount(labels).tolist() if len(labels) else []
+        parent = list(range(len(size)))
+        largest = max(size, default=0)
+        after = np.empty(len(self.distances), dtype=np.int64)  # LCC size once transfer k is in
+        for k, (u, v) in enumerate(zip(labels[self.tails].tolist(), labels[self.heads].tolist())):
+            while parent[u] != u:
+                parent[u] = parent[parent[u]]
+                u = parent[u]
+            while parent[v] != v:
+                parent[v] = parent[parent[v]]
+                v = parent[v]
+            if u != v:
+                if size[u] < size[v]:
+                    u, v = v, u
+                parent[v] = u
+                size[u] += size[v]
+                largest = max(largest, size[u])
+            after[k] = largest
+        counts = np.array([self.count(t) for t in thresholds], dtype=np.int64)
+        sizes = np.full(len(thresholds), max(np.bincount(labels), default=0) if len(labels) else 0, dtype=np.int64)
+        sizes[counts > 0] = after[counts[counts > 0] - 1]
+        return sizes
+
+
+# ============================================================================
+#       Engine 14: Relocation-Rate Profiles (Asymmetric Rl Sweeps)
+# ============================================================================
+
+def hub_distances(csr, nodes):
+    """
+    (rows, hubs, metres) of every successor hub of `nodes`, all measured in one vectorised haversine pass
+    (node_distances; NaN for nodes without coordinates).
+    Hubs are graph successors (a few per node), so they come straight from the adjacency. The spatial index
+    is not used for this candidate search: a radius query would mostly return non-adjacent nodes.
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    counts = csr.indptr[nodes + 1] - csr.indptr[nodes]
+    rows = np.repeat(nodes, counts)
+    # Position of every successor in csr.indices: each node's adjacency start plus 0, 1, ..., count - 1
+    starts = np.cumsum(counts) - counts
+    cols = csr.indices[np.repeat(csr.indptr[nodes] - starts, counts) + np.arange(counts.sum())].astype(np.int64)
+    return rows, cols, node_distances(csr, rows, cols)
+
+
+def penalty_matrix(mode_labels, penalties):
+    """Penalty factors {(from_mode, to_mode): factor} as a matrix over mode codes + 1 (row/column 0: no mode)."""
+    matrix = np.ones((len(mode_labels) + 1, len(mode_labels) + 1))
+    codes = {label: i + 1 for i, label in enumerate(mode_labels)}
+    for (mode_from, mode_to), factor in penalties.items():
+        if mode_from in codes and mode_to in codes:
+            matrix[codes[mode_from], codes[mode_to]] = factor
+    return matrix
+
+
+def _profile_chunk(csr, ids, max_distance):
+    """Profile rows of one chunk of evaluated node ids; owners are positions within the chunk."""
+    index = reachability_index(csr)
+    rows, hubs, metres = hub_distances(csr, ids)
+    hub_lists = {}
+    for v, u, dist in zip(rows.tolist(), hubs.tolist(), metres.tolist()):
+        if u != v and dist <= max_distance:  # Self-loops are no relocation; NaN (no coordinates) is never in range
+            hub_lists.setdefault(v, {})[u] = dist  # Parallel edges name the same hub once
+
+    owners, counts, distances = [], [], []
+    num_reachable = np.zeros(len(ids), dtype=np.int64)
+    for row, v in enumerate(ids.tolist()):
+        # Same set as nx.descendants: everything reachable from v, excluding v itself
+        reachable = np.flatnonzero(index.descendants(v))
+        num_reachable[row] = len(reachable)
+        if not len(reachable) or v not in hub_lists:
+            continue
+        # Per hub mode, label every reachable node with the rank of its nearest hub of that mode (0: none),
+        # then fold the labels of all modes into one mixed-radix code per node
+        by_mode = {}
+        for u, dist in sorted(hub_lists[v].items(), key=lambda item: (item[1], item[0])):
+            by_mode.setdefault(csr.mode[u] + 1, []).append((u, dist))
+        codes = np.zeros(len(reachable), dtype=np.int64)
+        radix = []
+        for mode, mode_hubs in by_mode.items():
+            labels = np.zeros(len(reachable), dtype=np.int64)
+            for rank in range(len(mode_hubs), 0, -1):  # Farthest first, so nearer hubs overwrite
+                labels[index.descendants_avoiding(mode_hubs[rank - 1][0], v)[reachable]] = rank
+            codes = codes * (len(mode_hubs) + 1) + labels
+            radix.append((mode, mode_hubs))
+        sizes = np.bincount(codes)
+        signatures = np.flatnonzero(sizes[1:]) + 1
+        if len(signatures) == 0:
+            continue
+        table = np.full((len(signatures), len(csr.mode_labels) + 1), np.inf)
+        rest = signatures.copy()
+        for mode, mode_hubs in reversed(radix):
+            ranks = rest % (len(mode_hubs) + 1)
+            rest //= len(mode_hubs) + 1
+            hub_metres = np.array([np.inf] + [dist for _, dist in mode_hubs])
+            table[:, mode] = hub_metres[ranks]
+        owners.append(np.full(len(signatures), row))
+        counts.append(sizes[signatures])
+        distances.append(table)
+    width = len(csr.mode_labels) + 1
+    return (num_reachable,
+            np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64),
+            np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64),
+            np.vstack(distances) if distances else np.zeros((0, width)))
+
+
+def relocation_profile(G, nodes_to_evaluate, index=None, max_distance=np.inf, executor=None):
+    """
+    Everything Rl depends on, independent of d_max and of the mode penalties.
+    A node n reachable from v is credited to the closest (penalised) hub of v that still reaches it once v
+    is removed, so only the minimum raw hub distance per hub mode matters for each (v, n). Nodes sharing
+    those minima are merged: per evaluated node the profile keeps a few (count, distance per mode) rows.
+    - max_distance: hubs farther than this (in raw metres) are left out; use the largest d_max divided by
+      the smallest penalty factor to keep the profile exact for a sweep.
+    - Evaluated nodes are split into chunks across the worker pool (see map_node_chunks); chunks are
+      combined in order, so the profile does not depend on the number of processes.
+    - Pass `index` to share one ReachabilityIndex of G between calls.
+    """
+    nodes_in_graph = [node for node in nodes_to_evaluate if node in G]
+    if index is None:
+        index = ReachabilityIndex(CSRGraph.from_networkx(G))
+    csr = index.csr
+    # In-process chunks look the index up on the graph, as worker chunks do on their shared copy
+    csr._derived.setdefault('reachability_index', index)
+    ids = np.array([csr.index[node] for node in nodes_in_graph], dtype=np.int64)
+    chunks = map_node_chunks(_profile_chunk, csr, ids, args=(max_distance,), executor=executor,
+                             desc="  - Relocation Chunks")
+    offsets = np.cumsum([0] + [len(chunk[0]) for chunk in chunks])
+    return {
+        'num_nodes': len(ids),
+        'mode_labels': csr.mode_labels,
+        'source_modes': csr.mode[ids].astype(np.int64) + 1,
+        'num_reachable': np.concatenate([chunk[0] for chunk in chunks]),
+        'owners': np.concatenate([chunk[1] + offset for chunk, offset in zip(chunks, offsets)]),
+        'counts': np.concatenate([chunk[2] for chunk in chunks]),
+        'distances': np.vstack([chunk[3] for chunk in chunks]),
+    }
+
+
+def sweep_asymmetric_rl(profile, d_max_values, penalty_grid):
+    """
+    Asymmetric Rl for every combination of d_max and mode penalties: array (len(penalty_grid), len(d_max_values)).
+    Each grid entry is a {(from_mode, to_mode): factor} dict like code11's MODE_PENALTIES (missing pairs:
+    factor 1).
+    """
+    d_max_values = np.asarray(d_max_values, dtype=np.float64)
+    rates = np.zeros((len(penalty_grid), len(d_max_values)))
+    if profile['num_nodes'] == 0 or len(profile['counts']) == 0:
+        return rates
+    owners, counts, distances = profile['owners'], profile['counts'], profile['distances']
+    source_modes = profile['source_modes'][owners]
+    # Each owner's sum is divided by its reachable count, then all evaluated nodes are averaged
+    weights = counts / profile['num_reachable'][owners]
+    for g, penalties in enumerate(penalty_grid):
+        matrix = penalty_matrix(profile['mode_labels'], penalties)
+        closest = np.min(distances * matrix[source_modes], axis=1)
+        decay = np.clip(1.0 - closest[None, :] / d_max_values[:, None], 0.0, None)
+        rates[g] = decay @ weights / profile['num_nodes']
+    return rates
@@ -1,10 +1,12 @@
 import os
+import numpy as np
 import pandas as pd
 import networkx as nx
 from tqdm import tqdm
 
 # --- 1. Import Project Modules (using new architecture functions) ---
 from shared_utils import get_central_districts_graph_by_segment_logic
+from analysis_engines import CSRGraph, betweenness_arrays, exact_betweenness_centrality, shared_executor
 
 # --- 2. Global Configuration ---
 BASE_DIR = r'D:\python-files\wuhan\high-order network in city'
@@ -27,36 +29,32 @@ def calculate_lcc_loss(original_graph, damaged_graph):
         return 1.0
 
 
-def run_cascade_simulation_detailed(graph, initial_node, alpha=0.2):
-    """Runs a cascading failure simulation and returns the graph after the first wave and in its final state"""
-    g_cascade = graph.copy()
-    initial_loads = nx.betweenness_centrality(g_cascade, k=int(0.2 * len(g_cascade)), normalized=True, seed=42)
-    nx.set_node_attributes(g_cascade, initial_loads, 'load')
-    capacities = {node: load * (1 + alpha) for node, load in initial_loads.items()}
-    nx.set_node_attributes(g_cascade, capacities, 'capacity')
+def run_cascade_simulation_detailed(graph, initial_node, alpha=0.2, csr=None):
+    """
+    Runs a cascading failure simulation and returns the graph after the first wave and in its final state.
+    Loads are exact betweenness values, recomputed on the surviving nodes through a node mask on the CSR graph.
+    """
+    csr = csr if csr is not None else CSRGraph.from_networkx(graph)
+    initial_loads, _ = betweenness_arrays(csr, normalized=True)
+    capacities = initial_loads * (1 + alpha)
 
-    nodes_to_remove = {initial_node}
-    g_cascade.remove_nodes_from(list(nodes_to_remove))
-    nodes_to_remove.clear()
-    if len(g_cascade) < 2: return g_cascade.copy(), g_cascade.copy()
+    alive = np.ones(csr.n, dtype=bool)
+    alive[csr.index[initial_node]] = False
+    if np.count_nonzero(alive) < 2: return csr.to_networkx(alive), csr.to_networkx(alive)
 
-    current_loads = nx.betweenness_centrality(g_cascade, k=int(0.2 * len(g_cascade)), normalized=True, seed=42)
-    first_wave_failures = {node for node in g_cascade.nodes() if
-                           current_loads.get(node, 0) > g_cascade.nodes[node]['capacity']}
-    g_after_first_wave = g_cascade.copy()
-    g_after_first_wave.remove_nodes_from(list(first_wave_failures))
+    current_loads, _ = betweenness_arrays(csr, normalized=True, node_mask=alive)
+    first_wave_failures = alive & (current_loads > capacities)
+    g_after_first_wave = csr.to_networkx(alive & ~first_wave_failures)
 
-    nodes_to_remove.update(first_wave_failures)
+    nodes_to_remove = first_wave_failures
     for _ in range(len(graph)):
-        if not nodes_to_remove: break
-        g_cascade.remove_nodes_from(list(nodes_to_remove))
-        nodes_to_remove.clear()
-        if len(g_cascade) < 2: break
-        current_loads = nx.betweenness_centrality(g_cascade, k=int(0.2 * len(g_cascade)), normalized=True, seed=42)
-        nodes_to_remove.update(
-            {node for node in g_cascade.nodes() if current_loads.get(node, 0) > g_cascade.nodes[node]['capacity']})
+        if not nodes_to_remove.any(): break
+        alive &= ~nodes_to_remove
+        if np.count_nonzero(alive) < 2: break
+        current_loads, _ = betweenness_arrays(csr, normalized=True, node_mask=alive)
+        nodes_to_remove = alive & (current_loads > capacities)
 
-    return g_after_first_wave, g_cascade
+    return g_after_first_wave, csr.to_networkx(alive)
 
 
 # --- 4. Main Execution Flow (fully refactored) ---
@@ -77,33 +75,37 @@ if __name__ == "__main__":
 
     print(f"\n> Final network size for analysis: |V|={G_original.number_of_nodes()}, |E|={G_original.number_of_edges()}")
 
-    print("\n> Selecting target nodes for attack from the new network...")
-    bc = nx.betweenness_centrality(G_original, k=int(0.2 * len(G_original)), seed=42)
-    dc = nx.degree_centrality(G_original)
-
-    unique_nodes_to_analyze = [
-        {'type': 'Global Hub (Highest BC)', 'id': max(bc, key=bc.get)},
-        {'type': 'Local Core (Highest Deg)', 'id': max(dc, key=dc.get)},
-        {'type': 'Average Node (Median BC)', 'id': sorted(bc.items(), key=lambda item: item[1])[len(bc) // 2][0]},
-    ]
-
-    print("Selected target nodes for analysis:")
-    for node in unique_nodes_to_analyze:
-        print(f"  - {node['type']}: {G_original.nodes[node['id']].get('name', node['id'])}")
-
-    print("\n> Running simulation...")
-    results_list = []
-    for node_info in tqdm(unique_nodes_to_analyze, desc="Simulating Node Failure"):
-        node_id = node_info['id']
-        G_first_wave, G_cascade_final = run_cascade_simulation_detailed(G_original, node_id, alpha=0.2)
-        loss_first_wave = calculate_lcc_loss(G_original, G_first_wave)
-        loss_total_cascade = calculate_lcc_loss(G_original, G_cascade_final)
-        results_list.append({
-            'NodeType': node_info['type'],
-            'NodeName': G_original.nodes[node_id].get('name', node_id),
-            'Loss_First_Wave': loss_first_wave,
-            'Loss_Total_Cascade': loss_total_cascade
-        })
+    # One persistent worker pool serves the target selection and every betweenness wave below
+    with shared_executor():
+        print("\n> Selecting target nodes for attack from the new network...")
+        bc, _ = exact_betweenness_centrality(G_original)
+        dc = nx.degree_centrality(G_original)
+
+        unique_nodes_to_analyze = [
+            {'type': 'Global Hub (Highest BC)', 'id': max(bc, key=bc.get)},
+            {'type': 'Local Core (Highest Deg)', 'id': max(dc, key=dc.get)},
+            {'type': 'Average Node (Median BC)', 'id': sorted(bc.items(), key=lambda item: item[1])[len(bc) // 2][0]},
+        ]
+
+        print("Selected target nodes for analysis:")
+        for node in unique_nodes_to_analyze:
+            print(f"  - {node['type']}: {G_original.nodes[node['id']].get('name', node['id'])}")
+
+        print("\n> Running simulation...")
+        results_list = []
+        csr_original = CSRGraph.from_networkx(G_original)
+        for node_info in tqdm(unique_nodes_to_analyze, desc="Simulating Node Failure"):
+            node_id = node_info['id']
+            G_first_wave, G_cascade_final = run_cascade_simulation_detailed(G_original, node_id, alpha=0.2,
+                                                                            csr=csr_original)
+            loss_first_wave = calculate_lcc_loss(G_original, G_first_wave)
+            loss_total_cascade = calculate_lcc_loss(G_original, G_cascade_final)
+            results_list.append({
+                'NodeType': node_info['type'],
+                'NodeName': G_original.nodes[node_id].get('name', node_id),
+                'Loss_First_Wave': loss_first_wave,
+                'Loss_Total_Cascade': loss_total_cascade
+            })
 
     df_results = pd.DataFrame(results_list)
     df_results.to_csv(RESULTS_CACHE_FILE, index=False, encoding='utf-8-sig')
@@ -1,9 +1,12 @@
 import os
+import numpy as np
 import pandas as pd
 import networkx as nx
 
 # --- 1. Import Project Modules (using new architecture functions) ---
-from shared_utils import get_central_districts_graph_by_segment_logic, haversine_distance
+from shared_utils import get_central_districts_graph_by_segment_logic
+from analysis_engines import (CSRGraph, ReachabilityIndex, relocation_profile, shared_executor,
+                              sweep_asymmetric_rl)
 
 # --- 2. Global Configuration ---
 BASE_DIR = r'D:\python-files\wuhan\high-order network in city'
@@ -15,53 +18,32 @@ CACHE_FILE = os.path.join(CACHE_DIR, 'asymmetric_rl_analysis_data.csv')
 SUBSYSTEM_CN = ['地铁', '公交']
 SUBSYSTEM_EN = ['Metro', 'Bus']
 RELOCATION_DISTANCES = [750, 1600]
-
-
-# --- 3. Core Calculation Function (excellent logic, kept as is) ---
-def calculate_asymmetric_rl(G, nodes_to_evaluate, d_max):
-    """Core calculation function: Calculates asymmetric Rl with penalties"""
+# Walking-distance penalties when relocating between these modes: (from, to) -> factor
+MODE_PENALTIES = {('地铁', '公交'): 1.5, ('公交', '地铁'): 0.8}
+
+# Sensitivity sweep: Rl over a range of distances and scaled penalties, from the same profiles
+SENSITIVITY_FILE = os.path.join(CACHE_DIR, 'asymmetric_rl_sensitivity_data.csv')
+SENSITIVITY_DISTANCES = np.arange(250, 2001, 250)
+SENSITIVITY_PENALTIES = [{('地铁', '公交'): metro_bus, ('公交', '地铁'): bus_metro}
+                         for metro_bus in (1.0, 1.25, 1.5, 1.75, 2.0) for bus_metro in (0.6, 0.8, 1.0)]
+# Farthest hub (raw metres) any of the distances and penalties above can still reach
+SWEEP_MAX_DISTANCE = max(max(RELOCATION_DISTANCES), SENSITIVITY_DISTANCES.max()) / min(
+    [1.0] + [factor for penalties in SENSITIVITY_PENALTIES + [MODE_PENALTIES] for factor in penalties.values()])
+
+
+# --- 3. Core Calculation Function (same logic, now on the CSR graph core) ---
+def calculate_asymmetric_rl(G, nodes_to_evaluate, d_max, index=None, penalties=MODE_PENALTIES, executor=None):
+    """
+    Core calculation function: Calculates asymmetric Rl with penalties.
+    Runs on a CSRGraph: what v and each of its hubs reach (with v removed) comes from a ReachabilityIndex
+    built once per graph, so no graph is copied and no BFS runs per hub. Values match the networkx version.
+    For several distances or penalty sets, build one relocation_profile and use sweep_asymmetric_rl.
+    """
     if G.number_of_nodes() < 2: return 0.0
-    nodes_in_graph = [node for node in nodes_to_evaluate if node in G]
-    if not nodes_in_graph: return 0.0
-
-    pos_dict = {n: (G.nodes[n]['lon'], G.nodes[n]['lat']) for n in G.nodes if 'lon' in G.nodes[n]}
-    neighbors_dict = {n: set(G.neighbors(n)) for n in G.nodes}
-    modes_dict = nx.get_node_attributes(G, 'mode')
-    total_node_rl = 0
-
-    for v in nodes_in_graph:
-        try:
-            reachable_nodes_from_v = nx.descendants(G, v)
-            if not reachable_nodes_from_v: continue
-        except nx.NetworkXError:
-            continue
-
-        G_disrupted = G.copy()
-        G_disrupted.remove_node(v)
-        candidate_hubs = neighbors_dict.get(v, set())
-        reachable_from_hubs = {u: nx.descendants(G_disrupted, u) for u in candidate_hubs if u in G_disrupted}
-
-        total_decay_factor = 0
-        for n in reachable_nodes_from_v:
-            if n == v: continue
-            min_weighted_dist = float('inf')
-            for u in candidate_hubs:
-                if u in G_disrupted and n in reachable_from_hubs.get(u, set()):
-                    dist = haversine_distance(pos_dict[v][0], pos_dict[v][1], pos_dict[u][0], pos_dict[u][1])
-                    penalty = 1.0
-                    if modes_dict.get(v) == '地铁' and modes_dict.get(u) == '公交':
-                        penalty = 1.5
-                    elif modes_dict.get(v) == '公交' and modes_dict.get(u) == '地铁':
-                        penalty = 0.8
-                    if dist * penalty < min_weighted_dist:
-                        min_weighted_dist = dist * penalty
-
-            if min_weighted_dist <= d_max:
-                total_decay_factor += (1.0 - (min_weighted_dist / d_max))
-
-        total_node_rl += total_decay_factor / len(reachable_nodes_from_v) if reachable_nodes_from_v else 0
-
-    return total_node_rl / len(nodes_in_graph) if nodes_in_graph else 0.0
+    # No hub beyond d_max / (smallest penalty) can ever be in range
+    max_distance = d_max / min([1.0] + [factor for factor in penalties.values()])
+    profile = relocation_profile(G, nodes_to_evaluate, index, max_distance=max_distance, executor=executor)
+    return float(sweep_asymmetric_rl(profile, [d_max], [penalties])[0, 0])
 
 
 # --- 4. Main Execution Flow (fully refactored) ---
@@ -78,36 +60,47 @@ if __name__ == '__main__':
     G_master = get_central_districts_graph_by_segment_logic()
     print(f"> Master network loaded: |V|={G_master.number_of_nodes()}, |E|={G_master.number_of_edges()}")
 
-    # --- Step 2: Iterate and analyze each subsystem ---
-    for i, name_cn in enumerate(SUBSYSTEM_CN):
-        name_en = SUBSYSTEM_EN[i]
-        print(f"\n--- Analyzing subsystem: {name_cn} ({name_en}) ---")
-
-        # Filter nodes for the current subsystem from the master network
-        subsystem_nodes = {n for n, d in G_master.nodes(data=True) if d.get('mode') == name_cn}
-        if not subsystem_nodes:
-            print(f"  > No nodes found for subsystem {name_cn}. Skipping.")
-            continue
-
-        # Create an "isolated network" containing only intra-subsystem connections
-        G_isolated = G_master.subgraph(subsystem_nodes).copy()
-
-        # The "interconnected network" is our master network itself
-        G_interconnected = G_master
-
-        for d_max in RELOCATION_DISTANCES:
-            print(f"  > Analyzing relocation distance: {d_max}m")
-
-            # Calculate asymmetric Rl for the isolated state
-            rate_iso = calculate_asymmetric_rl(G_isolated, list(subsystem_nodes), d_max)
-            results.append({'Subsystem': name_en, 'Distance': d_max, 'Type': 'Isolated', 'Value': rate_iso})
-            print(f"    - Isolated Asymmetric Rl: {rate_iso:.4f}")
-
-            # Calculate asymmetric Rl for the interconnected state
-            rate_conn = calculate_asymmetric_rl(G_interconnected, list(subsystem_nodes), d_max)
-            results.append({'Subsystem': name_en, 'Distance': d_max, 'Type': 'Interconnected', 'Value': rate_conn})
-            print(f"    - Interconnected Asymmetric Rl: {rate_conn:.4f}")
+    index_conn = ReachabilityIndex(CSRGraph.from_networkx(G_master))
+    sensitivity = []
+
+    # One persistent worker pool serves the chunked relocation profiles of every network
+    with shared_executor():
+        # --- Step 2: Iterate and analyze each subsystem ---
+        for i, name_cn in enumerate(SUBSYSTEM_CN):
+            name_en = SUBSYSTEM_EN[i]
+            print(f"\n--- Analyzing subsystem: {name_cn} ({name_en}) ---")
+
+            # Filter nodes for the current subsystem from the master network
+            subsystem_nodes = {n for n, d in G_master.nodes(data=True) if d.get('mode') == name_cn}
+            if not subsystem_nodes:
+                print(f"  > No nodes found for subsystem {name_cn}. Skipping.")
+                continue
+
+            # Create an "isolated network" containing only intra-subsystem connections
+            G_isolated = G_master.subgraph(subsystem_nodes).copy()
+
+            # The "interconnected network" is our master network itself
+            G_interconnected = G_master
+
+            # One profile per network serves every relocation distance and penalty set
+            index_iso = ReachabilityIndex(CSRGraph.from_networkx(G_isolated))
+            for net_type, G, index in (('Isolated', G_isolated, index_iso),
+                                       ('Interconnected', G_interconnected, index_conn)):
+                profile = relocation_profile(G, list(subsystem_nodes), index=index, max_distance=SWEEP_MAX_DISTANCE)
+                rates = sweep_asymmetric_rl(profile, RELOCATION_DISTANCES, [MODE_PENALTIES])[0]
+                for d_max, rate in zip(RELOCATION_DISTANCES, rates):
+                    results.append({'Subsystem': name_en, 'Distance': d_max, 'Type': net_type, 'Value': rate})
+                    print(f"    - {net_type} Asymmetric Rl (d={d_max}m): {rate:.4f}")
+
+                grid = sweep_asymmetric_rl(profile, SENSITIVITY_DISTANCES, SENSITIVITY_PENALTIES)
+                for penalties, row in zip(SENSITIVITY_PENALTIES, grid):
+                    for d_max, rate in zip(SENSITIVITY_DISTANCES, row):
+                        sensitivity.append({'Subsystem': name_en, 'Type': net_type, 'Distance': int(d_max),
+                                            'Penalty Metro->Bus': penalties[('地铁', '公交')],
+                                            'Penalty Bus->Metro': penalties[('公交', '地铁')], 'Value': rate})
 
     df_asymmetric = pd.DataFrame(results)
     df_asymmetric.to_csv(CACHE_FILE, index=False)
     print(f"\n--- Asymmetric Rl data saved to cache: {CACHE_FILE} ---")
+    pd.DataFrame(sensitivity).to_csv(SENSITIVITY_FILE, index=False)
+    print(f"--- Rl sensitivity sweep saved to cache: {SENSITIVITY_FILE} ---")
@@ -51,25 +51,27 @@ if __name__ == "__main__":
 
     # --- Step 3: Call the analysis engine, run all attack scenarios ---
     print("\n> Starting resilience simulations for all scenarios...")
-    for name, order in attack_orders.items():
-        cache_path = os.path.join(get_config('CACHE_DIR'), f'code14_attack_{name}_curve.csv')
-
-        if os.path.exists(cache_path):
-            print(f"> Data for '{name}' attack already exists, skipping.")
-            continue
-
-        print(f"--- Running resilience analysis for '{name.upper()}' attack ---")
-
-        # --- Key: Pass the prepared attack sequence directly to the engine ---
-        # For random attacks, 'order' itself is a list of lists
-        # For other attacks, 'order' is a single list, and the engine will handle it
-        df_resilience = analysis_engines.run_resilience_analysis(
-            G_master,
-            attack_scenario=order,
-            num_tests=50 if name == 'random' else 1,
-            removal_steps=100
-        )
-        df_resilience.to_csv(cache_path, index=False)
-        print(f"\n  - Results for '{name}' cached to {os.path.basename(cache_path)}")
+    # One persistent worker pool serves every resilience call below
+    with analysis_engines.shared_executor():
+        for name, order in attack_orders.items():
+            cache_path = os.path.join(get_config('CACHE_DIR'), f'code14_attack_{name}_curve.csv')
+
+            if os.path.exists(cache_path):
+                print(f"> Data for '{name}' attack already exists, skipping.")
+                continue
+
+            print(f"--- Running resilience analysis for '{name.upper()}' attack ---")
+
+            # --- Key: Pass the prepared attack sequence directly to the engine ---
+            # For random attacks, 'order' itself is a list of lists
+            # For other attacks, 'order' is a single list, and the engine will handle it
+            df_resilience = analysis_engines.run_resilience_analysis(
+                G_master,
+                attack_scenario=order,
+                num_tests=50 if name == 'random' else 1,
+                removal_steps=100
+            )
+            df_resilience.to_csv(cache_path, index=False)
+            print(f"\n  - Results for '{name}' cached to {os.path.basename(cache_path)}")
 
     print("\n--- All attack data generation complete. ---")
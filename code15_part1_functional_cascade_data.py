@@ -8,6 +8,7 @@ import random
 
 # --- Import Project Modules ---
 from shared_utils import get_central_districts_graph_by_segment_logic, get_config
+from analysis_engines import exact_betweenness_centrality
 
 # --- Global Configuration ---
 CACHE_DIR = get_config('CACHE_DIR')
@@ -96,7 +97,7 @@ if __name__ == '__main__':
     # --- Core Fix: Must define the variable before using it ---
     # Step 3: Calculate betweenness centrality and define top_5_bc_nodes based on it
     print("\n> Identifying top 5 betweenness centrality nodes as attack targets...")
-    bc = nx.betweenness_centrality(G_master, k=int(0.2 * len(G_master)), seed=42)
+    bc, _ = exact_betweenness_centrality(G_master)
     top_5_bc_nodes = sorted(bc, key=bc.get, reverse=True)[:5]
     print(f"  - Targets: {top_5_bc_nodes}")
 
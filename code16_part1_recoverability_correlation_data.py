@@ -8,6 +8,7 @@ import random
 
 # --- Import Project Modules ---
 import shared_utils
+from analysis_engines import exact_betweenness_centrality
 
 # --- Global Configuration ---
 BASE_DIR = r'D:\python-files\wuhan\high-order network in city'
@@ -71,10 +72,7 @@ def get_all_node_metrics(G, sample_size=None):
         nodes_to_analyze = list(G.nodes())
 
     degrees = dict(G.degree())
-    k_for_betweenness = min(int(0.1 * num_nodes), num_nodes - 1) if num_nodes > 1 else 0
-    betweenness = nx.betweenness_centrality(G, k=k_for_betweenness, seed=42) if k_for_betweenness > 0 else {n: 0 for n
-                                                                                                            in
-                                                                                                            G.nodes()}
+    betweenness, _ = exact_betweenness_centrality(G)
 
     edge_motif_weights = shared_utils.build_high_order_network_from_motif(G)
     node_motif_scores = Counter()
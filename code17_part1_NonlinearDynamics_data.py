@@ -10,6 +10,7 @@ import time
 # --- Import Project Modules ---
 from shared_utils import get_central_districts_graph_by_segment_logic, get_config
 import code15_part1_functional_cascade_data as code15_engine
+from analysis_engines import exact_betweenness_centrality
 
 # --- Core Change: Revert to publication-level high-fidelity simulation parameters ---
 # Original value: 1000
@@ -85,7 +86,7 @@ if __name__ == '__main__':
     initial_load = code15_engine.calculate_initial_load(G, FLOW_SAMPLE_SIZE)
 
     print("> Pre-calculating betweenness centrality...")
-    bc = nx.betweenness_centrality(G, k=int(0.2 * len(G)), seed=42)
+    bc, _ = exact_betweenness_centrality(G)
     sorted_nodes_by_bc = sorted(bc, key=bc.get, reverse=True)
 
     # --- Step 2: Create Task List ---
@@ -15,7 +15,8 @@ def analyze_and_print_results(network_name, G):
         print(f"Network {network_name} is empty, skipping analysis.")
         return
 
-    # Call the more powerful metric calculation function in shared_utils
+    # Call the more powerful metric calculation function in shared_utils (analysis_engines.apsp_metrics
+    # is faster but uses its own haversine-based definitions, so it does not reproduce these values)
     all_metrics = shared_utils._calculate_all_metrics(G)
 
     # Define all metrics and descriptions from the old version
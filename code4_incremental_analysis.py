@@ -2,19 +2,24 @@ import time
 import os
 import networkx as nx
 import numpy as np
+from scipy.sparse.csgraph import connected_components
 
 # --- 1. Import Project Modules (using new architecture functions) ---
 from shared_utils import (
     get_central_districts_graph_by_segment_logic,
     add_intermodal_edges,
-    _calculate_all_metrics,
     calculate_relocation_rate_from_paper,
+    _calculate_all_metrics,
     NAMES
 )
 # Ensure this file exists in your project
-from analysis_engines import generate_benchmark_graph
+from analysis_engines import BenchmarkCache, CSRGraph, IncrementalLayerMetrics, efficiency_metrics, shared_executor
 
 # --- 2. Global Configuration (consistent with old version) ---
+BASE_DIR = r'D:\python-files\wuhan\high-order network in city'
+# Benchmark graphs and their metrics persist here across runs (least recently used entries go first past 2 GB)
+BENCHMARK_CACHE = BenchmarkCache(os.path.join(BASE_DIR, 'cache', 'benchmarks'), max_bytes=2 * 1024 ** 3)
+
 METRIC_ORDER_AND_FORMAT = {
     '|V|': '.0f', '|E|': '.0f', 'IMT edges': '.0f', '<k_out>': '.2f',
     'S0': '.3f', 'l_max': '.2f', '<l>': '.2f', 'E': '.4f',
@@ -26,29 +31,104 @@ METRIC_ORDER_AND_FORMAT = {
     'Relocation rate (d=750m)': '.4f',
     'Relocation rate (d=1600m)': '.4f'
 }
+# Null model behind the Z-scores: 'er' (the published generate_benchmark_graph draws), 'er_numpy' (vectorized ER
+# draws: faster, but other graphs per seed), 'degree' / 'degree_layers' (degree-preserving edge swaps) or
+# 'spatial' (distance-decay rewiring fitted to the real edge lengths; the sharper null for E_geospatial)
+BENCHMARK_MODEL = 'er'
+BENCHMARK_MODEL_NAMES = {'er': 'ER', 'er_numpy': 'ER', 'degree': 'degree-preserving',
+                         'degree_layers': 'layer-degree-preserving', 'spatial': 'spatially-embedded'}
+# Optional early stop: fewer benchmarks once the standard error of both Z-scores drops below this (None = off)
+Z_SE_TARGET = None
+MIN_BENCHMARKS = 10
+# Source of the topology metrics: 'shared_utils' runs shared_utils._calculate_all_metrics on every step and
+# benchmark graph (the published definitions); 'incremental' updates them per step with IncrementalLayerMetrics
+# and efficiency_metrics, which is much faster but uses the definitions documented in
+# analysis_engines.apsp_metrics, so the values differ
+METRICS_ENGINE = 'shared_utils'
+# Cache name of the benchmark efficiencies (suffixed with METRICS_ENGINE); change it whenever their definition
+# changes
+BENCHMARK_METRICS_NAME = 'lcc_efficiency_v1'
 
 
 # --- 3. Helper Functions (largely unchanged) ---
-def analyze_benchmarks(G_real, num_benchmarks=10):
-    benchmark_e_values = []
-    benchmark_e_geo_values = []
-    print(f"    > [Unified Engine] Analyzing {num_benchmarks} ER random graphs...")
-    for i in range(num_benchmarks):
-        G_bench = generate_benchmark_graph(G_real, seed=i)
-        if G_bench.number_of_nodes() > 1:
-            components = nx.weakly_connected_components(G_bench) if G_bench.is_directed() else nx.connected_components(
-                G_bench)
-            largest_component_nodes = max(components, key=len, default=set())
-            if not largest_component_nodes: continue
-            G_lcc = G_bench.subgraph(largest_component_nodes)
-            metrics_bench = _calculate_all_metrics(G_lcc)
-            benchmark_e_values.append(metrics_bench.get('E', 0))
-            benchmark_e_geo_values.append(metrics_bench.get('E_geospatial', 0))
+def largest_component_mask(csr):
+    """Node mask of a CSRGraph's largest (weakly) connected component."""
+    _, labels = connected_components(csr.to_scipy(), directed=csr.directed, connection='weak')
+    return labels == np.argmax(np.bincount(labels))
+
+
+def benchmark_efficiencies(csr_bench):
+    """E and E_geospatial of a benchmark graph's largest component (empty if it has none), engine definitions."""
+    if csr_bench.n <= 1:
+        return {}
+    # Only the efficiencies are needed here, so the betweenness part of apsp_metrics is skipped
+    e, e_geo = efficiency_metrics(csr_bench, node_mask=largest_component_mask(csr_bench))
+    return {'E': e, 'E_geospatial': e_geo}
+
+
+def benchmark_reference_efficiencies(csr_bench):
+    """E and E_geospatial of a benchmark graph's largest component, by shared_utils._calculate_all_metrics."""
+    if csr_bench.n <= 1:
+        return {}
+    metrics_bench = _calculate_all_metrics(csr_bench.subgraph(largest_component_mask(csr_bench)).to_networkx())
+    return {'E': metrics_bench.get('E', 0), 'E_geospatial': metrics_bench.get('E_geospatial', 0)}
+
+
+class RunningStats:
+    """Running mean and (population) standard deviation, updated one value at a time (Welford)."""
+
+    def __init__(self):
+        self.count, self.mean, self._m2 = 0, 0.0, 0.0
+
+    def push(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return float(np.sqrt(self._m2 / self.count)) if self.count else 0.0
+
+
+def z_score_standard_error(z, count):
+    """Approximate standard error of a Z-score against `count` normal benchmarks (error of mean and std)."""
+    return float(np.sqrt((1 + z * z / 2) / count)) if count else np.inf
+
+
+def analyze_benchmarks(G_real, num_benchmarks=10, model=BENCHMARK_MODEL, observed=None, z_se_target=None,
+                       min_benchmarks=MIN_BENCHMARKS):
+    """
+    Mean and std of E and E_geospatial over up to num_benchmarks benchmark graphs, evaluated in parallel.
+    With `observed` metrics and z_se_target, stops once both Z-scores are known to within z_se_target
+    (after at least min_benchmarks graphs); benchmarks are always folded in seed order, so this is repeatable.
+    """
+    running = {'E': RunningStats(), 'E_geospatial': RunningStats()}
+    print(f"    > [Unified Engine] Analyzing {num_benchmarks} {BENCHMARK_MODEL_NAMES[model]} random graphs...")
+    # Reruns on the same network read both the benchmarks and their metrics back from the cache; with model='er'
+    # the benchmarks are generate_benchmark_graph's graphs for seeds 0..num_benchmarks-1, as before the cache
+    compute = benchmark_efficiencies if METRICS_ENGINE == 'incremental' else benchmark_reference_efficiencies
+    name = f"{BENCHMARK_METRICS_NAME}_{METRICS_ENGINE}"
+    for _, metrics_bench in BENCHMARK_CACHE.metrics_ensemble(G_real, range(num_benchmarks), compute, name,
+                                                             model=model):
+        if not metrics_bench:
+            continue
+        for key, stats in running.items():
+            stats.push(metrics_bench[key])
+        count = running['E'].count
+        if z_se_target is None or observed is None or count < min_benchmarks or count >= num_benchmarks:
+            continue
+        z_errors = [z_score_standard_error(calculate_z_score(observed.get(key), stats.mean, stats.std), count)
+                    for key, stats in running.items()]
+        if max(z_errors) < z_se_target:
+            print(f"    > [Unified Engine] Z-scores converged after {count} benchmarks (SE < {z_se_target}).")
+            break
     stats = {
-        'E_mean': np.mean(benchmark_e_values) if benchmark_e_values else 0.0,
-        'E_std': np.std(benchmark_e_values) if benchmark_e_values else 0.0,
-        'E_geo_mean': np.mean(benchmark_e_geo_values) if benchmark_e_geo_values else 0.0,
-        'E_geo_std': np.std(benchmark_e_geo_values) if benchmark_e_geo_values else 0.0
+        'E_mean': running['E'].mean,
+        'E_std': running['E'].std,
+        'E_geo_mean': running['E_geospatial'].mean,
+        'E_geo_std': running['E_geospatial'].std,
+        'num_benchmarks': running['E'].count,
     }
     print(f"    > [Unified Engine] Benchmark analysis complete. E_mean={stats['E_mean']:.4f}, E_geo_mean={stats['E_geo_mean']:.4f}")
     return stats
@@ -99,26 +179,43 @@ def run_incremental_analysis(num_benchmarks=10):
     results_iso = {key: [] for key in METRIC_ORDER_AND_FORMAT}
     results_conn = {key: [] for key in METRIC_ORDER_AND_FORMAT}
 
+    if METRICS_ENGINE == 'incremental':
+        # Both networks grow on the master CSR: each step merges only the new mode's nodes and edges, and
+        # shortest paths are re-run only from sources whose distances can change
+        csr_master = CSRGraph.from_networkx(G_master)
+        is_walk = np.array([csr_master.type_labels[t] == 'walk' if t >= 0 else False for t in csr_master.etype])
+        tracker_iso = IncrementalLayerMetrics(csr_master, edge_mask=~is_walk)
+        tracker_conn = IncrementalLayerMetrics(csr_master)
+    elif METRICS_ENGINE != 'shared_utils':
+        raise ValueError(f"Unknown metrics engine: {METRICS_ENGINE}")
+
     # --- Step 2: Perform incremental analysis ---
     for i in range(len(NAMES)):
         names_to_build = NAMES[:i + 1]
         network_name_cn = " + ".join(names_to_build)
         print(f"\n\n{'#' * 20} Analyzing Step {i + 1}: 【{network_name_cn}】 {'#' * 20}")
 
-        # --- Step 3: Extract subgraph for the current step from the master network ---
-        nodes_for_step = {n for n, d in G_master.nodes(data=True) if d.get('mode') in names_to_build}
-        # G_subgraph_with_walk contains nodes of these modes, and existing walk transfer edges between them in the master network
-        G_subgraph_with_walk = G_master.subgraph(nodes_for_step).copy()
+        if METRICS_ENGINE == 'incremental':
+            metrics_iso = tracker_iso.add_modes([names_to_build[-1]])
+            metrics_conn = tracker_conn.add_modes([names_to_build[-1]])
+            G_iso, G_conn = tracker_iso.graph().to_networkx(), tracker_conn.graph().to_networkx()
+            imt_edges = int(np.count_nonzero(tracker_conn.edge_alive & is_walk))
+        else:
+            # --- Step 3: Extract subgraph for the current step from the master network ---
+            nodes_for_step = {n for n, d in G_master.nodes(data=True) if d.get('mode') in names_to_build}
+            # G_conn contains nodes of these modes, and existing walk transfer edges between them in the master network
+            G_conn = G_master.subgraph(nodes_for_step).copy()
+            G_iso = G_conn.copy()
+            walk_edges = [(u, v) for u, v, d in G_iso.edges(data=True) if d.get('type') == 'walk']
+            G_iso.remove_edges_from(walk_edges)
+            imt_edges = len(walk_edges)  # The number of IMT edges is those we just removed
+            metrics_iso, metrics_conn = _calculate_all_metrics(G_iso), _calculate_all_metrics(G_conn)
 
         # --- ISOLATED (Isolated Network) ---
         # Definition: Only contains intra-modal transportation connections, no inter-modal walk transfers
         print("  Calculating for ISOLATED network (DIMT=0m)...")
-        G_iso = G_subgraph_with_walk.copy()
-        walk_edges = [(u, v) for u, v, d in G_iso.edges(data=True) if d.get('type') == 'walk']
-        G_iso.remove_edges_from(walk_edges)
-
-        metrics_iso = _calculate_all_metrics(G_iso)
-        benchmark_stats_iso = analyze_benchmarks(G_iso, num_benchmarks)
+        benchmark_stats_iso = analyze_benchmarks(G_iso, num_benchmarks, observed=metrics_iso,
+                                                 z_se_target=Z_SE_TARGET)
         metrics_iso['Z-score (E)'] = calculate_z_score(metrics_iso.get('E'), benchmark_stats_iso['E_mean'],
                                                        benchmark_stats_iso['E_std'])
         metrics_iso['Z-score (E_geospatial)'] = calculate_z_score(metrics_iso.get('E_geospatial'),
@@ -133,12 +230,10 @@ def run_incremental_analysis(num_benchmarks=10):
 
         # --- INTERCONNECTED (Interconnected Network) ---
         # Definition: Contains intra-modal transportation connections, and inter-modal walk transfers between them
-        # Note: We directly use the subgraph extracted from the master network, as it already contains 100m walk transfers
+        # Note: The master network already contains the 100m walk transfers between these modes
         print("  Calculating for INTERCONNECTED network (DIMT=100m)...")
-        G_conn = G_subgraph_with_walk
-
-        metrics_conn = _calculate_all_metrics(G_conn)
-        benchmark_stats_conn = analyze_benchmarks(G_conn, num_benchmarks)
+        benchmark_stats_conn = analyze_benchmarks(G_conn, num_benchmarks, observed=metrics_conn,
+                                                  z_se_target=Z_SE_TARGET)
         metrics_conn['Z-score (E)'] = calculate_z_score(metrics_conn.get('E'), benchmark_stats_conn['E_mean'],
                                                         benchmark_stats_conn['E_std'])
         metrics_conn['Z-score (E_geospatial)'] = calculate_z_score(metrics_conn.get('E_geospatial'),
@@ -148,7 +243,7 @@ def run_incremental_analysis(num_benchmarks=10):
                                                                                         d_max=750)
         metrics_conn['Relocation rate (d=1600m)'] = calculate_relocation_rate_from_paper(G_conn, list(G_conn.nodes()),
                                                                                          d_max=1600)
-        metrics_conn['IMT edges'] = len(walk_edges)  # The number of IMT edges is those we just removed
+        metrics_conn['IMT edges'] = imt_edges
         for key in METRIC_ORDER_AND_FORMAT: results_conn[key].append(metrics_conn.get(key))
 
     print_table_format(results_iso, results_conn, NAMES)
@@ -156,4 +251,6 @@ def run_incremental_analysis(num_benchmarks=10):
 
 # --- 5. Entry Point ---
 if __name__ == '__main__':
-    run_incremental_analysis(num_benchmarks=50)
+    # One persistent worker pool serves the benchmark ensembles and shortest-path passes of every step
+    with shared_executor():
+        run_incremental_analysis(num_benchmarks=50)
@@ -5,82 +5,105 @@ import pandas as pd
 
 # --- 1. Import Project Modules (using new architecture functions) ---
 from shared_utils import get_central_districts_graph_by_segment_logic, NAMES
-from analysis_engines import generate_benchmark_graph, run_resilience_analysis
+from analysis_engines import BenchmarkCache, as_csr, run_resilience_batch, shared_executor
 
 # --- 2. Global Configuration ---
 BASE_DIR = r'D:\python-files\wuhan\high-order network in city'
 CACHE_DIR = os.path.join(BASE_DIR, 'cache')
 os.makedirs(CACHE_DIR, exist_ok=True)
+# Benchmark graphs are shared with code4 and reused across runs
+BENCHMARK_CACHE = BenchmarkCache(os.path.join(CACHE_DIR, 'benchmarks'), max_bytes=2 * 1024 ** 3)
 
 NUM_BENCHMARKS = 50
 REMOVAL_STEPS = 50
 ATTACK_SCENARIOS = {'rnd': 'random', 'nd': 'degree', 'bc': 'betweenness'}
-
-
-# --- 3. Core Function (no modification needed) ---
-def run_benchmark_analysis_for_graph(G_real, step_index, imt_distance):
-    """Generates and analyzes all benchmark models for a given real network G_real."""
+NUM_TESTS_RND = 50
+# Optional: random failures run until the 95% CI half-width of Rb is below this target, capped at MAX_TESTS_RND,
+# instead of a fixed NUM_TESTS_RND runs (None = off)
+RB_CI_TARGET = None
+MAX_TESTS_RND = 200
+# Simulation engine: 'stepwise' (the published curves: components recomputed after each of REMOVAL_STEPS removal
+# batches) or 'percolation' (exact LCC after every removal via reverse union-find, much faster on these ensembles
+# but with a different Rb); code7 compares against code3's real-network curves, so regenerate both with one engine
+RESILIENCE_ENGINE = 'stepwise'
+# Null model: 'er' (networkx G(n, m), the published benchmarks), 'er_numpy' (vectorized ER draws: much faster,
+# but other graphs per seed), 'degree' / 'degree_layers' (degree-preserving edge swaps) or 'spatial'; must match code7
+BENCHMARK_MODEL = 'er'
+BENCHMARK_PREFIX = 'benchmark' if BENCHMARK_MODEL == 'er' else f'benchmark_{BENCHMARK_MODEL}'
+
+
+# --- 3. Core Functions ---
+def benchmark_jobs(G_real, step_index, imt_distance):
+    """Generates all benchmark models for a given real network G_real as jobs for run_resilience_batch."""
     if G_real.number_of_nodes() < 2 or G_real.number_of_edges() < 1:
         print(f"  > Real network is too small, skipping benchmark analysis.")
         return
 
-    print(f"  > Starting generation of {NUM_BENCHMARKS} benchmark models and analysis for this network...")
+    print(f"  > Queuing generation of {NUM_BENCHMARKS} benchmark models and analysis for this network...")
+    attacks = {short_name: (full_name, NUM_TESTS_RND if short_name == 'rnd' else 1)
+               for short_name, full_name in ATTACK_SCENARIOS.items()}
+    # Benchmarks are sampled straight into arrays; the real network is converted once for all of them
+    csr_real = as_csr(G_real)
 
     for nb in range(NUM_BENCHMARKS):
-        print(f"    - Processing benchmark model {nb + 1}/{NUM_BENCHMARKS} (seed={nb})...")
-        start_time_bm = time.time()
-
-        BG = generate_benchmark_graph(G_real, seed=nb)
-
-        for short_name, full_name in ATTACK_SCENARIOS.items():
-            num_tests = 1 if short_name != 'rnd' else 50
-            df_results = run_resilience_analysis(
-                BG, attack_scenario=full_name, num_tests=num_tests, removal_steps=REMOVAL_STEPS
-            )
-
-            filename = f"benchmark_imt_{imt_distance}_step_{step_index}_attack_{short_name}_run_{nb}.csv"
-            filepath = os.path.join(CACHE_DIR, filename)
-            df_results[['mean', 'nodes_removed_fraction', 'std']].to_csv(filepath, index=False, header=False)
-
-        print(f"    - Benchmark model {nb + 1} analysis complete (Time: {time.time() - start_time_bm:.2f}s)")
-
+        BG = BENCHMARK_CACHE.benchmark_csr(csr_real, seed=nb, model=BENCHMARK_MODEL)
+        yield (step_index, imt_distance, nb), BG, attacks
 
-# --- 4. Main Execution Flow (fully refactored) ---
-if __name__ == "__main__":
-    print("=" * 60)
-    print("      Part 1: Benchmark Model Resilience Data Generation (v2.0 New Architecture)")
-    print("=" * 60)
-
-    # --- Step 1: Load unified master network, the sole data source for all analyses ---
-    print("  > Loading master network graph from shared_utils...")
-    G_master = get_central_districts_graph_by_segment_logic()
-    print("  > Master network loaded.")
 
-    # --- Step 2: Perform incremental analysis ---
+def all_benchmark_jobs(G_master):
+    """Walks every incremental step and both D_IMT scenarios, yielding their benchmark jobs lazily."""
     for i in range(len(NAMES)):
         step_index = i + 1
         modes_for_step = NAMES[:i + 1]
         network_name_cn = " + ".join(modes_for_step)
         print(f"\n{'=' * 20} Preparing real network for Step {step_index}: 【{network_name_cn}】 {'=' * 20}")
 
-        # --- Step 3: Extract subgraph for the current step from the master network ---
+        # --- Extract subgraph for the current step from the master network ---
         nodes_for_step = {n for n, d in G_master.nodes(data=True) if d.get('mode') in modes_for_step}
         G_subgraph_for_step = G_master.subgraph(nodes_for_step).copy()
 
-        # --- Step 4: Process both isolated and interconnected scenarios ---
+        # --- Process both isolated and interconnected scenarios ---
         for imt_distance in [0, 100]:
             G_to_benchmark = G_subgraph_for_step.copy()
 
             if imt_distance == 0:
-                print(f"\n--- Analyzing Isolated Network (D_IMT = {imt_distance}m) Benchmark ---")
+                print(f"\n--- Queuing Isolated Network (D_IMT = {imt_distance}m) Benchmark ---")
                 # Remove inter-modal walk edges to get a purely isolated network
                 walk_edges = [(u, v) for u, v, d in G_to_benchmark.edges(data=True) if d.get('type') == 'walk']
                 G_to_benchmark.remove_edges_from(walk_edges)
             else:
-                print(f"\n--- Analyzing Interconnected Network (D_IMT = {imt_distance}m) Benchmark ---")
+                print(f"\n--- Queuing Interconnected Network (D_IMT = {imt_distance}m) Benchmark ---")
                 # The interconnected network is the subgraph extracted from the master network, already containing walk edges
                 pass
 
-            run_benchmark_analysis_for_graph(G_to_benchmark, step_index=step_index, imt_distance=imt_distance)
+            yield from benchmark_jobs(G_to_benchmark, step_index=step_index, imt_distance=imt_distance)
+
+
+# --- 4. Main Execution Flow (fully refactored) ---
+if __name__ == "__main__":
+    print("=" * 60)
+    print("      Part 1: Benchmark Model Resilience Data Generation (v2.0 New Architecture)")
+    print("=" * 60)
+
+    # --- Step 1: Load unified master network, the sole data source for all analyses ---
+    print("  > Loading master network graph from shared_utils...")
+    G_master = get_central_districts_graph_by_segment_logic()
+    print("  > Master network loaded.")
+
+    # --- Step 2: Run the whole sweep as one batch ---
+    # Benchmark graphs are generated while earlier ones are being attacked; every (step, imt, attack, run)
+    # result is written as soon as it is complete
+    start_time = time.time()
+    with shared_executor():
+        jobs = all_benchmark_jobs(G_master)
+        results = run_resilience_batch(jobs, removal_steps=REMOVAL_STEPS, engine=RESILIENCE_ENGINE,
+                                       target_ci=RB_CI_TARGET, max_tests=MAX_TESTS_RND)
+        for (step_index, imt_distance, nb), short_name, df_results in results:
+            filename = f"{BENCHMARK_PREFIX}_imt_{imt_distance}_step_{step_index}_attack_{short_name}_run_{nb}.csv"
+            filepath = os.path.join(CACHE_DIR, filename)
+            df_results[['mean', 'nodes_removed_fraction', 'std']].to_csv(filepath, index=False, header=False)
+            if 'num_tests' in df_results.attrs:
+                print(f"    - {filename}: {df_results.attrs['num_tests']} random runs "
+                      f"(Rb CI half-width {df_results.attrs['ci_half_width']:.4f})")
 
-    print("\n\nAll benchmark model resilience analyses complete!")
+    print(f"\n\nAll benchmark model resilience analyses complete! (Time: {time.time() - start_time:.2f}s)")
@@ -13,6 +13,9 @@ ATTACK_SCENARIOS = ['rnd', 'nd', 'bc']
 # --- Core Synchronization: This number must exactly match NUM_BENCHMARKS used in code5! ---
 # We use 50 here to match the number of repetitions for random attacks in code6, ensuring statistical robustness.
 NUM_BENCHMARK_TESTS = 50
+# Null model of the benchmark files, as configured by BENCHMARK_MODEL in code5
+BENCHMARK_MODEL = 'er'
+BENCHMARK_PREFIX = 'benchmark' if BENCHMARK_MODEL == 'er' else f'benchmark_{BENCHMARK_MODEL}'
 
 CACHE_FILE = os.path.join(CACHE_DIR, 'zscore_analysis_data.csv')
 
@@ -51,7 +54,7 @@ if __name__ == '__main__':
                 # 2. Load resilience data for all benchmark models (generated by code5_v2)
                 benchmark_rbs = [
                     calculate_rb_from_file(os.path.join(CACHE_DIR,
-                                                        f"benchmark_imt_{imt_distance}_step_{step_index}_attack_{scenario}_run_{test}.csv"))
+                                                        f"{BENCHMARK_PREFIX}_imt_{imt_distance}_step_{step_index}_attack_{scenario}_run_{test}.csv"))
                     for test in range(NUM_BENCHMARK_TESTS)
                 ]
                 benchmark_rbs = [rb for rb in benchmark_rbs if rb is not None]
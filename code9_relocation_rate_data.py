@@ -4,6 +4,7 @@ import networkx as nx
 
 # --- 1. Import Project Modules (using new architecture functions) ---
 from shared_utils import get_central_districts_graph_by_segment_logic, calculate_relocation_rate_from_paper
+from analysis_engines import map_calls
 
 # --- 2. Global Configuration ---
 BASE_DIR = r'D:\python-files\wuhan\high-order network in city'
@@ -16,6 +17,12 @@ SUBSYSTEM_CN = ['地铁', '公交', '轮渡', '铁路']
 SUBSYSTEM_EN = ['Metro', 'Bus', 'Ferry', 'Railway']
 RELOCATION_DISTANCES = [750, 1600]
 
+
+def relocation_rates(G, nodes, distances):
+    """map_calls entry point: calculate_relocation_rate_from_paper(G, nodes, d_max) at every distance."""
+    return [calculate_relocation_rate_from_paper(G, nodes, d_max) for d_max in distances]
+
+
 # --- 3. Main Execution Flow (fully refactored) ---
 if __name__ == "__main__":
     if os.path.exists(CACHE_FILE):
@@ -30,10 +37,10 @@ if __name__ == "__main__":
     G_master = get_central_districts_graph_by_segment_logic()
     print(f"> Master network loaded: |V|={G_master.number_of_nodes()}, |E|={G_master.number_of_edges()}")
 
-    # --- Step 2: Iterate and analyze each subsystem ---
+    # --- Step 2: One whole-list call per subsystem and network type, all run side by side on a worker pool ---
+    keys, calls = [], []
     for i, name_cn in enumerate(SUBSYSTEM_CN):
         name_en = SUBSYSTEM_EN[i]
-        print(f"\n--- Analyzing subsystem: {name_cn} ({name_en}) ---")
 
         # Filter nodes for the current subsystem from the master network
         subsystem_nodes = {n for n, d in G_master.nodes(data=True) if d.get('mode') == name_cn}
@@ -47,21 +54,25 @@ if __name__ == "__main__":
         # The "interconnected network" is our master network itself
         G_interconnected = G_master
 
+        # Isolated: find alternative nodes for subsystem_nodes in G_isolated;
+        # Interconnected: find them in G_interconnected (i.e., G_master)
+        for net_type, G in (('Isolated', G_isolated), ('Interconnected', G_interconnected)):
+            keys.append((name_en, net_type))
+            calls.append((G, list(subsystem_nodes), RELOCATION_DISTANCES))
+
+    rates = {}
+    for (name_en, net_type), values in zip(keys, map_calls(relocation_rates, calls, desc="  - Relocation Rates")):
+        for d_max, value in zip(RELOCATION_DISTANCES, values):
+            rates[(name_en, d_max, net_type)] = value
+
+    for name_en in SUBSYSTEM_EN:
         for d_max in RELOCATION_DISTANCES:
-            print(f"  > Analyzing relocation distance: {d_max}m")
-
-            # Calculate Rl for the isolated state
-            # In G_isolated, find alternative nodes for subsystem_nodes
-            rate_isolated = calculate_relocation_rate_from_paper(G_isolated, list(subsystem_nodes), d_max)
-            results.append({'Subsystem': name_en, 'Distance': d_max, 'Type': 'Isolated', 'Value': rate_isolated})
-            print(f"    - Isolated Rl: {rate_isolated:.4f}")
-
-            # Calculate Rl for the interconnected state
-            # In G_interconnected (i.e., G_master), find alternative nodes for subsystem_nodes
-            rate_interconnected = calculate_relocation_rate_from_paper(G_interconnected, list(subsystem_nodes), d_max)
-            results.append(
-                {'Subsystem': name_en, 'Distance': d_max, 'Type': 'Interconnected', 'Value': rate_interconnected})
-            print(f"    - Interconnected Rl: {rate_interconnected:.4f}")
+            for net_type in ('Isolated', 'Interconnected'):
+                if (name_en, d_max, net_type) not in rates:
+                    continue
+                value = rates[(name_en, d_max, net_type)]
+                results.append({'Subsystem': name_en, 'Distance': d_max, 'Type': net_type, 'Value': value})
+                print(f"    - {name_en} {net_type} Rl (d={d_max}m): {value:.4f}")
 
     df_results = pd.DataFrame(results)
     df_results.to_csv(CACHE_FILE, index=False)
@@ -0,0 +1,283 @@
+"""Benchmark (null model) generators and the benchmark cache."""
+import random
+import threading
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+MODES = ['bus', 'metro', 'rail']
+
+
+def real_graph(seed, directed, n=60, m=140):
+    rng = random.Random(seed)
+    G = nx.gnm_random_graph(n, m, seed=seed, directed=directed)
+    G = nx.relabel_nodes(G, {v: f"s{v}" for v in G})
+    for i, v in enumerate(G):
+        if i % 9 != 4:  # Some stations without coordinates
+            G.nodes[v].update(lon=114 + rng.random() * 0.2, lat=30.4 + rng.random() * 0.2)
+        G.nodes[v]['mode'] = MODES[i % 3]
+    for u, v, data in G.edges(data=True):
+        data['type'] = 'walk' if rng.random() < 0.2 else G.nodes[u]['mode']
+    return G
+
+
+def modes(csr):
+    return [csr.mode_labels[c] if c >= 0 else None for c in csr.mode]
+
+
+def edge_keys(csr):
+    return sorted(ae._edge_keys(csr.src, csr.dst, csr.n, csr.directed).tolist())
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(5))
+def test_er_csr_matches_generate_benchmark_graph(seed, directed):
+    G = real_graph(seed, directed)
+    expected = ae.CSRGraph.from_networkx(ae.generate_benchmark_graph(G, seed))
+    for G_real in (G, ae.as_csr(G)):
+        csr = ae.generate_benchmark_csr(G_real, seed)
+        np.testing.assert_array_equal(csr.src, expected.src)
+        np.testing.assert_array_equal(csr.dst, expected.dst)
+        np.testing.assert_array_equal(csr.lon, expected.lon)
+        np.testing.assert_array_equal(csr.lat, expected.lat)
+        assert modes(csr) == modes(expected)
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('n, m', [(60, 140), (12, 60), (2, 1), (8, 56)])
+def test_er_numpy(n, m, directed):
+    G = real_graph(n, directed, n, m)
+    csr_real = ae.as_csr(G)
+    csr = ae.generate_benchmark_csr(G, 3, model='er_numpy')
+    assert (csr.n, csr.m, csr.directed) == (csr_real.n, min(m, csr_real.m), directed)
+    assert (csr.src != csr.dst).all()
+    assert len(set(edge_keys(csr))) == csr.m
+    # The located real nodes, permuted onto benchmark nodes 0..k-1
+    located = np.flatnonzero(~np.isnan(csr_real.lon))
+    assert np.isnan(csr.lon[len(located):]).all()
+    assert sorted(zip(csr.lon[:len(located)], csr.lat[:len(located)])) == \
+           sorted(zip(csr_real.lon[located], csr_real.lat[located]))
+    again = ae.generate_benchmark_csr(G, 3, model='er_numpy')
+    assert edge_keys(again) == edge_keys(csr)
+
+
+def test_unknown_model():
+    G = real_graph(0, False)
+    with pytest.raises(ValueError):
+        ae.generate_benchmark_csr(G, 0, model='gnp')
+    with pytest.raises(TypeError):
+        ae.generate_benchmark_csr(G, 0, model='er', swaps_per_edge=3)
+
+
+def degrees(csr, edges=None):
+    """Per node (out, in) degree counts, over the given edge rows (default: all)."""
+    edges = np.arange(csr.m) if edges is None else edges
+    out_degree = np.bincount(csr.src[edges], minlength=csr.n)
+    in_degree = np.bincount(csr.dst[edges], minlength=csr.n)
+    return (out_degree, in_degree) if csr.directed else (out_degree + in_degree,)
+
+
+@pytest.mark.parametrize('preserve_layers', [False, True])
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(4))
+def test_degree_preserving_swaps(seed, directed, preserve_layers):
+    G = real_graph(seed, directed)
+    csr_real = ae.as_csr(G)
+    model = 'degree_layers' if preserve_layers else 'degree'
+    csr = ae.generate_benchmark_csr(G, seed, model=model)
+    for expected, value in zip(degrees(csr_real), degrees(csr)):
+        np.testing.assert_array_equal(value, expected)
+    if preserve_layers:
+        for code in range(len(csr_real.type_labels)):
+            layer = np.flatnonzero(csr_real.etype == code)
+            for expected, value in zip(degrees(csr_real, layer), degrees(csr, layer)):
+                np.testing.assert_array_equal(value, expected)
+    assert (csr.src != csr.dst).all()
+    assert len(set(edge_keys(csr))) == csr.m
+    # Rewired, not copied; names, node attributes and edge types stay
+    assert len(set(edge_keys(csr)) - set(edge_keys(csr_real))) > csr.m // 2
+    assert csr.names == csr_real.names
+    np.testing.assert_array_equal(csr.lon, csr_real.lon)
+    np.testing.assert_array_equal(csr.etype, csr_real.etype)
+
+
+def test_degree_preserving_swaps_on_a_saturated_graph():
+    # Every swap of a complete graph would duplicate an edge; the generator gives up instead of looping
+    G = nx.complete_graph(6)
+    csr = ae.generate_degree_preserving_csr(G, 0)
+    assert edge_keys(csr) == edge_keys(ae.as_csr(G))
+
+
+def spatial_graph(seed, directed, n=400):
+    """Stations with coordinates, linked to nearby stations (a few hundred metres), as in a transit network."""
+    rng = np.random.default_rng(seed)
+    G = nx.DiGraph() if directed else nx.Graph()
+    lon, lat = 114 + rng.random(n) * 0.15, 30.4 + rng.random(n) * 0.15
+    for v in range(n):
+        G.add_node(v, lon=lon[v], lat=lat[v], mode=MODES[v % 3])
+    G.add_node(n, mode=MODES[0])  # No coordinates
+    metres = ae._haversine(lon[:, None], lat[:, None], lon[None], lat[None])
+    for v in range(n):
+        for u in np.argsort(metres[v])[1:3]:
+            G.add_edge(v, int(u), type='route')
+    G.add_edge(n, 0, type='walk')
+    return G
+
+
+def mean_edge_length(csr, edges):
+    return np.mean(ae._haversine(csr.lon[csr.src[edges]], csr.lat[csr.src[edges]],
+                                 csr.lon[csr.dst[edges]], csr.lat[csr.dst[edges]]))
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(3))
+def test_spatial_benchmark(seed, directed):
+    G = spatial_graph(seed, directed)
+    csr_real = ae.as_csr(G)
+    csr = ae.generate_benchmark_csr(G, seed, model='spatial')
+    located = ~np.isnan(csr_real.lon)
+    movable = np.flatnonzero(located[csr_real.src] & located[csr_real.dst])
+    target = mean_edge_length(csr_real, movable)
+    # Calibrated to <l_e> within calibration_tol, which one uncalibrated run misses
+    assert mean_edge_length(csr, movable) == pytest.approx(target, rel=0.01)
+    uncalibrated = ae.generate_spatial_benchmark_csr(G, seed, calibration_rounds=1)
+    assert abs(mean_edge_length(uncalibrated, movable) / target - 1) > 0.01
+
+    assert (csr.src != csr.dst).all()
+    assert len(set(edge_keys(csr))) == csr.m
+    assert edge_keys(csr) != edge_keys(csr_real)
+    fixed = np.setdiff1d(np.arange(csr.m), movable)  # Edges at nodes without coordinates stay
+    np.testing.assert_array_equal(csr.src[fixed], csr_real.src[fixed])
+    np.testing.assert_array_equal(csr.dst[fixed], csr_real.dst[fixed])
+    if directed:
+        np.testing.assert_array_equal(np.bincount(csr.src, minlength=csr.n), np.bincount(csr_real.src, minlength=csr.n))
+    again = ae.generate_spatial_benchmark_csr(G, seed)
+    assert edge_keys(again) == edge_keys(csr)
+
+
+def assert_same_graph(csr, expected):
+    assert (csr.n, csr.directed) == (expected.n, expected.directed)
+    for field in ('src', 'dst', 'length', 'lon', 'lat'):
+        np.testing.assert_array_equal(getattr(csr, field), getattr(expected, field))
+    assert modes(csr) == modes(expected)
+    assert [csr.type_labels[c] if c >= 0 else None for c in csr.etype] == \
+           [expected.type_labels[c] if c >= 0 else None for c in expected.etype]
+
+
+@pytest.mark.parametrize('model, kwargs', [('er', {}), ('er_numpy', {}), ('degree', {'swaps_per_edge': 2}),
+                                           ('degree_layers', {}), ('spatial', {'max_candidates': 4})])
+def test_cached_benchmarks(tmp_path, model, kwargs):
+    G = real_graph(1, directed=True)
+    cache = ae.BenchmarkCache(str(tmp_path))
+    fresh = ae.generate_benchmark_csr(G, 5, model=model, **kwargs)
+    assert_same_graph(cache.benchmark_csr(G, 5, model=model, **kwargs), fresh)
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+    # Read back (also from a relabelled copy of the same network), not regenerated
+    assert_same_graph(cache.benchmark_csr(nx.relabel_nodes(G, str.upper), 5, model=model, **kwargs), fresh)
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+    if model == 'er':
+        # The default model is what code4 and code5 used before the cache: generate_benchmark_graph
+        assert_same_graph(cache.benchmark_csr(G, 5), ae.CSRGraph.from_networkx(ae.generate_benchmark_graph(G, 5)))
+
+
+def test_cache_keys(tmp_path, monkeypatch):
+    G = real_graph(2, directed=False)
+    key = ae.BenchmarkCache.key(G, 'graph', model='degree', seed=1, generator=[])
+    assert key == ae.BenchmarkCache.key(ae.as_csr(G), 'graph', model='degree', seed=1, generator=[])
+    assert key != ae.BenchmarkCache.key(G, 'graph', model='degree', seed=2, generator=[])
+    assert key != ae.BenchmarkCache.key(G, 'graph', model='degree', seed=1, generator=[('swaps_per_edge', 2)])
+    H = G.copy()
+    H.remove_edge(*next(iter(H.edges())))
+    assert key != ae.BenchmarkCache.key(H, 'graph', model='degree', seed=1, generator=[])
+    monkeypatch.setattr(ae, 'BENCHMARK_CACHE_VERSION', ae.BENCHMARK_CACHE_VERSION + 1)
+    assert key != ae.BenchmarkCache.key(G, 'graph', model='degree', seed=1, generator=[])
+
+
+def edge_count(csr):
+    return {'edges': csr.m, 'located': np.count_nonzero(~np.isnan(csr.lon))}
+
+
+def test_cached_metrics(tmp_path):
+    G = real_graph(3, directed=False)
+    cache = ae.BenchmarkCache(str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.metrics(G, 0, edge_count, '')
+    values = cache.metrics(G, 0, edge_count, 'edges_v1')
+    assert values == edge_count(ae.generate_benchmark_csr(G, 0))
+    # A cached entry is returned without calling compute again
+    assert cache.metrics(G, 0, lambda csr: pytest.fail("recomputed"), 'edges_v1') == values
+    assert cache.metrics(G, 0, lambda csr: {'edges': -1.0}, 'edges_v2') == {'edges': -1.0}
+
+
+def test_cache_eviction(tmp_path):
+    G = real_graph(4, directed=False)
+    cache = ae.BenchmarkCache(str(tmp_path))
+    for seed in range(3):
+        cache.benchmark_csr(G, seed)
+    size = max(entry.stat().st_size for entry in tmp_path.glob('*.npz'))
+    cache.max_bytes = 2 * size
+    cache.benchmark_csr(G, 0)  # Refreshes seed 0, so seeds 1 and 2 are the least recently used
+    cache.benchmark_csr(G, 3)
+    assert len(list(tmp_path.glob('*.npz'))) <= 2
+    assert cache.load(cache.key(G, 'graph', model='er', seed=3, generator=[])) is not None
+
+
+class RecordingExecutor:
+    """Wraps a ResilienceExecutor, counting the seeds its task feeder has pulled and the results handed back."""
+
+    def __init__(self, executor):
+        self.executor, self.processes = executor, executor.processes
+        self.lock = threading.Lock()
+        self.pulled, self.returned, self.max_in_flight = 0, 0, 0
+
+    def imap_unordered(self, func, tasks, chunksize=1):
+        def _recorded():
+            for task in tasks:
+                with self.lock:
+                    self.pulled += 1
+                    self.max_in_flight = max(self.max_in_flight, self.pulled - self.returned)
+                yield task
+
+        for result in self.executor.imap_unordered(func, _recorded(), chunksize):
+            with self.lock:
+                self.returned += 1
+            yield result
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with ae.ResilienceExecutor(2) as executor:
+        yield executor
+
+
+def test_metrics_ensemble(tmp_path, executor):
+    G = real_graph(5, directed=True)
+    recording = RecordingExecutor(executor)
+    cache = ae.BenchmarkCache(str(tmp_path / 'pool'))
+    results = list(cache.metrics_ensemble(G, range(8), edge_count, 'edges_v1', executor=recording, max_pending=2))
+    assert [seed for seed, _ in results] == list(range(8))
+    assert 1 <= recording.max_in_flight <= 2
+    in_process = ae.BenchmarkCache(str(tmp_path / 'in_process'))
+    for seed, values in results:
+        assert values == cache.metrics(G, seed, lambda csr: pytest.fail("recomputed"), 'edges_v1')
+        assert values == in_process.metrics(G, seed, edge_count, 'edges_v1')
+    assert not ae._OWNED_BLOCKS
+
+
+def test_metrics_ensemble_closed_early(tmp_path, executor):
+    G = real_graph(6, directed=False)
+    recording = RecordingExecutor(executor)
+    cache = ae.BenchmarkCache(str(tmp_path))
+    results = cache.metrics_ensemble(G, range(20), edge_count, 'edges_v1', executor=recording, max_pending=3)
+    next(results)
+    results.close()
+    # No seed is submitted after the close; the ones in flight finished into the cache
+    pulled = recording.pulled
+    assert pulled <= 1 + 3 and recording.returned == pulled
+    for seed in range(20):
+        key = cache.key(G, 'metrics', model='er', seed=seed, metrics='edges_v1', generator=[])
+        assert (cache.load(key) is not None) == (seed < pulled)
+    assert not ae._OWNED_BLOCKS
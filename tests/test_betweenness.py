@@ -0,0 +1,58 @@
+"""Exact parallel betweenness against networkx."""
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+
+def labelled_graph(seed, directed, n):
+    rng = random.Random(seed)
+    G = nx.gnm_random_graph(n, 2 * n, seed=seed, directed=directed)
+    for _, _, data in G.edges(data=True):
+        if rng.random() < 0.9:  # Edges without a length count as 1
+            data['length'] = rng.choice([0.5, 1.0, 2.0, 3.0, 0.1 + 0.2])
+    return nx.relabel_nodes(G, {v: f"s{v}" for v in G})
+
+
+def assert_matches_networkx(G, weight, normalized, **kwargs):
+    node_bc, edge_bc = ae.exact_betweenness_centrality(G, weight=weight, normalized=normalized, **kwargs)
+    expected_nodes = nx.betweenness_centrality(G, weight=weight, normalized=normalized)
+    expected_edges = nx.edge_betweenness_centrality(G, weight=weight, normalized=normalized)
+    assert node_bc.keys() == expected_nodes.keys()
+    for v, value in expected_nodes.items():
+        assert node_bc[v] == pytest.approx(value, abs=1e-9)
+    for (u, v), value in expected_edges.items():
+        assert edge_bc[(u, v)] == pytest.approx(value, abs=1e-9)
+
+
+@pytest.mark.parametrize('normalized', [True, False])
+@pytest.mark.parametrize('weight', [None, 'length'])
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('n', [1, 2, 3, 10, 40])
+def test_exact_betweenness(n, directed, weight, normalized):
+    assert_matches_networkx(labelled_graph(n, directed, n), weight, normalized)
+
+
+@pytest.mark.parametrize('directed', [False, True])
+def test_exact_betweenness_on_worker_pool(directed):
+    G = labelled_graph(7, directed, 60)
+    with ae.shared_executor(processes=2):
+        assert_matches_networkx(G, None, True)
+        assert_matches_networkx(G, 'length', True)
+
+
+@pytest.mark.parametrize('directed', [False, True])
+def test_betweenness_on_a_node_mask(directed):
+    G = labelled_graph(3, directed, 40)
+    csr = ae.CSRGraph.from_networkx(G)
+    alive = np.ones(csr.n, dtype=bool)
+    alive[::5] = False
+    node_bc, _ = ae.betweenness_arrays(csr, normalized=True, node_mask=alive)
+    H = G.subgraph([csr.names[i] for i in np.flatnonzero(alive)])
+    expected = nx.betweenness_centrality(H, normalized=True)
+    for v, value in expected.items():
+        assert node_bc[csr.index[v]] == pytest.approx(value, abs=1e-9)
+    assert not node_bc[~alive].any()
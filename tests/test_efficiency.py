@@ -0,0 +1,131 @@
+"""Efficiency metrics and efficiency-degradation curves against networkx brute force."""
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+
+def located_graph(seed, directed, n=30):
+    rng = random.Random(seed)
+    G = nx.gnm_random_graph(n, 2 * n, seed=seed, directed=directed)
+    for v in G:
+        G.nodes[v].update(lon=114 + rng.random() * 0.2, lat=30.4 + rng.random() * 0.2)
+    return G
+
+
+def metres(G, u, v):
+    return ae._haversine(G.nodes[u]['lon'], G.nodes[u]['lat'], G.nodes[v]['lon'], G.nodes[v]['lat'])
+
+
+def reference_efficiencies(H, sources=None):
+    """(E, E_geospatial) of H pair by pair: 1/hops and straight-line / walked straight-line metres."""
+    n = len(H)
+    if n < 2:
+        return 0.0, 0.0
+    for u, v, data in H.edges(data=True):
+        data['geo'] = metres(H, u, v)
+    sources = list(H) if sources is None else sources
+    inverse, detour = 0.0, 0.0
+    for u in sources:
+        hops = nx.single_source_shortest_path_length(H, u)
+        walked = nx.single_source_dijkstra_path_length(H, u, weight='geo')
+        for v, d in hops.items():
+            if v != u:
+                inverse += 1 / d
+                detour += metres(H, u, v) / walked[v]
+    return inverse / (len(sources) * (n - 1)), detour / (len(sources) * (n - 1))
+
+
+@pytest.mark.parametrize('edges', [False, True])
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(4))
+def test_efficiency_trajectory(seed, directed, edges):
+    G = located_graph(seed, directed)
+    csr = ae.as_csr(G)
+    rng = random.Random(seed)
+    items = list(G.edges()) if edges else list(G.nodes())
+    rng.shuffle(items)
+    order = csr.edge_rows(items) if edges else csr.node_ids(items)
+    q, e, e_geo = ae._run_efficiency_trajectory(csr, order, 7, edges=edges)
+
+    step_size = max(1, len(items) // 7)
+    H = G.copy()
+    expected = [(0.0,) + reference_efficiencies(H)]
+    for i in range(0, len(items), step_size):
+        (H.remove_edges_from if edges else H.remove_nodes_from)(items[i:i + step_size])
+        removed = min(i + step_size, len(items))
+        expected.append((removed / len(items),) + reference_efficiencies(H))
+    np.testing.assert_allclose(q, [point[0] for point in expected])
+    np.testing.assert_allclose(e, [point[1] for point in expected], atol=1e-12)
+    np.testing.assert_allclose(e_geo, [point[2] for point in expected], atol=1e-12)
+
+
+@pytest.mark.parametrize('engine', ['stepwise', 'bond'])
+def test_efficiency_columns(engine):
+    G = located_graph(9, directed=False)
+    csr = ae.as_csr(G)
+    df = ae.run_resilience_analysis(G, 'random', num_tests=3, removal_steps=6, engine=engine, efficiency=True)
+    edges = engine == 'bond'
+    q_base = np.linspace(0, 1, 8)
+    curves = []
+    for s in range(3):
+        order = (ae._edge_removal_order_ids if edges else ae._removal_order_ids)(csr, 'random', s)
+        q, e, e_geo = ae._run_efficiency_trajectory(csr, order, 6, seed=s, edges=edges)
+        curves.append([np.interp(q_base, q, e / e[0]), np.interp(q_base, q, e_geo / e_geo[0])])
+    curves = np.array(curves)
+    for i, metric in enumerate(('E', 'E_geospatial')):
+        np.testing.assert_allclose(df[f'{metric}_mean'], curves[:, i].mean(axis=0), atol=1e-12)
+        np.testing.assert_allclose(df[f'{metric}_std'], curves[:, i].std(axis=0), atol=1e-12)
+    assert df['E_mean'].iloc[0] == 1.0
+    with pytest.raises(ValueError):
+        ae.run_resilience_analysis(G, 'random', engine='vectorized', efficiency=True)
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(4))
+def test_efficiency_metrics(seed, directed):
+    G = located_graph(seed, directed, n=40)
+    e, e_geo = ae.efficiency_metrics(G)
+    expected_e, expected_geo = reference_efficiencies(G)
+    assert e == pytest.approx(expected_e, rel=1e-12)
+    assert e_geo == pytest.approx(expected_geo, rel=1e-12)
+    if not directed:
+        assert e == pytest.approx(nx.global_efficiency(G), rel=1e-12)
+
+
+@pytest.mark.parametrize('directed', [False, True])
+def test_geospatial_efficiency_blocks_and_masks(directed):
+    G = located_graph(5, directed, n=40)
+    csr = ae.as_csr(G)
+    node_mask = np.ones(csr.n, dtype=bool)
+    node_mask[::6] = False
+    edge_mask = np.ones(csr.m, dtype=bool)
+    edge_mask[::4] = False
+    H = G.copy()
+    H.remove_nodes_from([csr.names[i] for i in np.flatnonzero(~node_mask)])
+    H.remove_edges_from([(csr.names[u], csr.names[v]) for u, v in zip(csr.src[~edge_mask], csr.dst[~edge_mask])])
+    expected = reference_efficiencies(H)[1]
+    # Any block size and thread count give the same value: partial sums are added in block order
+    for chunk_rows, num_threads in [(None, 1), (1, 1), (7, 3)]:
+        value = ae.geospatial_efficiency(csr, node_mask, edge_mask, chunk_rows=chunk_rows, num_threads=num_threads)
+        assert value == pytest.approx(expected, rel=1e-12)
+
+
+def test_sampled_sources():
+    G = located_graph(2, directed=False, n=40)
+    csr = ae.as_csr(G)
+    sources = np.sort(np.random.default_rng(3).choice(np.arange(csr.n), 10, replace=False))
+    e, e_geo = ae.efficiency_metrics(G, num_sources=10, seed=3)
+    expected = reference_efficiencies(G, sources=[csr.names[i] for i in sources])
+    assert (e, e_geo) == pytest.approx(expected, rel=1e-12)
+
+
+def test_efficiency_without_coordinates():
+    G = nx.path_graph(5)
+    e, e_geo = ae.efficiency_metrics(G)
+    assert e == pytest.approx(nx.global_efficiency(G))
+    assert np.isnan(e_geo)
+    assert ae.efficiency_metrics(nx.empty_graph(1)) == (0.0, 0.0)
@@ -0,0 +1,110 @@
+"""apsp_metrics and IncrementalLayerMetrics against networkx brute force."""
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+MODES = ['bus', 'metro', 'rail', 'ferry']
+
+
+def gini(values):
+    x = np.sort(np.asarray(values, dtype=np.float64))
+    if x.sum() == 0:
+        return 0.0
+    return 2 * np.sum(np.arange(1, len(x) + 1) * x) / (len(x) * x.sum()) - (len(x) + 1) / len(x)
+
+
+def haversine(G, u, v):
+    return ae._haversine(G.nodes[u]['lon'], G.nodes[u]['lat'], G.nodes[v]['lon'], G.nodes[v]['lat'])
+
+
+def reference_metrics(G):
+    """The engine's definitions, recomputed pair by pair with networkx."""
+    n = len(G)
+    for u, v, data in G.edges(data=True):
+        data['geo'] = haversine(G, u, v)
+    lengths, inverse, detour = [], 0.0, 0.0
+    for u in G:
+        hops = nx.single_source_shortest_path_length(G, u)
+        metres = nx.single_source_dijkstra_path_length(G, u, weight='geo')
+        for v, d in hops.items():
+            if v != u:
+                lengths.append(d)
+                inverse += 1 / d
+                detour += haversine(G, u, v) / metres[v]
+    components = nx.weakly_connected_components(G) if G.is_directed() else nx.connected_components(G)
+    edge_lengths = [d['geo'] for _, _, d in G.edges(data=True)]
+    return {
+        '|V|': n, '|E|': G.number_of_edges(),
+        'S0': max(map(len, components)) / n,
+        'l_max': max(lengths, default=0), '<l>': np.mean(lengths) if lengths else 0.0,
+        'E': inverse / (n * (n - 1)), 'E_geospatial': detour / (n * (n - 1)),
+        '<l_e>': np.mean(edge_lengths), 'σ(le)': np.std(edge_lengths),
+        'Gini (ND)': gini([d for _, d in G.degree()]),
+        'Gini (BC)': gini(list(nx.betweenness_centrality(G).values())),
+    }
+
+
+def assert_metrics_close(metrics, expected):
+    for key, value in expected.items():
+        assert metrics[key] == pytest.approx(value, rel=1e-9, abs=1e-12), key
+
+
+def layered_graph(seed, directed):
+    rng = random.Random(seed)
+    G = nx.DiGraph() if directed else nx.Graph()
+    for i in range(80):
+        G.add_node(i, mode=MODES[i % 4], lon=114 + rng.random() * 0.1, lat=30 + rng.random() * 0.1)
+    for _ in range(160):
+        u, v = rng.randrange(80), rng.randrange(80)
+        if u != v and G.nodes[u]['mode'] == G.nodes[v]['mode']:
+            G.add_edge(u, v, type='route')
+    for _ in range(30):
+        u, v = rng.randrange(80), rng.randrange(80)
+        if u != v and not G.has_edge(u, v):
+            G.add_edge(u, v, type='walk')
+    return G
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(3))
+def test_apsp_metrics(seed, directed, tmp_path):
+    G = layered_graph(seed, directed)
+    distance_file = str(tmp_path / 'hops.npy')
+    assert_metrics_close(ae.apsp_metrics(G, distance_file=distance_file), reference_metrics(G))
+
+    distances, csr = ae.load_distance_matrix(distance_file), ae.as_csr(G)
+    for u, hops in nx.all_pairs_shortest_path_length(G):
+        row = distances[csr.index[u]]
+        assert np.isinf(row).sum() == len(G) - len(hops)
+        for v, d in hops.items():
+            assert row[csr.index[v]] == d
+
+
+@pytest.mark.parametrize('isolated', [False, True])
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_layer_metrics(seed, directed, isolated):
+    G = layered_graph(seed, directed)
+    csr = ae.as_csr(G)
+    is_walk = np.array([csr.type_labels[t] == 'walk' for t in csr.etype])
+    tracker = ae.IncrementalLayerMetrics(csr, edge_mask=~is_walk if isolated else None)
+    for k in range(1, len(MODES) + 1):
+        metrics = tracker.add_modes([MODES[k - 1]])
+        H = G.subgraph([v for v, mode in G.nodes(data='mode') if mode in MODES[:k]]).copy()
+        if isolated:
+            H.remove_edges_from([(u, v) for u, v, t in H.edges(data='type') if t == 'walk'])
+        assert_metrics_close(metrics, reference_metrics(H))
+        assert tracker.graph().m == H.number_of_edges()
+
+
+def test_incremental_layer_metrics_on_worker_pool():
+    G = layered_graph(5, directed=True)
+    with ae.shared_executor(processes=2):
+        tracker = ae.IncrementalLayerMetrics(G)
+        for k in range(1, len(MODES) + 1):
+            metrics = tracker.add_modes([MODES[k - 1]])
+    assert_metrics_close(metrics, reference_metrics(G))
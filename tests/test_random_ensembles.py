@@ -0,0 +1,96 @@
+"""Vectorized random-failure ensembles against the per-run percolation engine."""
+import networkx as nx
+import numpy as np
+import pytest
+from scipy.integrate import trapezoid
+
+import analysis_engines as ae
+
+
+def percolation_curves(csr, orders, removal_steps):
+    """Every order's percolation curve, aligned to the common q-axis like the engines do."""
+    q_base = np.linspace(0, 1, removal_steps + 2)
+    curves = [ae.SIMULATION_ENGINES['percolation'](csr, order, removal_steps) for order in orders]
+    return np.array([np.interp(q_base, q, s) for q, s in curves])
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(6))
+def test_ensemble_matches_percolation(seed, directed):
+    G = nx.gnm_random_graph(25 + seed, 40 + 5 * seed, seed=seed, directed=directed)
+    G.add_edge(0, 0)
+    csr = ae.as_csr(G)
+    df, s_matrix = ae.run_random_failure_ensemble(G, num_runs=30, removal_steps=20, seed=seed)
+    expected = percolation_curves(csr, ae.random_removal_orders(csr.n, 30, seed), 20)
+    np.testing.assert_allclose(s_matrix, expected, atol=1e-12)
+    np.testing.assert_allclose(df['mean'], expected.mean(axis=0), atol=1e-12)
+    np.testing.assert_allclose(df['std'], expected.std(axis=0), atol=1e-12)
+
+
+def test_ensemble_batches_do_not_change_results():
+    G = nx.gnm_random_graph(40, 70, seed=1)
+    _, whole = ae.run_random_failure_ensemble(G, num_runs=25, removal_steps=10)
+    _, batched = ae.run_random_failure_ensemble(G, num_runs=25, removal_steps=10, batch_size=4)
+    np.testing.assert_array_equal(whole, batched)
+
+
+def test_ensemble_edge_cases():
+    for G in (nx.empty_graph(0), nx.empty_graph(6)):
+        df, s_matrix = ae.run_random_failure_ensemble(G, num_runs=3, removal_steps=4)
+        assert s_matrix.shape == (3, 6)
+        expected = percolation_curves(ae.as_csr(G), ae.random_removal_orders(len(G), 3), 4) if len(G) else 0.0
+        np.testing.assert_allclose(s_matrix, expected)
+
+
+def test_vectorized_engine():
+    G = nx.gnm_random_graph(30, 50, seed=2)
+    df = ae.run_resilience_analysis(G, 'random', num_tests=20, removal_steps=10, engine='vectorized')
+    assert df.equals(ae.run_random_failure_ensemble(G, num_runs=20, removal_steps=10)[0])
+    with pytest.raises(ValueError):
+        ae.run_resilience_analysis(G, 'degree', engine='vectorized')
+
+
+def reference_half_width(s_matrix, q_base, ci_metric):
+    if ci_metric == 'rb':
+        values = [trapezoid(row, q_base) for row in s_matrix]
+        return 1.96 * np.std(values, ddof=1) / np.sqrt(len(s_matrix))
+    return 1.96 * max(np.std(s_matrix[:, j], ddof=1) for j in range(s_matrix.shape[1])) / np.sqrt(len(s_matrix))
+
+
+@pytest.mark.parametrize('ci_metric', ae.CI_METRICS)
+def test_ci_half_width(ci_metric):
+    rng = np.random.default_rng(0)
+    q_base = np.linspace(0, 1, 12)
+    s_matrix = rng.random((15, 12))
+    assert ae.ci_half_width(s_matrix, q_base, ci_metric) == pytest.approx(
+        reference_half_width(s_matrix, q_base, ci_metric))
+    assert ae.ci_half_width(s_matrix[:1], q_base, ci_metric) == np.inf
+    with pytest.raises(ValueError):
+        ae.ci_half_width(s_matrix, q_base, 'median')
+
+
+@pytest.mark.parametrize('engine', ['stepwise', 'vectorized'])
+@pytest.mark.parametrize('ci_metric', ae.CI_METRICS)
+@pytest.mark.parametrize('target_ci', [0.03, 0.015, 1e-6])
+def test_convergence_stops_at_the_first_batch_within_target(target_ci, ci_metric, engine):
+    G = nx.gnm_random_graph(40, 80, seed=4)
+    df = ae.run_resilience_analysis(G, 'random', removal_steps=10, engine=engine, target_ci=target_ci,
+                                    ci_metric=ci_metric, ci_batch=5, max_tests=40)
+    num_tests = df.attrs['num_tests']
+    assert num_tests % 5 == 0 and 5 <= num_tests <= 40
+    assert df.attrs['converged'] == (df.attrs['ci_half_width'] <= target_ci)
+    assert df.attrs['converged'] or num_tests == 40
+
+    # The runs used are the first num_tests of the ensemble; every shorter prefix (whole batches) missed the target
+    q_base = np.linspace(0, 1, 12)
+    if engine == 'vectorized':
+        s_matrix = np.vstack([ae.run_random_failure_ensemble(G, 5, 10, seed=b)[1] for b in range(8)])
+    else:
+        csr = ae.as_csr(G)
+        orders = [csr.node_ids(ae.get_node_removal_order(G, 'random', seed=s)) for s in range(40)]
+        s_matrix = np.array([np.interp(q_base, *ae.SIMULATION_ENGINES['stepwise'](csr, order, 10))
+                             for order in orders])
+    np.testing.assert_allclose(df['mean'], s_matrix[:num_tests].mean(axis=0), atol=1e-12)
+    assert df.attrs['ci_half_width'] == pytest.approx(ae.ci_half_width(s_matrix[:num_tests], q_base, ci_metric))
+    for runs in range(5, num_tests, 5):
+        assert ae.ci_half_width(s_matrix[:runs], q_base, ci_metric) > target_ci
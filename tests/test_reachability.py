@@ -0,0 +1,38 @@
+"""ReachabilityIndex queries against nx.descendants."""
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+
+def without_node_edges(G, v):
+    """G with every edge at v removed (v kept as an isolated node)."""
+    H = G.copy()
+    H.remove_edges_from(list(H.in_edges(v)) + list(H.out_edges(v)) if G.is_directed() else list(H.edges(v)))
+    return H
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(15))
+def test_reachability_index(seed, directed):
+    rng = random.Random(seed)
+    n = rng.randrange(2, 40)
+    G = nx.gnm_random_graph(n, rng.randrange(0, 3 * n), seed=seed, directed=directed)
+    if rng.random() < 0.5:
+        G.add_edge(0, 0)
+    index = ae.ReachabilityIndex(G)
+    for v in G:
+        assert set(np.flatnonzero(index.descendants(v))) == nx.descendants(G, v)
+        H = without_node_edges(G, v)
+        for u in G:
+            if u != v:
+                expected = nx.descendants(H, u) - {u, v}
+                assert set(np.flatnonzero(index.descendants_avoiding(u, v))) == expected
+
+
+def test_reachability_index_is_cached_per_graph():
+    csr = ae.CSRGraph.from_networkx(nx.path_graph(5))
+    assert ae.reachability_index(csr) is ae.reachability_index(csr)
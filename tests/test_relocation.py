@@ -0,0 +1,115 @@
+"""Relocation-rate profiles and sweeps against the per-distance greedy loop they replace."""
+import math
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+MODES = ['metro', 'bus', 'rail']
+PENALTY_GRID = [{}, {('metro', 'bus'): 1.5, ('bus', 'metro'): 0.8}, {('bus', 'rail'): 2.0, ('rail', 'metro'): 0.5}]
+D_MAX_VALUES = [250, 750, 1600]
+
+
+def multimodal_graph(seed, directed, n=40):
+    """Stations of three modes (one without a mode) a few kilometres apart, with a self-loop."""
+    rng = random.Random(seed)
+    G = nx.gnm_random_graph(n, 2 * n, seed=seed, directed=directed)
+    G = nx.relabel_nodes(G, {v: f"s{v}" for v in G})
+    for i, v in enumerate(G):
+        G.nodes[v].update(lon=114 + rng.random() * 0.02, lat=30.5 + rng.random() * 0.02)
+        if i != 7:
+            G.nodes[v]['mode'] = MODES[i % 3]
+    G.add_edge('s3', 's3')
+    return G
+
+
+def haversine_distance(lon1, lat1, lon2, lat2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * ae.EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def greedy_rl(G, nodes_to_evaluate, d_max, penalties):
+    """code11's original calculate_asymmetric_rl, with the hard-coded Metro/Bus penalties taken from `penalties`."""
+    if G.number_of_nodes() < 2: return 0.0
+    nodes_in_graph = [node for node in nodes_to_evaluate if node in G]
+    if not nodes_in_graph: return 0.0
+
+    pos_dict = {n: (G.nodes[n]['lon'], G.nodes[n]['lat']) for n in G.nodes if 'lon' in G.nodes[n]}
+    neighbors_dict = {n: set(G.neighbors(n)) for n in G.nodes}
+    modes_dict = nx.get_node_attributes(G, 'mode')
+    total_node_rl = 0
+
+    for v in nodes_in_graph:
+        reachable_nodes_from_v = nx.descendants(G, v)
+        if not reachable_nodes_from_v: continue
+
+        G_disrupted = G.copy()
+        G_disrupted.remove_node(v)
+        candidate_hubs = neighbors_dict.get(v, set())
+        reachable_from_hubs = {u: nx.descendants(G_disrupted, u) for u in candidate_hubs if u in G_disrupted}
+
+        total_decay_factor = 0
+        for n in reachable_nodes_from_v:
+            if n == v: continue
+            min_weighted_dist = float('inf')
+            for u in candidate_hubs:
+                if u in G_disrupted and n in reachable_from_hubs.get(u, set()):
+                    dist = haversine_distance(pos_dict[v][0], pos_dict[v][1], pos_dict[u][0], pos_dict[u][1])
+                    penalty = penalties.get((modes_dict.get(v), modes_dict.get(u)), 1.0)
+                    if dist * penalty < min_weighted_dist:
+                        min_weighted_dist = dist * penalty
+
+            if min_weighted_dist <= d_max:
+                total_decay_factor += (1.0 - (min_weighted_dist / d_max))
+
+        total_node_rl += total_decay_factor / len(reachable_nodes_from_v)
+
+    return total_node_rl / len(nodes_in_graph)
+
+
+def evaluated_nodes(G):
+    return [v for v, mode in G.nodes(data='mode') if mode in ('metro', 'bus')] + ['s7', 'missing']
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(3))
+def test_sweep_matches_greedy_loop(seed, directed):
+    G = multimodal_graph(seed, directed)
+    nodes = evaluated_nodes(G)
+    max_distance = max(D_MAX_VALUES) / min([1.0] + [f for penalties in PENALTY_GRID for f in penalties.values()])
+    profile = ae.relocation_profile(G, nodes, max_distance=max_distance)
+    rates = ae.sweep_asymmetric_rl(profile, D_MAX_VALUES, PENALTY_GRID)
+    expected = [[greedy_rl(G, nodes, d_max, penalties) for d_max in D_MAX_VALUES] for penalties in PENALTY_GRID]
+    np.testing.assert_allclose(rates, expected, rtol=1e-9)
+    assert rates[:, -1].min() > 0  # The distances reach some hubs
+    # Without a distance cut-off the profile only grows by hubs no distance can reach
+    unbounded = ae.relocation_profile(G, nodes, index=ae.ReachabilityIndex(ae.as_csr(G)))
+    np.testing.assert_allclose(ae.sweep_asymmetric_rl(unbounded, D_MAX_VALUES, PENALTY_GRID), rates, rtol=1e-12)
+
+
+def test_hub_distances():
+    G = multimodal_graph(0, directed=True)
+    csr = ae.as_csr(G)
+    nodes = np.array([5, 0, 3, 12])
+    rows, hubs, metres = ae.hub_distances(csr, nodes)
+    expected = [(v, u) for v in nodes.tolist() for u in csr.indices[csr.indptr[v]:csr.indptr[v + 1]].tolist()]
+    assert list(zip(rows.tolist(), hubs.tolist())) == expected
+    np.testing.assert_allclose(metres, [haversine_distance(csr.lon[v], csr.lat[v], csr.lon[u], csr.lat[u])
+                                        for v, u in expected], rtol=1e-9)
+    assert [len(a) for a in ae.hub_distances(csr, [])] == [0, 0, 0]
+
+
+def test_profile_on_the_worker_pool():
+    G = multimodal_graph(4, directed=True, n=60)
+    nodes = evaluated_nodes(G)
+    in_process = ae.relocation_profile(G, nodes, max_distance=3200)
+    with ae.ResilienceExecutor(2) as executor:
+        pooled = ae.relocation_profile(G, nodes, max_distance=3200, executor=executor)
+    # Chunks are combined in order, so the profile is the same array for array
+    for key, value in in_process.items():
+        np.testing.assert_array_equal(pooled[key], value)
+    assert not ae._OWNED_BLOCKS
@@ -0,0 +1,96 @@
+"""run_resilience_batch against one run_resilience_analysis call per graph and attack, and map_calls."""
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+ATTACKS = {'rnd': ('random', 6), 'nd': 'degree', 'bc': 'betweenness'}
+
+
+def graphs():
+    return {f"g{seed}": nx.gnm_random_graph(30 + 5 * seed, 60 + 7 * seed, seed=seed, directed=seed % 2 == 1)
+            for seed in range(4)}
+
+
+def expected_frames(removal_steps=10):
+    frames = {}
+    for key, G in graphs().items():
+        for label, scenario in ATTACKS.items():
+            scenario, num_tests = scenario if isinstance(scenario, tuple) else (scenario, 1)
+            frames[key, label] = ae.run_resilience_analysis(G, scenario, num_tests=num_tests,
+                                                            removal_steps=removal_steps)
+    return frames
+
+
+def run_batch(executor=None, **kwargs):
+    jobs = ((key, G, ATTACKS) for key, G in graphs().items())
+    return {(key, label): df for key, label, df in ae.run_resilience_batch(jobs, removal_steps=10,
+                                                                           executor=executor, **kwargs)}
+
+
+def assert_frames_equal(frames, expected):
+    assert frames.keys() == expected.keys()
+    for key, df in expected.items():
+        assert frames[key].equals(df), key
+
+
+@pytest.fixture(scope='module')
+def executor():
+    with ae.ResilienceExecutor(3) as executor:
+        yield executor
+
+
+def test_batch_matches_single_calls(executor):
+    expected = expected_frames()
+    assert_frames_equal(run_batch(), expected)
+    assert_frames_equal(run_batch(executor), expected)
+    assert not ae._OWNED_BLOCKS
+
+
+def test_batch_with_one_pending_job(executor):
+    assert_frames_equal(run_batch(executor, max_pending_jobs=1), expected_frames())
+    assert not ae._OWNED_BLOCKS
+
+
+def test_batch_closed_early(executor):
+    jobs = ((key, G, ATTACKS) for key, G in graphs().items())
+    results = ae.run_resilience_batch(jobs, removal_steps=10, executor=executor, max_pending_jobs=1)
+    next(results)
+    results.close()
+    # Shared memory is released and the pool keeps serving later batches
+    assert not ae._OWNED_BLOCKS
+    assert_frames_equal(run_batch(executor), expected_frames())
+
+
+@pytest.mark.parametrize('target_ci, converged', [(0.05, True), (0.02, True), (1e-6, False)])
+def test_batch_target_ci(executor, target_ci, converged):
+    G = nx.gnm_random_graph(40, 80, seed=3)
+    jobs = [('g', G, {'rnd': 'random', 'nd': 'degree'})]
+    frames = {label: df for _, label, df in ae.run_resilience_batch(jobs, removal_steps=10, executor=executor,
+                                                                     target_ci=target_ci, ci_batch=5,
+                                                                     max_tests=40)}
+    df = frames['rnd']
+    num_tests = df.attrs['num_tests']
+    assert df.attrs['converged'] is converged
+    assert num_tests % 5 == 0 and num_tests <= 40
+    assert (df.attrs['ci_half_width'] <= target_ci) is converged
+    if not converged:
+        assert num_tests == 40
+    # Runs are seeds 0..num_tests-1, exactly as a fixed-size ensemble of that size
+    assert df.equals(ae.run_resilience_analysis(G, 'random', num_tests=num_tests, removal_steps=10))
+    assert frames['nd'].equals(ae.run_resilience_analysis(G, 'degree', removal_steps=10))
+    # One batch fewer would not have met the target
+    if converged and num_tests > 5:
+        q_base = np.linspace(0, 1, 12)
+        s_matrix = np.array([ae.run_resilience_analysis(G, [ae.get_node_removal_order(G, 'random', seed=s)],
+                                                        removal_steps=10)['mean'] for s in range(num_tests - 5)])
+        assert ae.ci_half_width(s_matrix, q_base) > target_ci
+
+
+def test_map_calls(executor):
+    calls = [(np.arange(k) ** 2,) for k in range(12)]
+    expected = [ae.gini(*args) for args in calls]
+    assert ae.map_calls(ae.gini, calls, executor) == expected
+    assert ae.map_calls(ae.gini, calls) == expected
+    assert ae.map_calls(ae.gini, []) == []
@@ -0,0 +1,193 @@
+"""Resilience trajectories of every simulation engine against networkx brute force."""
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+
+def weak_giant(H):
+    components = nx.weakly_connected_components(H) if H.is_directed() else nx.connected_components(H)
+    return max((len(c) for c in components), default=0)
+
+
+def strong_giant(H):
+    return max((len(c) for c in nx.strongly_connected_components(H)), default=0)
+
+
+def giant_scc(H):
+    """The unique largest SCC of H, or None when the largest size is tied (in/out components are then ambiguous)."""
+    sizes = sorted(nx.strongly_connected_components(H), key=len, reverse=True)
+    if not sizes or (len(sizes) > 1 and len(sizes[0]) == len(sizes[1])):
+        return None
+    return sizes[0]
+
+
+def in_component_size(H):
+    core = giant_scc(H)
+    return None if core is None else len(core | set().union(*(nx.ancestors(H, v) for v in core)))
+
+
+def out_component_size(H):
+    core = giant_scc(H)
+    return None if core is None else len(core | set().union(*(nx.descendants(H, v) for v in core)))
+
+
+def random_graph(seed, directed, n=None):
+    rng = random.Random(seed)
+    n = rng.randint(1, 40) if n is None else n
+    return nx.gnm_random_graph(n, rng.randint(0, 3 * n), seed=seed, directed=directed)
+
+
+def random_order(G, seed, partial=True):
+    rng = random.Random(seed)
+    nodes = list(G.nodes())
+    rng.shuffle(nodes)
+    return nodes[:rng.randint(0, len(nodes))] if partial else nodes
+
+
+def stepwise_reference(G, order, removal_steps, giant):
+    """The (q, S) points of the stepwise engine, recomputed on networkx copies."""
+    n = len(G)
+    s0 = giant(G) or 1
+    points = [(0.0, 1.0)]
+    step_size = max(1, n // removal_steps)
+    H = G.copy()
+    for i in range(0, n, step_size):
+        H.remove_nodes_from(order[i:i + step_size])
+        if len(H) == 0:
+            if points[-1][0] < 1.0:
+                points.append((1.0, 0.0))
+            break
+        points.append(((n - len(H)) / n, giant(H) / s0))
+    q, s = zip(*points)
+    return np.array(q), np.array(s)
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(12))
+def test_percolation_trajectory(seed, directed):
+    G = random_graph(seed, directed)
+    order = random_order(G, seed)
+    csr = ae.CSRGraph.from_networkx(G)
+    q, s = ae.SIMULATION_ENGINES['percolation'](csr, csr.node_ids(order), 50)
+    s0 = weak_giant(G) or 1
+    assert len(q) == len(order) + 1
+    for k in range(len(order) + 1):
+        H = G.copy()
+        H.remove_nodes_from(order[:k])
+        assert q[k] == pytest.approx(k / len(G))
+        assert s[k] == pytest.approx(weak_giant(H) / s0)
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('removal_steps', [5, 50])
+@pytest.mark.parametrize('seed', range(6))
+def test_stepwise_trajectory(seed, removal_steps, directed):
+    G = random_graph(seed, directed, n=30)
+    order = random_order(G, seed, partial=False)
+    csr = ae.CSRGraph.from_networkx(G)
+    q, s = ae.SIMULATION_ENGINES['stepwise'](csr, csr.node_ids(order), removal_steps)
+    q_ref, s_ref = stepwise_reference(G, order, removal_steps, weak_giant)
+    np.testing.assert_allclose(q, q_ref)
+    np.testing.assert_allclose(s, s_ref)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_scc_trajectory(seed):
+    G = random_graph(seed, directed=True)
+    if len(G) > 2:
+        G.add_edges_from([(0, 0), (1, 2), (2, 1)])
+    order = random_order(G, seed)
+    csr = ae.CSRGraph.from_networkx(G)
+    q, s = ae.SIMULATION_ENGINES['scc'](csr, csr.node_ids(order), 50)
+    s0 = strong_giant(G) or 1
+    for k in range(len(order) + 1):
+        H = G.copy()
+        H.remove_nodes_from(order[:k])
+        assert q[k] == pytest.approx(k / len(G))
+        assert s[k] == pytest.approx(strong_giant(H) / s0)
+
+
+@pytest.mark.parametrize('connection, size', [('in', in_component_size), ('out', out_component_size)])
+@pytest.mark.parametrize('seed', range(20))
+def test_in_out_component_sizes(seed, connection, size):
+    G = random_graph(seed, directed=True)
+    order = random_order(G, seed)
+    csr = ae.CSRGraph.from_networkx(G)
+    for k in range(0, len(order) + 1, 3):
+        H = G.copy()
+        H.remove_nodes_from(order[:k])
+        expected = size(H) if len(H) else 0
+        if expected is None:
+            continue
+        alive = np.ones(csr.n, dtype=bool)
+        alive[csr.node_ids(order[:k])] = False
+        assert csr.largest_component_size(alive, connection=connection) == expected
+
+
+@pytest.mark.parametrize('engine, size', [('in_component', in_component_size), ('out_component', out_component_size)])
+@pytest.mark.parametrize('seed', range(8))
+def test_in_out_component_trajectory(seed, engine, size):
+    G = random_graph(seed, directed=True, n=30)
+    order = random_order(G, seed, partial=False)
+    if size(G) is None:
+        pytest.skip("tied giant SCCs make the component ambiguous")
+    csr = ae.CSRGraph.from_networkx(G)
+    q, s = ae.SIMULATION_ENGINES[engine](csr, csr.node_ids(order), 10)
+    q_ref, _ = stepwise_reference(G, order, 10, weak_giant)
+    np.testing.assert_allclose(q, q_ref)
+    step_size = max(1, len(G) // 10)
+    for point in range(1, len(q)):
+        H = G.copy()
+        H.remove_nodes_from(order[:point * step_size])
+        expected = size(H) if len(H) else 0
+        if expected is not None:
+            assert s[point] == pytest.approx(expected / size(G))
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(12))
+def test_bond_percolation_trajectory(seed, directed):
+    G = random_graph(seed, directed)
+    rng = random.Random(seed)
+    edges = list(G.edges())
+    rng.shuffle(edges)
+    order = edges[:rng.randint(0, len(edges))]
+    if not directed:
+        order = [(v, u) if rng.random() < 0.5 else (u, v) for u, v in order]
+    csr = ae.CSRGraph.from_networkx(G)
+    result = ae.SIMULATION_ENGINES['bond'](csr, csr.edge_rows(order), 50)
+    if G.number_of_edges() == 0:
+        assert result is None
+        return
+    q, s = result
+    s0 = weak_giant(G) or 1
+    for k in range(len(order) + 1):
+        H = G.copy()
+        H.remove_edges_from(order[:k])
+        assert q[k] == pytest.approx(k / G.number_of_edges())
+        assert s[k] == pytest.approx(weak_giant(H) / s0)
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(10))
+def test_adaptive_degree_order(seed, directed):
+    G = random_graph(seed, directed)
+    order = ae.get_node_removal_order(G, 'adaptive_degree')
+    assert sorted(order) == sorted(G.nodes())
+    H = G.copy()
+    for v in order:
+        degree = dict(H.degree())  # in + out degree on directed graphs
+        assert degree[v] == max(degree.values())
+        H.remove_node(v)
+
+
+def test_stepwise_is_the_default_engine():
+    G = nx.gnm_random_graph(60, 120, seed=1)
+    orders = [ae.get_node_removal_order(G, 'random', seed=s) for s in range(3)]
+    default = ae.run_resilience_analysis(G, orders, removal_steps=10)
+    stepwise = ae.run_resilience_analysis(G, orders, removal_steps=10, engine='stepwise')
+    assert default.equals(stepwise)
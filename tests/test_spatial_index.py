@@ -0,0 +1,60 @@
+"""SpatialIndex radius and nearest-node queries against a brute-force haversine matrix."""
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+
+@pytest.fixture(scope='module')
+def graph():
+    rng = np.random.default_rng(0)
+    G = nx.Graph()
+    for i in range(400):
+        G.add_node(i, lon=114 + rng.random() * 0.3, lat=30.4 + rng.random() * 0.3)
+    G.nodes[5]['lon'] = float('nan')  # Missing coordinates
+    G.add_node(400)
+    G.nodes[7].update(lon=G.nodes[8]['lon'], lat=G.nodes[8]['lat'])  # Coincident nodes
+    csr = ae.as_csr(G)
+    distances = ae._haversine(csr.lon[:, None], csr.lat[:, None], csr.lon[None], csr.lat[None])
+    return csr, distances
+
+
+@pytest.mark.parametrize('radius', [750, 1600, 5000])
+def test_within(graph, radius):
+    csr, distances = graph
+    indptr, neighbours, metres = ae.spatial_index(csr).within(np.arange(csr.n), radius)
+    for v in range(csr.n):
+        expected = np.flatnonzero((distances[v] <= radius) & (np.arange(csr.n) != v))
+        np.testing.assert_array_equal(neighbours[indptr[v]:indptr[v + 1]], expected)
+        np.testing.assert_allclose(metres[indptr[v]:indptr[v + 1]], distances[v, expected])
+
+
+@pytest.mark.parametrize('radius', [750, 1600, 5000])
+def test_pairs_within(graph, radius):
+    csr, distances = graph
+    rows, cols, metres = ae.spatial_index(csr).pairs_within(radius)
+    expected_rows, expected_cols = np.nonzero(np.triu(distances <= radius, 1))
+    np.testing.assert_array_equal(rows, expected_rows)
+    np.testing.assert_array_equal(cols, expected_cols)
+    np.testing.assert_allclose(metres, distances[rows, cols])
+
+
+def test_nearest(graph):
+    csr, distances = graph
+    metres, neighbours = ae.spatial_index(csr).nearest(np.arange(csr.n), k=3)
+    for v in range(csr.n):
+        if np.isnan(distances[v, v]):
+            assert (neighbours[v] == -1).all()
+            continue
+        row = np.where(np.isnan(distances[v]), np.inf, distances[v])
+        row[v] = np.inf
+        np.testing.assert_allclose(metres[v], np.sort(row)[:3])
+
+
+def test_distance_and_cache(graph):
+    csr, distances = graph
+    index = ae.spatial_index(csr)
+    assert index is ae.spatial_index(csr)
+    rows, cols = np.arange(0, 300, 7), np.arange(1, 301, 7)
+    np.testing.assert_allclose(index.distance(rows, cols), distances[rows, cols], equal_nan=True)
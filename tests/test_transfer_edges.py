@@ -0,0 +1,89 @@
+"""TransferEdgeBuilder against a brute-force scan of every station pair."""
+import networkx as nx
+import numpy as np
+import pytest
+
+import analysis_engines as ae
+
+MODES = ['metro', 'bus', 'ferry']
+THRESHOLDS = [0, 150, 400, 750, 1200]
+
+
+def base_graph(seed, directed, n=120):
+    """Stations of three modes (plus one without a mode and one without coordinates), some already linked."""
+    rng = np.random.default_rng(seed)
+    G = nx.DiGraph() if directed else nx.Graph()
+    for i in range(n):
+        G.add_node(f"s{i}", lon=114 + rng.random() * 0.05, lat=30.5 + rng.random() * 0.05, mode=MODES[i % 3])
+    del G.nodes['s4']['mode']
+    G.add_node('unlocated', mode='bus')
+    G.nodes['s7'].update(lon=G.nodes['s8']['lon'], lat=G.nodes['s8']['lat'])  # Coincident metro and bus stops
+    for i in range(0, n - 2, 2):
+        G.add_edge(f"s{i}", f"s{i + 1}", type='route')
+    G.add_edge('s9', 's2', type='route')
+    return G
+
+
+def brute_force_transfers(csr, d_max):
+    """{(tail, head): metres} for every cross-mode pair within d_max (<=) not linked by the base network."""
+    existing = {(u, v) for u, v in zip(csr.src.tolist(), csr.dst.tolist())}
+    if not csr.directed:
+        existing |= {(v, u) for u, v in existing}
+    transfers = {}
+    for u in range(csr.n):
+        for v in range(u + 1, csr.n):
+            if csr.mode[u] == csr.mode[v]:
+                continue
+            metres = ae._haversine(csr.lon[u], csr.lat[u], csr.lon[v], csr.lat[v])
+            if not metres <= d_max:  # NaN (no coordinates) is never in range
+                continue
+            for tail, head in ([(u, v), (v, u)] if csr.directed else [(u, v)]):
+                if (tail, head) not in existing:
+                    transfers[tail, head] = metres
+    return transfers
+
+
+@pytest.mark.parametrize('directed', [False, True])
+@pytest.mark.parametrize('seed', range(3))
+def test_transfers_match_brute_force(seed, directed):
+    G = base_graph(seed, directed)
+    csr = ae.as_csr(G)
+    builder = ae.TransferEdgeBuilder(G, max_distance=max(THRESHOLDS))
+    added = {}
+    for d_max in THRESHOLDS:
+        expected = brute_force_transfers(csr, d_max)
+        tails, heads, metres = builder.advance(d_max)
+        added.update(zip(zip(tails.tolist(), heads.tolist()), metres.tolist()))
+        assert added.keys() == expected.keys()
+        np.testing.assert_allclose([added[pair] for pair in expected], list(expected.values()), rtol=1e-12)
+        assert builder.count(d_max) == len(expected)
+
+        # The graph is the base network plus those transfers as 'walk' edges
+        H = builder.graph()
+        assert H.m == csr.m + len(expected)
+        np.testing.assert_array_equal(H.src[:csr.m], csr.src)
+        assert {H.type_labels[c] for c in H.etype[csr.m:]} <= {'walk'}
+        assert builder.graph(d_max).m == H.m
+    assert len(builder) == len(added)
+    assert builder.count(0) >= 1  # The coincident stops transfer at 0 m
+
+
+@pytest.mark.parametrize('directed', [False, True])
+def test_lcc_curve(directed):
+    G = base_graph(5, directed)
+    builder = ae.TransferEdgeBuilder(G, max_distance=max(THRESHOLDS))
+    expected = []
+    for d_max in THRESHOLDS:
+        H = builder.graph(d_max).to_networkx()
+        components = nx.weakly_connected_components(H) if directed else nx.connected_components(H)
+        expected.append(max(len(c) for c in components))
+    np.testing.assert_array_equal(builder.lcc_curve(THRESHOLDS), expected)
+
+
+def test_cursor_bounds():
+    builder = ae.TransferEdgeBuilder(base_graph(0, False), max_distance=500)
+    builder.advance(400)
+    with pytest.raises(ValueError):
+        builder.advance(200)
+    with pytest.raises(ValueError):
+        builder.count(600)